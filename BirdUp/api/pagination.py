@@ -0,0 +1,76 @@
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from core.pagination import decode_cursor, encode_cursor
+
+
+class SearchCursorPagination(BasePagination):
+    """Курсорная пагинация по списку найденных id.
+
+    Курсор хранит позицию первой записи страницы и её id. Если между
+    запросами список изменился, страница начинается с того же id на его
+    новом месте, а если запись пропала - с прежней позиции.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 20
+    max_page_size = 50
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_offset(self, request, ids):
+        token = request.query_params.get(self.cursor_query_param)
+        if token is None:
+            return 0
+        cursor = decode_cursor(token)
+        try:
+            offset, first_id = cursor['o'], cursor['id']
+        except (TypeError, KeyError):
+            raise NotFound('Неверный курсор')
+        # json.loads принимает и дроби, и Infinity
+        if not all(
+            isinstance(value, int) and not isinstance(value, bool)
+            for value in (offset, first_id)
+        ) or not 0 <= offset <= settings.SEARCH_MAX_RESULTS:
+            raise NotFound('Неверный курсор')
+        if offset < len(ids) and ids[offset] == first_id:
+            return offset
+        if first_id in ids:
+            return ids.index(first_id)
+        return min(max(offset, 0), len(ids))
+
+    def paginate_queryset(self, results, request, view=None):
+        self.request = request
+        self.ids = results.ids
+        self.page_size_value = self.get_page_size(request)
+        self.offset = self.get_offset(request, self.ids)
+        return results[self.offset:self.offset + self.page_size_value]
+
+    def link(self, offset):
+        url = self.request.build_absolute_uri()
+        if offset is None:
+            return None
+        if offset == 0:
+            return remove_query_param(url, self.cursor_query_param)
+        cursor = encode_cursor({'o': offset, 'id': self.ids[offset]})
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        end = self.offset + self.page_size_value
+        next_offset = end if end < len(self.ids) else None
+        previous_offset = None
+        if self.offset > 0:
+            previous_offset = max(self.offset - self.page_size_value, 0)
+        return Response({
+            'next': self.link(next_offset),
+            'previous': self.link(previous_offset),
+            'results': data,
+        })
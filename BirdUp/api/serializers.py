@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 
+from core import ingest
 from posts.models import Comment, Post, Group, Follow, User
 
 
@@ -11,7 +12,24 @@ class PostSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Post
-        fields = '__all__'
+        # Поля обработки картинки (core.ingest, core.derivatives) в API
+        # не входят
+        fields = ('id', 'pub_date', 'text', 'author', 'group', 'image')
+
+    def validate_image(self, value):
+        if value is None:
+            return value
+        return ingest.process(value)
+
+
+class SearchPostSerializer(serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(
+        slug_field='username', read_only=True
+    )
+
+    class Meta:
+        model = Post
+        fields = ('id', 'text', 'author', 'pub_date', 'group')
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -28,7 +46,13 @@ class CommentSerializer(serializers.ModelSerializer):
 class GroupSerializer(serializers.ModelSerializer):
     class Meta:
         model = Group
-        fields = '__all__'
+        fields = ('id', 'title', 'slug', 'description', 'creator')
+
+
+class SearchUserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ('username', 'first_name', 'last_name')
 
 
 class FollowSerializer(serializers.ModelSerializer):
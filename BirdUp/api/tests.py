@@ -0,0 +1,121 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.pagination import encode_cursor
+from posts import search_cache
+from posts.models import Group, Post
+from users.models import Profile
+
+User = get_user_model()
+
+
+@override_settings(SEARCH_MAX_RESULTS=12)
+class SearchAPITest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='HasNoName', first_name='Пётр', last_name='Иванов'
+        )
+        Profile.objects.create(user=cls.user)
+        cls.group = Group.objects.create(
+            title='Птицы', slug='birds', creator=cls.user
+        )
+        for i in range(15):
+            Post.objects.create(author=cls.user, text=f'Общий пост {i}')
+
+    def setUp(self):
+        search_cache.clear()
+        self.client = APIClient()
+
+    def test_cursor_pages_are_capped(self):
+        address = reverse('search-posts')
+        response = self.client.get(address, {'query': 'общий', 'limit': 5})
+        found = []
+        while True:
+            data = response.json()
+            found += [post['id'] for post in data['results']]
+            if not data['next']:
+                break
+            response = self.client.get(data['next'])
+        self.assertEqual(len(found), 12)
+        self.assertEqual(len(set(found)), 12)
+        previous = self.client.get(data['previous']).json()
+        self.assertEqual(len(previous['results']), 5)
+
+    def test_cursor_follows_changed_results(self):
+        address = reverse('search-posts')
+        response = self.client.get(address, {'query': 'общий', 'limit': 5})
+        first_page = response.json()
+        Post.objects.create(author=self.user, text='Общий пост новый')
+        second_page = self.client.get(first_page['next']).json()
+        ids = [post['id'] for post in first_page['results']]
+        ids += [post['id'] for post in second_page['results']]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_users_and_groups(self):
+        response = self.client.get(reverse('search-users'), {'query': 'пет'})
+        self.assertEqual(response.json()['results'], [{
+            'username': 'HasNoName',
+            'first_name': 'Пётр',
+            'last_name': 'Иванов',
+        }])
+        response = self.client.get(
+            reverse('search-groups'), {'query': 'птица'}
+        )
+        results = response.json()['results']
+        self.assertEqual([group['slug'] for group in results], ['birds'])
+
+    def test_empty_query_and_bad_cursor(self):
+        address = reverse('search-posts')
+        response = self.client.get(address)
+        self.assertEqual(response.json()['results'], [])
+        for cursor in (
+            'broken',
+            encode_cursor({'o': float('inf'), 'id': 1}),
+            encode_cursor({'o': 1.5, 'id': 1}),
+            encode_cursor({'o': -1, 'id': 1}),
+            encode_cursor({'o': 10 ** 9, 'id': 1}),
+            encode_cursor({'o': 1, 'id': None}),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(
+                    address, {'query': 'общий', 'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 404)
+
+    def test_post_results_are_compact(self):
+        response = self.client.get(
+            reverse('search-posts'), {'query': 'общий', 'limit': 1}
+        )
+        post = response.json()['results'][0]
+        self.assertEqual(
+            set(post), {'id', 'text', 'author', 'pub_date', 'group'}
+        )
+        self.assertEqual(post['author'], 'HasNoName')
+
+
+class PostAPITest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Птицы', slug='birds', creator=cls.user
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост', group=cls.group
+        )
+
+    def test_fields(self):
+        client = APIClient()
+        for address, fields in (
+            (reverse('posts-detail', args=[self.post.id]),
+             {'id', 'pub_date', 'text', 'author', 'group', 'image'}),
+            (reverse('groups-detail', args=[self.group.id]),
+             {'id', 'title', 'slug', 'description', 'creator'}),
+        ):
+            with self.subTest(address=address):
+                self.assertEqual(set(client.get(address).json()), fields)
@@ -1,6 +1,8 @@
 from django.urls import path, include
 from rest_framework import routers
-from .views import PostViewSet, CommentViewSet, GroupViewSet, FollowViewSet
+from .views import (PostViewSet, CommentViewSet, GroupViewSet,
+                    FollowViewSet, PostSearchView, UserSearchView,
+                    GroupSearchView)
 
 router = routers.DefaultRouter()
 
@@ -15,5 +17,8 @@ router.register('posts/(?P<post_id>\\d+)/comments',
 urlpatterns = [
     path('', include('djoser.urls')),
     path('', include('djoser.urls.jwt')),
+    path('search/posts/', PostSearchView.as_view(), name='search-posts'),
+    path('search/users/', UserSearchView.as_view(), name='search-users'),
+    path('search/groups/', GroupSearchView.as_view(), name='search-groups'),
     path('', include(router.urls)),
 ]
@@ -1,26 +1,61 @@
 from django.shortcuts import get_object_or_404
-from rest_framework import viewsets, filters
+from rest_framework import exceptions, generics, viewsets, filters
 from rest_framework.permissions import (IsAuthenticatedOrReadOnly,
                                         IsAuthenticated)
 from rest_framework.pagination import LimitOffsetPagination
+from core.conditional import ConditionalGetMixin
+from posts import search_cache, searchers
 from posts.models import Group, Post
+from .pagination import SearchCursorPagination
 from .serializers import (CommentSerializer, GroupSerializer,
-                          PostSerializer, FollowSerializer)
+                          PostSerializer, FollowSerializer,
+                          SearchPostSerializer, SearchUserSerializer)
 from .permissions import ObjAuthorOrReadOnly
 
 
-class GroupViewSet(viewsets.ReadOnlyModelViewSet):
+class ConditionalViewSetMixin(ConditionalGetMixin):
+    """ETag списка - по области list_scope, объекта - по object_scope,
+    и по областям scopes. Ответы не зависят от пользователя, но
+    зависят от формата: JSON и страница браузера API различаются."""
+    per_user = False
+    vary_headers = ('Accept',)
+
+    def get_scopes(self):
+        if 'pk' in self.kwargs:
+            return [f'{self.object_scope}:{self.kwargs["pk"]}',
+                    *self.scopes]
+        return [self.list_scope, *self.scopes]
+
+    def get_variant(self, request):
+        """Формат, который выберет DRF по Accept и ?format."""
+        self.format_kwarg = self.get_format_suffix(**self.kwargs)
+        try:
+            renderer, media_type = self.perform_content_negotiation(
+                self.initialize_request(request, *self.args, **self.kwargs)
+            )
+        except exceptions.NotAcceptable:
+            return None
+        return renderer.format
+
+
+class GroupViewSet(ConditionalViewSetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
     pagination_class = LimitOffsetPagination
     http_method_names = ('get',)
+    list_scope = 'groups'
+    object_scope = 'group'
 
 
-class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.all()
+class PostViewSet(ConditionalViewSetMixin, viewsets.ModelViewSet):
+    queryset = Post.objects.for_listing()
     serializer_class = PostSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, ObjAuthorOrReadOnly)
     pagination_class = LimitOffsetPagination
+    list_scope = 'posts'
+    object_scope = 'post'
+    # Имена авторов
+    scopes = ('users',)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -33,7 +68,7 @@ class CommentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         post = get_object_or_404(Post, id=self.kwargs['post_id'])
-        return post.comments
+        return post.comments.select_related('author')
 
     def perform_create(self, serializer):
         post = get_object_or_404(Post, id=self.kwargs['post_id'])
@@ -52,3 +87,30 @@ class FollowViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+
+class SearchView(generics.ListAPIView):
+    """Поиск тем же способом, что и на страницах сайта: не больше
+    settings.SEARCH_MAX_RESULTS результатов, по курсору."""
+    pagination_class = SearchCursorPagination
+
+    def get_queryset(self):
+        query = self.request.query_params.get('query', '')
+        if not query.strip():
+            return search_cache.CachedResults([], self.searcher.queryset())
+        return self.searcher.results(query)
+
+
+class PostSearchView(SearchView):
+    serializer_class = SearchPostSerializer
+    searcher = searchers.POSTS
+
+
+class UserSearchView(SearchView):
+    serializer_class = SearchUserSerializer
+    searcher = searchers.USERS
+
+
+class GroupSearchView(SearchView):
+    serializer_class = GroupSerializer
+    searcher = searchers.GROUPS
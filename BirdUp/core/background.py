@@ -0,0 +1,67 @@
+# Фоновые задачи в пулах потоков процесса.
+# У каждой очереди свой пул: задачи одной очереди не ждут задач другой,
+# а ошибка задачи только пишется в лог. Задача с ключом, который уже
+# стоит в очереди, второй раз не ставится. Без асинхронности (настройка
+# очереди, например в тестах) задача выполняется сразу, в потоке
+# вызова.
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class Queue:
+    """Очередь задач name; workers и run_async - имена настроек с
+    числом потоков и признаком фонового выполнения."""
+
+    def __init__(self, name, workers, run_async):
+        self.name = name
+        self.workers = workers
+        self.run_async = run_async
+        self.executor = None
+        self.lock = threading.Lock()
+        # Ключи задач в очереди
+        self.pending = set()
+
+    @property
+    def is_async(self):
+        return getattr(settings, self.run_async)
+
+    def _run(self, key, function, args):
+        try:
+            function(*args)
+        except Exception:
+            logger.exception('Задача %s очереди %s не выполнена',
+                             key, self.name)
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+            if self.is_async:
+                # Поток пула не проходит через обработку запроса:
+                # соединение с базой закрываем сами
+                connections.close_all()
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, self.workers),
+                    thread_name_prefix=self.name,
+                )
+            return self.executor
+
+    def submit(self, key, function, *args):
+        """Ставит function(*args) в очередь, если задачи с таким ключом
+        там ещё нет."""
+        with self.lock:
+            if key in self.pending:
+                return
+            self.pending.add(key)
+        if self.is_async:
+            self._get_executor().submit(self._run, key, function, args)
+        else:
+            self._run(key, function, args)
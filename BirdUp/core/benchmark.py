@@ -0,0 +1,87 @@
+import gc
+import statistics
+import time
+import tracemalloc
+
+from .query_budget import QueryCounter
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, percent):
+    """Перцентиль с линейной интерполяцией между соседними значениями."""
+    values = sorted(values)
+    position = (len(values) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (
+        position - lower
+    )
+
+
+def measure(client, address, data=None, repeat=20, warmup=2, before=None):
+    """Замеряет страницу: задержки, число запросов и пик памяти.
+
+    Прогревочные запросы не учитываются. Память считается отдельным
+    запросом: tracemalloc заметно замедляет выполнение. before
+    вызывается перед каждым замеряемым запросом, например для очистки
+    кэшей.
+    """
+    before = before or (lambda: None)
+    for _ in range(warmup):
+        client.get(address, data)
+    timings, db_timings, queries = [], [], []
+    for _ in range(repeat):
+        before()
+        with QueryCounter() as counter:
+            start = time.perf_counter()
+            response = client.get(address, data)
+            timings.append((time.perf_counter() - start) * 1000)
+        db_timings.append(counter.time_ms)
+        queries.append(counter.count)
+    before()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        client.get(address, data)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {
+        'status': response.status_code,
+        'repeat': repeat,
+        'min_ms': round(min(timings), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'db_ms': round(statistics.median(db_timings), 3),
+        'queries': max(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+    for percent in PERCENTILES:
+        result[f'p{percent}_ms'] = round(percentile(timings, percent), 3)
+    return result
+
+
+def compare(baseline, current, threshold=0.2, metric='p95_ms'):
+    """Регрессии относительно прошлого отчёта.
+
+    Страница считается медленнее, если metric вырос больше чем на
+    threshold (доля), или если выросло число запросов.
+    """
+    regressions = []
+    for route, clients in current['routes'].items():
+        for client, result in clients.items():
+            before = baseline['routes'].get(route, {}).get(client)
+            if before is None:
+                continue
+            label = f'{route} ({client})'
+            if result['queries'] > before['queries']:
+                regressions.append(
+                    f'{label}: запросов {before["queries"]} -> '
+                    f'{result["queries"]}'
+                )
+            if result[metric] > before[metric] * (1 + threshold):
+                regressions.append(
+                    f'{label}: {metric} {before[metric]} -> {result[metric]}'
+                )
+    return regressions
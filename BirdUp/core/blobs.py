@@ -0,0 +1,71 @@
+# Подсчёт ссылок на файлы хранилища по содержимому (core.storage).
+# Сигналы posts и users вызывают acquire() для нового изображения
+# строки и release() для прежнего или удалённого. Файл без ссылок не
+# удаляется сразу: то же содержимое может как раз загружаться, а
+# загрузка получает имя существующего файла раньше, чем ссылку на него.
+# sweep() (команда sweep_blobs, по расписанию) удаляет файлы, у которых
+# нет ссылок дольше settings.BLOB_SWEEP_DELAY секунд, вместе с
+# миниатюрами и копиями. Файлы, загруженные до хранилища по
+# содержимому, не учитываются и не удаляются.
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_thumbnails
+
+from . import derivatives
+from .models import Blob
+from .storage import BLOB_DIR
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_DIR + '/')
+
+
+def acquire(name):
+    if not is_blob(name):
+        return
+    with transaction.atomic():
+        Blob.objects.get_or_create(name=name)
+        Blob.objects.filter(name=name).update(
+            references=F('references') + 1
+        )
+
+
+def release(name):
+    if not is_blob(name):
+        return
+    Blob.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1, used_at=timezone.now()
+    )
+
+
+def sweep(delay=None):
+    """Удаляет файлы, у которых нет ссылок дольше delay секунд (по
+    умолчанию BLOB_SWEEP_DELAY); возвращает их число."""
+    if delay is None:
+        delay = settings.BLOB_SWEEP_DELAY
+    unused = Blob.objects.filter(
+        references=0, used_at__lt=timezone.now() - timedelta(seconds=delay)
+    )
+    count = 0
+    for name in list(unused.values_list('name', flat=True)):
+        # Строка удаляется раньше файлов и в той же транзакции:
+        # ContentAddressedStorage.save того же содержимого ждёт её
+        # фиксации и записывает файл заново
+        with transaction.atomic():
+            deleted, _ = unused.filter(name=name).delete()
+            if deleted:
+                derivatives.delete(name)
+                delete_thumbnails(name)
+                count += 1
+    return count
+
+
+def replace(old_name, new_name):
+    """Ссылка строки переходит с old_name на new_name."""
+    if old_name != new_name:
+        acquire(new_name)
+        release(old_name)
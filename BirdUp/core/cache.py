@@ -0,0 +1,472 @@
+# Двухуровневый кэш.
+# Первый уровень - небольшой LRU в памяти процесса с коротким сроком
+# жизни записей, второй - общий для всех процессов (воркеров gunicorn)
+# кэш из settings.CACHES, например FileBasedCache. Чтение идёт сначала
+# в память процесса, при промахе - в общий кэш, и найденное значение
+# запоминается в памяти. Запись и удаление идут в оба уровня.
+#
+# Чтобы другие процессы не отдавали из памяти перезаписанные или
+# удалённые значения, каждое изменение увеличивает счётчик в общем
+# кэше и оставляет там запись журнала со списком изменённых ключей.
+# Процесс сверяет счётчик не чаще раза в SYNC_INTERVAL секунд и
+# выбрасывает из памяти ключи из журнала; если журнал неполон, память
+# очищается целиком. Дольше LOCAL_TIMEOUT запись в памяти не живёт в
+# любом случае.
+# Номер записи журнала выдаёт incr общего кэша. У FileBasedCache это
+# чтение и запись, а не атомарная операция: два процесса могут получить
+# один номер, и одна запись журнала перезапишет другую. Тогда изменение
+# из потерянной записи дойдёт до памяти других процессов только через
+# LOCAL_TIMEOUT. Если это недопустимо, общим уровнем нужен бэкенд с
+# атомарным incr и add (Memcached, Redis).
+#
+# get_or_compute() пересчитывает значение при промахе только в одном
+# вызове: остальные ждут его или получают прежнее значение, а горячие
+# ключи обновляются заранее, с вероятностью, растущей к концу срока.
+# Внутри процесса пересчёт держит threading.Lock ключа, между
+# процессами - файл блокировки, созданный с O_EXCL в каталоге общего
+# FileBasedCache. С другим общим кэшем блокировка - его add, который
+# должен быть атомарным (Memcached, Redis).
+import hashlib
+import math
+import os
+import pickle
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SEQUENCE_KEY = 'tiered:sequence'
+JOURNAL_KEY = 'tiered:journal:{}'
+# Больше записей журнала не читается: проще очистить память
+JOURNAL_LIMIT = 100
+TIERS = ('local', 'shared')
+# Блокировка пересчёта и ожидание чужого пересчёта, секунды
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 5
+WAIT_STEP = 0.05
+
+# Каталог файлов блокировки внутри каталога FileBasedCache
+LOCKS_DIR = 'locks'
+
+# Память процесса по LOCATION: экземпляры бэкенда создаются для
+# каждого потока, а память у потоков общая
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+# Блокировки пересчёта в процессе: ключ -> threading.Lock
+_compute_locks = {}
+_compute_locks_lock = threading.Lock()
+
+
+class Stats:
+    """Попадания и промахи по уровням кэша в текущем процессе."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hits = dict.fromkeys(TIERS, 0)
+        self.misses = dict.fromkeys(TIERS, 0)
+
+    def record(self, tier, hits=0, misses=0):
+        with self.lock:
+            self.hits[tier] += hits
+            self.misses[tier] += misses
+
+    def as_dict(self):
+        result = {}
+        for tier in TIERS:
+            hits, misses = self.hits[tier], self.misses[tier]
+            total = hits + misses
+            result[tier] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / total, 3) if total else None,
+            }
+        return result
+
+
+class LocalTier:
+    """LRU в памяти процесса: ключ -> (срок, значение в pickle)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+        self.stats = Stats()
+        # Последний прочитанный номер журнала и время следующей сверки
+        self.sequence = None
+        self.next_sync = 0
+
+    def get(self, key):
+        with self.lock:
+            expires, value = self.data.get(key, (0, None))
+            if expires <= time.monotonic():
+                self.data.pop(key, None)
+                return None
+            self.data.move_to_end(key)
+        return value
+
+    def set(self, key, value, timeout, max_entries):
+        with self.lock:
+            self.data[key] = (time.monotonic() + timeout, value)
+            self.data.move_to_end(key)
+            while len(self.data) > max_entries:
+                self.data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+class TieredCache(BaseCache):
+    """Бэкенд кэша: память процесса перед общим кэшем.
+
+    OPTIONS: SHARED - псевдоним общего кэша в settings.CACHES,
+    MAX_ENTRIES - размер памяти процесса, LOCAL_TIMEOUT - срок жизни
+    записи в памяти, SYNC_INTERVAL - как часто сверяться с журналом.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options['SHARED']
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.sync_interval = options.get('SYNC_INTERVAL', 1)
+        with _local_tiers_lock:
+            self.local = _local_tiers.setdefault(location, LocalTier())
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    @property
+    def stats(self):
+        return self.local.stats
+
+    def _local_timeout(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.local_timeout
+        return min(timeout - time.time(), self.local_timeout)
+
+    def _remember(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_timeout = self._local_timeout(timeout)
+        local_key = self.make_key(key, version)
+        if local_timeout <= 0:
+            self.local.delete(local_key)
+            return
+        self.local.set(
+            local_key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            local_timeout, self._max_entries,
+        )
+
+    def _publish(self, keys, version=None):
+        """Записывает изменённые ключи в журнал для других процессов.
+
+        Номер записи уникален, только если incr общего кэша атомарен.
+        """
+        shared = self.shared
+        try:
+            sequence = shared.incr(SEQUENCE_KEY)
+        except ValueError:
+            shared.add(SEQUENCE_KEY, 0, timeout=None)
+            sequence = shared.incr(SEQUENCE_KEY)
+        shared.set(
+            JOURNAL_KEY.format(sequence),
+            [(key, version) for key in keys],
+            timeout=self.local_timeout + self.sync_interval,
+        )
+        local = self.local
+        with local.lock:
+            # Сверки ещё не было или никто не писал между ней и этой
+            # записью: свою запись журнала читать не нужно
+            if local.sequence in (None, sequence - 1):
+                local.sequence = sequence
+
+    def _sync(self):
+        """Выбрасывает из памяти ключи, изменённые другими процессами."""
+        local = self.local
+        now = time.monotonic()
+        with local.lock:
+            if now < local.next_sync:
+                return
+            local.next_sync = now + self.sync_interval
+            seen = local.sequence
+        shared = self.shared
+        current = shared.get(SEQUENCE_KEY)
+        if current == seen:
+            return
+        if seen is None or current is None or not (
+                0 < current - seen <= JOURNAL_LIMIT):
+            records = None
+        else:
+            names = [
+                JOURNAL_KEY.format(sequence)
+                for sequence in range(seen + 1, current + 1)
+            ]
+            records = shared.get_many(names)
+            if len(records) < len(names):
+                records = None
+        if records is None:
+            local.clear()
+        else:
+            local.delete(*(
+                self.make_key(key, version)
+                for record in records.values() for key, version in record
+            ))
+        with local.lock:
+            local.sequence = current
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        value = self.local.get(self.make_key(key, version))
+        if value is not None:
+            self.stats.record('local', hits=1)
+            return pickle.loads(value)
+        self.stats.record('local', misses=1)
+        value = self.shared.get(key, self._missing_key, version=version)
+        if value is self._missing_key:
+            self.stats.record('shared', misses=1)
+            return default
+        self.stats.record('shared', hits=1)
+        self._remember(key, value, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found, missing = {}, []
+        for key in keys:
+            value = self.local.get(self.make_key(key, version))
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(value)
+        self.stats.record('local', hits=len(found), misses=len(missing))
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            self.stats.record(
+                'shared', hits=len(shared),
+                misses=len(missing) - len(shared),
+            )
+            for key, value in shared.items():
+                self._remember(key, value, version=version)
+            found.update(shared)
+        return found
+
+    def has_key(self, key, version=None):
+        missing = self._missing_key
+        return self.get(key, missing, version=version) is not missing
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout=timeout, version=version)
+        self._remember(key, value, timeout, version)
+        self._publish([key], version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout=timeout, version=version)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(key, value, timeout, version)
+        self._publish(list(data), version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.shared.add(key, value, timeout=timeout, version=version):
+            return False
+        self._remember(key, value, timeout, version)
+        self._publish([key], version)
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self.local.delete(self.make_key(key, version))
+        self._publish([key], version)
+        return value
+
+    def delete(self, key, version=None):
+        self.local.delete(self.make_key(key, version))
+        deleted = self.shared.delete(key, version=version)
+        self._publish([key], version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.local.delete(*(self.make_key(key, version) for key in keys))
+        self.shared.delete_many(keys, version=version)
+        self._publish(keys, version)
+
+    def clear(self):
+        # Счётчик журнала удаляется вместе с общим кэшем: другие
+        # процессы увидят это при сверке и очистят свою память
+        self.shared.clear()
+        self.local.clear()
+        with self.local.lock:
+            self.local.sequence = None
+        self.stats.reset()
+
+
+def _refresh_due(entry, beta):
+    """Пора ли пересчитать значение (XFetch): чем ближе срок и чем
+    дольше считалось значение, тем вероятнее досрочное обновление."""
+    _, expires, duration = entry
+    if expires is None:
+        return False
+    early = -duration * beta * math.log(1 - random.random())
+    return time.time() + early >= expires
+
+
+def _compute(cache, key, compute, timeout, stale):
+    started = time.time()
+    value = compute()
+    duration = time.time() - started
+    if timeout is None:
+        cache.set(key, (value, None, duration), None)
+    else:
+        cache.set(
+            key, (value, started + duration + timeout, duration),
+            timeout + stale,
+        )
+    return value
+
+
+class ComputeLock:
+    """Блокировка пересчёта ключа в процессе и между процессами."""
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = f'{key}:lock'
+        self.name = cache.make_key(self.key)
+        self.path = None
+        self.token = uuid.uuid4().hex
+        self.thread_lock = None
+
+    def _lock_file(self):
+        """Путь файла блокировки или None, если общий кэш не в файлах."""
+        shared = getattr(self.cache, 'shared', self.cache)
+        directory = getattr(shared, '_dir', None)
+        if directory is None:
+            return None
+        digest = hashlib.sha1(self.name.encode()).hexdigest()
+        return os.path.join(directory, LOCKS_DIR, f'{digest}.lock')
+
+    def _acquire_file(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Вторая попытка - после снятия блокировки упавшего процесса
+        for _ in range(2):
+            try:
+                fd = os.open(
+                    self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY
+                )
+            except FileExistsError:
+                try:
+                    age = time.time() - os.path.getmtime(self.path)
+                except FileNotFoundError:
+                    continue
+                if age < LOCK_TIMEOUT:
+                    return False
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w') as lock_file:
+                lock_file.write(self.token)
+            return True
+        return False
+
+    def _release_file(self):
+        # Блокировку, снятую по сроку и взятую другим, не удаляем
+        try:
+            with open(self.path) as lock_file:
+                if lock_file.read() != self.token:
+                    return
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _release_thread(self):
+        with _compute_locks_lock:
+            self.thread_lock.release()
+            if _compute_locks.get(self.name) is self.thread_lock:
+                del _compute_locks[self.name]
+
+    def acquire(self):
+        """Берёт блокировку без ожидания; False, если она занята."""
+        with _compute_locks_lock:
+            self.thread_lock = _compute_locks.setdefault(
+                self.name, threading.Lock()
+            )
+            if not self.thread_lock.acquire(blocking=False):
+                return False
+        self.path = self._lock_file()
+        if self.path is None:
+            acquired = self.cache.add(self.key, 1, LOCK_TIMEOUT)
+        else:
+            acquired = self._acquire_file()
+        if not acquired:
+            self._release_thread()
+        return acquired
+
+    def release(self):
+        if self.path is None:
+            self.cache.delete(self.key)
+        else:
+            self._release_file()
+        self._release_thread()
+
+
+def get_or_compute(cache, key, compute, timeout, stale=60, beta=1.0):
+    """Значение из кэша или compute(), вызванная одним процессом.
+
+    Значение хранится stale секунд после срока timeout: пока один
+    вызов его пересчитывает, остальные получают прежнее. Если прежнего
+    нет, они ждут пересчёта до WAIT_TIMEOUT секунд. Блокировка -
+    ComputeLock.
+    """
+    entry = cache.get(key)
+    if entry is not None and not _refresh_due(entry, beta):
+        return entry[0]
+    lock = ComputeLock(cache, key)
+    if lock.acquire():
+        try:
+            # Пока блокировка бралась, значение мог записать другой
+            # вызов: тогда считать его ещё раз не нужно
+            current = cache.get(key)
+            if current is not None and (
+                    entry is None or current[1:] != entry[1:]):
+                return current[0]
+            return _compute(cache, key, compute, timeout, stale)
+        finally:
+            lock.release()
+    if entry is not None:
+        return entry[0]
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    # Пересчёт не закончился вовремя: не ждём дольше
+    return compute()
+
+
+def stats():
+    """Попадания по уровням для всех двухуровневых кэшей."""
+    return {
+        alias: caches[alias].stats.as_dict()
+        for alias, config in settings.CACHES.items()
+        if config['BACKEND'] == f'{__name__}.{TieredCache.__name__}'
+    }
@@ -0,0 +1,199 @@
+# Условные GET-запросы страниц.
+# Страница собирается из нескольких областей: лента, группа, автор,
+# пост, имена пользователей (users), сам читатель (его подписки и
+# шапка). Сигналы posts и users записывают в кэш время последнего
+# изменения каждой области (touch).
+# ETag страницы - хэш этих времён, адреса, варианта ответа (формат
+# DRF, get_variant) и пользователя: если он совпал с If-None-Match,
+# ответ 304 отдаётся без выполнения view и её запросов. Время,
+# вытесненное из кэша, становится текущим: страница один раз отдаётся
+# целиком.
+# Страница с заглушкой вместо ещё не готовой миниатюры (mark_incomplete)
+# отдаётся без ETag: иначе браузер показывал бы заглушку и после того,
+# как миниатюра появится.
+#
+# Гостям без сессии и заголовка Authorization страницы с cache_anonymous
+# = True отдаются из кэша 'pages' по тому же хэшу. Промах собирает
+# страницу через cache.get_or_compute: одновременные гости ждут одной
+# сборки, а не собирают страницу каждый. Запись страницы
+# привязана к временам её областей: изменение поста, группы или
+# пользователя меняет ключи только страниц, которые их показывают, а
+# прежние записи вытесняются по сроку. Область ALL входит во все
+# страницы: invalidate_all() - для изменений в обход сигналов моделей
+# (миграции, bulk_create в generate_data).
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers,
+)
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_or_compute
+
+KEY = 'modified:{}'
+ALL = 'all'
+# Запись - (содержимое, Content-Type) или None, если страницу нельзя
+# хранить
+PAGE_KEY = 'anonymous-page:{}'
+PAGES_ALIAS = 'pages'
+INCOMPLETE = '_page_incomplete'
+
+
+def touch(*scopes):
+    """Отмечает изменение областей."""
+    now = time.time()
+    cache.set_many({KEY.format(scope): now for scope in scopes}, None)
+
+
+def modified(scopes):
+    """Время последнего изменения каждой области."""
+    keys = [KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def invalidate_all():
+    """Все страницы изменились."""
+    touch(ALL)
+
+
+def mark_incomplete(request):
+    """Страница показывает то, что изменится без изменения областей."""
+    if request is not None:
+        setattr(request, INCOMPLETE, True)
+
+
+def _render(response):
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+
+
+def is_anonymous(request):
+    """Гость без сессии и токена: страница для него такая же, как для
+    всех гостей."""
+    return (
+        settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and 'HTTP_AUTHORIZATION' not in request.META
+        and not request.user.is_authenticated
+    )
+
+
+def _cacheable(request, response):
+    # Страница с токеном CSRF привязана к cookie этого гостя
+    return (
+        response.status_code == 200
+        and not getattr(request, INCOMPLETE, False)
+        and not request.META.get('CSRF_COOKIE_USED')
+        and not response.cookies
+    )
+
+
+class ConditionalGetMixin:
+    """ETag по областям get_scopes() и 304 без выполнения view.
+
+    scopes - области страницы, если они не зависят от адреса; иначе
+    их возвращает get_scopes().
+
+    per_user = True - страница зависит от читателя: в ETag входят его
+    id и область, а ответ можно хранить только в его браузере.
+    cache_anonymous = True - гостям страница отдаётся из кэша.
+    vary_headers - заголовки запроса, от которых зависит get_variant().
+    """
+    per_user = True
+    cache_anonymous = False
+    vary_headers = ()
+    scopes = ()
+
+    def get_scopes(self):
+        return list(self.scopes)
+
+    def get_variant(self, request):
+        """Вариант ответа по одному адресу (например, формат)."""
+        return None
+
+    def _validators(self, request):
+        """Хэш страницы, id читателя или None и Last-Modified."""
+        scopes = [ALL, *self.get_scopes()]
+        user_id = None
+        if self.per_user and request.user.is_authenticated:
+            user_id = request.user.pk
+            scopes.append(f'user:{user_id}')
+        times = modified(scopes)
+        digest = hashlib.sha1(repr(
+            (request.get_full_path(), self.get_variant(request), user_id,
+             scopes, times)
+        ).encode()).hexdigest()
+        # Время изменения не говорит, для кого была страница, поэтому
+        # Last-Modified - только для одинаковых у всех страниц. Точность
+        # заголовка - секунда: пока она не прошла, в ней возможны новые
+        # изменения
+        last_modified = None
+        if user_id is None and time.time() - max(times) >= 1:
+            last_modified = int(max(times))
+        return digest, user_id, last_modified
+
+    def _render_page(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        _render(response)
+        return response
+
+    def _cached_page(self, request, digest, *args, **kwargs):
+        """Страница гостя из кэша; при промахе её собирает один запрос."""
+        rendered = []
+
+        def render():
+            response = self._render_page(request, *args, **kwargs)
+            rendered.append(response)
+            if not _cacheable(request, response):
+                return None
+            return response.content, response['Content-Type']
+
+        pages = caches[PAGES_ALIAS]
+        page = get_or_compute(
+            pages, PAGE_KEY.format(digest), render, pages.default_timeout
+        )
+        if rendered:
+            return rendered[0]
+        if page is None:
+            # Собранную другим запросом страницу хранить нельзя
+            return None
+        content, content_type = page
+        return HttpResponse(content, content_type=content_type)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        digest, user_id, last_modified = self._validators(request)
+        etag = quote_etag(digest)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            if (self.cache_anonymous and settings.ANONYMOUS_PAGE_CACHE
+                    and is_anonymous(request)):
+                response = self._cached_page(
+                    request, digest, *args, **kwargs
+                )
+            if response is None:
+                response = self._render_page(request, *args, **kwargs)
+            if response.status_code != 200 or getattr(
+                    request, INCOMPLETE, False):
+                return response
+        response.setdefault('ETag', etag)
+        if self.vary_headers:
+            patch_vary_headers(response, self.vary_headers)
+        if last_modified is not None:
+            response.setdefault('Last-Modified', http_date(last_modified))
+        if user_id is None:
+            patch_cache_control(response, no_cache=True)
+        else:
+            patch_cache_control(response, no_cache=True, private=True)
+        return response
@@ -0,0 +1,151 @@
+# Уменьшенные копии изображений для srcset.
+# Для каждой загруженной картинки создаются копии нескольких ширин
+# (settings.IMAGE_WIDTHS, не шире исходника) в форматах
+# settings.IMAGE_FORMATS. Файлы называются по шаблону
+# derived/<имя исходника>-<ширина>.<формат>, поэтому в модели хранится
+# только короткий манифест: {'base': ..., 'w': [ширины], 'f': [форматы]}.
+# Копии создаются в очереди core.thumbnails; пока манифест пуст,
+# шаблоны показывают обычную миниатюру.
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+from . import ingest, thumbnails
+
+# Манифест сохранён в строках модели sender с изображением name в поле
+# field; update() меняет строки без сигналов модели
+variants_built = Signal()
+
+MIME_TYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+# Параметры сохранения по форматам
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpg': {'format': 'JPEG', 'quality': 82, 'progressive': True,
+            'optimize': True},
+}
+# Форматы без прозрачности
+OPAQUE = {'jpg'}
+
+
+def variant_name(base, width, extension):
+    return f'{base}-{width}.{extension}'
+
+
+def _base(name):
+    return 'derived/' + os.path.splitext(name)[0]
+
+
+def _convert(image, extension):
+    if extension in OPAQUE:
+        return ingest.flatten(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        return image.convert('RGBA')
+    return image
+
+
+def _save(name, image, extension):
+    buffer = BytesIO()
+    image.save(buffer, **SAVE_OPTIONS[extension])
+    # Storage.save не перезаписывает файлы, а добавляет к имени суффикс
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def build(name):
+    """Создаёт копии изображения и возвращает их манифест.
+
+    Если все копии уже есть (тот же файл загружен ещё раз), пиксели
+    не декодируются.
+    """
+    base = _base(name)
+    extensions = list(settings.IMAGE_FORMATS)
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        source_width, source_height = ingest.oriented_size(image)
+        widths = [
+            width for width in settings.IMAGE_WIDTHS
+            if width <= source_width
+        ] or [source_width]
+        manifest = {'base': base, 'w': widths, 'f': extensions}
+        names = [
+            variant_name(base, width, extension)
+            for width in widths for extension in extensions
+        ]
+        if all(default_storage.exists(name) for name in names):
+            return manifest
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    for width in widths:
+        height = max(1, round(source_height * width / source_width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for extension in extensions:
+            _save(
+                variant_name(base, width, extension),
+                _convert(resized, extension),
+                extension,
+            )
+    return manifest
+
+
+def delete(name):
+    """Удаляет все копии изображения."""
+    directory, prefix = os.path.split(_base(name))
+    try:
+        _, files = default_storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    for file in files:
+        if file.startswith(prefix + '-'):
+            default_storage.delete(f'{directory}/{file}')
+
+
+def update(model, field, manifest_field, name):
+    """Строит копии и сохраняет манифест во всех строках, которые всё
+    ещё ссылаются на это изображение."""
+    rows = model.objects.filter(**{field: name})
+    if rows.exists():
+        rows.update(**{manifest_field: build(name)})
+        variants_built.send(sender=model, field=field, name=name)
+
+
+def schedule(instance, field, manifest_field):
+    """Сбрасывает манифест прежнего изображения и ставит построение
+    копий нового в очередь после фиксации транзакции."""
+    model = type(instance)
+    if getattr(instance, manifest_field):
+        setattr(instance, manifest_field, {})
+        model.objects.filter(pk=instance.pk).update(**{manifest_field: {}})
+    name = thumbnails.file_name(getattr(instance, field))
+    if not name:
+        return
+    key = ('derivatives', model._meta.label, name)
+    transaction.on_commit(lambda: thumbnails.submit(
+        key, update, model, field, manifest_field, name
+    ))
+
+
+def url(manifest, width, extension):
+    return default_storage.url(
+        variant_name(manifest['base'], width, extension)
+    )
+
+
+def srcset(manifest, extension):
+    """Значение srcset: адреса копий формата с их ширинами."""
+    return ', '.join(
+        f'{url(manifest, width, extension)} {width}w'
+        for width in manifest['w']
+    )
+
+
+def fallback_url(manifest):
+    """Самая широкая копия в последнем, самом совместимом формате, -
+    для браузеров без srcset."""
+    return url(manifest, manifest['w'][-1], manifest['f'][-1])
@@ -0,0 +1,42 @@
+# Объекты моделей на время запроса.
+# get_object() работает как get_object_or_404, но запоминает найденный
+# объект в запросе: повторный поиск того же объекта в dispatch,
+# get_context_data и form_valid не идёт в базу. Объект запоминается и
+# по первичному ключу, поэтому после поиска по slug поиск по pk тоже
+# его находит. Текущий пользователь уже загружен AuthenticationMiddleware
+# и попадает в карту сразу.
+from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
+
+ATTRIBUTE = '_identity_map'
+
+
+def _key(model, lookup):
+    pk_names = ('pk', model._meta.pk.name, model._meta.pk.attname)
+    return model._meta.label, tuple(sorted(
+        ('pk' if name in pk_names else name, value)
+        for name, value in lookup.items()
+    ))
+
+
+def _identity_map(request):
+    objects = getattr(request, ATTRIBUTE, None)
+    if objects is None:
+        objects = {}
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            objects[_key(get_user_model(), {'pk': user.pk})] = user
+        setattr(request, ATTRIBUTE, objects)
+    return objects
+
+
+def get_object(request, model, **lookup):
+    """Объект модели по lookup, загруженный не больше раза за запрос;
+    Http404, если его нет."""
+    objects = _identity_map(request)
+    key = _key(model, lookup)
+    if key not in objects:
+        instance = get_object_or_404(model, **lookup)
+        objects[key] = instance
+        objects.setdefault(_key(model, {'pk': instance.pk}), instance)
+    return objects[key]
@@ -0,0 +1,207 @@
+# Приём загруженных изображений.
+# LimitedUploadHandler пишет загрузку во временный файл на диске и
+# перестаёт сохранять данные после settings.IMAGE_UPLOAD_MAX_SIZE байт,
+# но считает их до конца и помечает файл как неполный (truncated).
+# Такой файл отклоняет валидатор полей моделей validate_upload (формы
+# сайта, админка, API), а хранилище core.storage его не записывает.
+# process() проверяет размер и разрешение до декодирования пикселей,
+# поворачивает изображение по EXIF, уменьшает его до
+# settings.IMAGE_MAX_SIDE и сохраняет заново без EXIF. Хранятся только
+# такие исходники, поэтому память и время на миниатюры и копии
+# ограничены.
+import base64
+import os
+import warnings
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile, File
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db.models.fields.files import FieldFile
+from PIL import Image, ImageOps
+
+# Сторона превью LQIP в пикселях: data URI получается меньше килобайта
+LQIP_SIZE = 16
+EXIF_ORIENTATION = 0x0112
+# Параметры сохранения по форматам исходника
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+    'GIF': {},
+}
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Загрузка во временный файл, не больше IMAGE_UPLOAD_MAX_SIZE байт
+    на диске; size файла - полный размер загрузки, truncated - записан
+    ли файл не целиком."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.truncated = self.received > settings.IMAGE_UPLOAD_MAX_SIZE
+        return file
+
+
+def _megabytes(size):
+    return f'{size / 2 ** 20:g} МБ'
+
+
+def check_size(upload):
+    if upload.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s',
+            code='too_large',
+            params={'limit': _megabytes(settings.IMAGE_UPLOAD_MAX_SIZE)},
+        )
+
+
+def validate_upload(file):
+    """Валидатор полей изображений моделей: новая загрузка не больше
+    IMAGE_UPLOAD_MAX_SIZE. Сохранённые файлы не проверяются."""
+    if not getattr(file, '_committed', True):
+        check_size(file.file)
+
+
+def _open(upload):
+    """Изображение с проверкой разрешения по заголовку файла."""
+    upload.seek(0)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            image = Image.open(upload)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning):
+        image = None
+    if image is None or (
+            image.width * image.height > settings.IMAGE_MAX_PIXELS):
+        raise ValidationError(
+            'Слишком большое разрешение изображения', code='too_many_pixels'
+        )
+    return image
+
+
+def process(upload):
+    """Проверенный и уменьшенный файл изображения для сохранения.
+
+    Анимированные изображения только проверяются и сохраняются как есть.
+    """
+    check_size(upload)
+    image = _open(upload)
+    # MPO - JPEG со снимками для стерео, которые пишут камеры телефонов
+    image_format = 'JPEG' if image.format == 'MPO' else image.format
+    if image_format not in SAVE_OPTIONS or (
+            image_format != 'JPEG' and getattr(image, 'is_animated', False)):
+        upload.seek(0)
+        return upload
+    icc_profile = image.info.get('icc_profile')
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(
+        (settings.IMAGE_MAX_SIDE, settings.IMAGE_MAX_SIDE), Image.LANCZOS
+    )
+    # Без EXIF: PNG иначе переносит его из info в новый файл
+    image.info.pop('exif', None)
+    options = dict(SAVE_OPTIONS[image_format])
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return ContentFile(
+        buffer.getvalue(), name=name + EXTENSIONS[image_format]
+    )
+
+
+def flatten(image):
+    """RGB без прозрачности: прозрачные области - белые."""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def oriented_size(image):
+    """Размер изображения с учётом поворота по EXIF, без декодирования."""
+    width, height = image.size
+    if image.getexif().get(EXIF_ORIENTATION) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+def describe(file):
+    """Размер, основной цвет и превью LQIP изображения.
+
+    JPEG декодируется сразу в уменьшенном виде (draft), поэтому
+    превью дешевле полного чтения файла.
+    """
+    file.seek(0)
+    image = Image.open(file)
+    width, height = oriented_size(image)
+    image.draft('RGB', (LQIP_SIZE * 4, LQIP_SIZE * 4))
+    small = flatten(ImageOps.exif_transpose(image))
+    small.thumbnail((LQIP_SIZE, LQIP_SIZE), Image.LANCZOS)
+    palette = small.quantize(colors=4)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    buffer = BytesIO()
+    small.save(buffer, 'JPEG', quality=40)
+    file.seek(0)
+    return {
+        'width': width,
+        'height': height,
+        'color': f'#{red:02x}{green:02x}{blue:02x}',
+        'lqip': 'data:image/jpeg;base64,'
+                + base64.b64encode(buffer.getvalue()).decode(),
+    }
+
+
+def is_new(file, saved_name):
+    """Изображение поля сменилось: загружен новый файл или имя другое.
+
+    file - значение поля в __dict__ модели: строка, загруженный файл
+    или FieldFile.
+    """
+    if isinstance(file, FieldFile):
+        uploaded = not file._committed
+    else:
+        uploaded = isinstance(file, File)
+    return uploaded or (getattr(file, 'name', file) or '') != saved_name
+
+
+def fill_placeholder(instance, field):
+    """Заполняет поля <field>_width, _height, _color и _lqip модели."""
+    file = getattr(instance, field)
+    info = describe(file) if file else {
+        'width': None, 'height': None, 'color': '', 'lqip': '',
+    }
+    for key, value in info.items():
+        setattr(instance, f'{field}_{key}', value)
+
+
+class IngestImageField(forms.ImageField):
+    """Поле формы, которое пропускает загрузку через process().
+
+    Размер проверяется раньше, чем ImageField открывает файл: файл
+    больше лимита сохранён не целиком.
+    """
+
+    def to_python(self, data):
+        if data and hasattr(data, 'size'):
+            check_size(data)
+        upload = super().to_python(data)
+        if upload is None:
+            return None
+        return process(upload)
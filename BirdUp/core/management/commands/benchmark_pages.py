@@ -0,0 +1,206 @@
+import json
+import platform
+import shutil
+import subprocess
+import tempfile
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+from django.utils import timezone
+
+from core.benchmark import compare, measure
+from core.query_budget import clear_caches, route_addresses
+from core.test_runner import temporary_caches
+from posts.models import Comment, Follow, Group, Post, UserCounter
+
+User = get_user_model()
+
+# Объёмы данных generate_data, которые можно задать из команды
+SEED_OPTIONS = ('users', 'groups', 'posts', 'comments', 'follows', 'seed')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет страницы posts и api на большом наборе данных: '
+        'перцентили задержки, число запросов и пик памяти в JSON. '
+        'Кэши - во временном каталоге; кроме обычного замера с тёплыми '
+        'кэшами (guest, user) каждый запрос замеряется и после очистки '
+        'кэшей (guest_cold, user_cold)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--follows', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--existing', action='store_true',
+            help='Замерять текущую базу, не создавая тестовую',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--cold-repeat', type=int, default=5,
+            help='Сколько раз замерять запрос после очистки кэшей',
+        )
+        parser.add_argument(
+            '--routes', nargs='*', default=None,
+            help='Имена маршрутов (по умолчанию - все из QUERY_BUDGETS)',
+        )
+        parser.add_argument(
+            '--output', default=None,
+            help='Файл отчёта (по умолчанию - вывод на экран)',
+        )
+        parser.add_argument(
+            '--compare', default=None,
+            help='Прошлый отчёт: команда завершится ошибкой при регрессии',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимый рост p95 относительно прошлого отчёта',
+        )
+
+    def handle(self, *args, **options):
+        # Ход замера пишется в stderr, чтобы stdout оставался чистым JSON
+        self.stderr.style_func = None
+        # Записи общих кэшей рабочей базы не должны попасть в замер
+        cache_dir = tempfile.mkdtemp(prefix='birdup-benchmark-cache-')
+        try:
+            with temporary_caches(cache_dir):
+                report = self.measure_database(options)
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(text)
+        else:
+            self.stdout.write(text)
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            regressions = compare(baseline, report, options['threshold'])
+            if regressions:
+                raise CommandError(
+                    'Регрессии производительности:\n' + '\n'.join(regressions)
+                )
+
+    def measure_database(self, options):
+        if options['existing']:
+            return self.run(options)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            call_command(
+                'generate_data', stdout=self.stderr,
+                **{name: options[name] for name in SEED_OPTIONS}
+            )
+            return self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def route_values(self):
+        """Параметры адресов: самые тяжёлые группа, автор, пост и лента."""
+        group = Group.objects.order_by('-post_count').first()
+        author = UserCounter.objects.select_related('user').order_by(
+            '-profile_post_count'
+        ).first()
+        post = Post.objects.annotate(
+            comment_count=Count('comments')
+        ).order_by('-comment_count').first()
+        reader = User.objects.filter(id__in=Follow.objects.values(
+            'user_id'
+        ).annotate(follows=Count('id')).order_by('-follows').values(
+            'user_id'
+        )[:1]).first() or User.objects.first()
+        if None in (group, author, post, reader):
+            raise CommandError('Недостаточно данных для замера')
+        values = {
+            'slug': group.slug,
+            'username': author.user.username,
+            'post_id': post.id,
+        }
+        overrides = {
+            'posts-detail': {'pk': post.id},
+            'groups-detail': {'pk': group.id},
+        }
+        own_post = Post.objects.filter(author=reader).first()
+        if own_post:
+            overrides['posts:post_edit'] = {'post_id': own_post.id}
+        comment = Comment.objects.filter(post=post).first()
+        if comment:
+            overrides['comments-detail'] = {'pk': comment.id}
+        data = {
+            'posts:post_search': {'query': post.text.split()[0]},
+            'posts:user_search': {'query': author.user.username[:3]},
+            'posts:group_search': {'query': group.title.split()[0]},
+            'users:autocomplete': {'query': author.user.username[:3]},
+            'search-posts': {'query': post.text.split()[0]},
+            'search-users': {'query': author.user.username[:3]},
+            'search-groups': {'query': group.title.split()[0]},
+        }
+        return reader, (values, overrides, data)
+
+    def run(self, options):
+        reader, route_values = self.route_values()
+        user_client = Client()
+        user_client.force_login(reader)
+        clients = {'guest': Client(), 'user': user_client}
+        routes = {}
+        # Замер не должен упираться в бюджеты запросов, а страницы для
+        # гостей - браться из кэша
+        with override_settings(
+                QUERY_BUDGET_RAISE=False, ANONYMOUS_PAGE_CACHE=False):
+            for name, address, data in route_addresses(*route_values):
+                if options['routes'] and name not in options['routes']:
+                    continue
+                self.stderr.write(name)
+                routes[name] = {}
+                for label, client in clients.items():
+                    routes[name][label] = measure(
+                        client, address, data,
+                        options['repeat'], options['warmup'],
+                    )
+                    routes[name][f'{label}_cold'] = measure(
+                        client, address, data,
+                        options['cold_repeat'], 0, clear_caches,
+                    )
+        return {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'commit': self.commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': settings.DATABASES['default']['ENGINE'],
+                'rows': {
+                    model._meta.model_name: model.objects.count()
+                    for model in (User, Group, Post, Comment, Follow)
+                },
+                'repeat': options['repeat'],
+                'cold_repeat': options['cold_repeat'],
+            },
+            'routes': routes,
+        }
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                capture_output=True, text=True, check=True,
+                cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,44 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from core import derivatives, ingest, thumbnails
+from posts.models import Post
+from users.models import Profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт недостающие миниатюры, копии и заглушки загруженных '
+        'изображений'
+    )
+
+    def handle(self, *args, **options):
+        sources = (
+            (Post, 'image', 'image_variants', thumbnails.POST_SIZES),
+            (Profile, 'photo', 'photo_variants', thumbnails.PHOTO_SIZES),
+        )
+        count = failed = 0
+        for model, field, manifest_field, sizes in sources:
+            rows = model.objects.exclude(**{field: ''}).exclude(
+                **{f'{field}__isnull': True}
+            ).values_list(field, manifest_field, f'{field}_width')
+            for name, manifest, width in rows.iterator():
+                try:
+                    if width is None:
+                        with default_storage.open(name) as file:
+                            info = ingest.describe(file)
+                        model.objects.filter(**{field: name}).update(**{
+                            f'{field}_{key}': value
+                            for key, value in info.items()
+                        })
+                    for geometry in sizes:
+                        thumbnails.generate(name, geometry)
+                    if not manifest:
+                        derivatives.update(model, field, manifest_field, name)
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+                count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено изображений: {count}, с ошибками: {failed}'
+        ))
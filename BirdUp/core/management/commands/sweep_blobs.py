@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import blobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы изображений, на которые нет ссылок дольше '
+        'BLOB_SWEEP_DELAY, с их миниатюрами и копиями'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delay', type=int, default=None,
+            help='Сколько секунд у файла не должно быть ссылок',
+        )
+
+    def handle(self, *args, **options):
+        count = blobs.sweep(options['delay'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено файлов: {count}'))
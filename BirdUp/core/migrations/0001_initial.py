@@ -0,0 +1,26 @@
+# Generated by Django 3.2.20 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Имя файла')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+            ],
+            options={
+                'verbose_name': 'Файл',
+                'verbose_name_plural': 'Файлы',
+            },
+        ),
+    ]
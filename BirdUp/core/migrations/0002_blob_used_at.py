@@ -0,0 +1,18 @@
+# Generated by Django 3.2.20 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='used_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Использован'),
+        ),
+    ]
@@ -9,3 +9,30 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class Blob(models.Model):
+    """Файл в хранилище по содержимому и число ссылок на него."""
+    name = models.CharField(
+        verbose_name='Имя файла',
+        max_length=255,
+        unique=True,
+    )
+    references = models.PositiveIntegerField(
+        verbose_name='Ссылок',
+        default=0,
+    )
+    # Когда файл последний раз сохраняли или отпускали: файл без ссылок
+    # удаляется не раньше чем через BLOB_SWEEP_DELAY (core.blobs)
+    used_at = models.DateTimeField(
+        verbose_name='Использован',
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,206 @@
+import base64
+import json
+from datetime import datetime
+from functools import reduce
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import DateTimeField, Q
+from django.utils import timezone
+
+# Сортировка по умолчанию: сначала новые, при равной дате - больший id
+ORDERING = ('-pub_date', '-id')
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(data) -> str:
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает данные курсора или None, если токен испорчен."""
+    if not token:
+        return None
+    try:
+        padding = '=' * (-len(token) % 4)
+        return json.loads(base64.urlsafe_b64decode(token + padding))
+    except (TypeError, ValueError):
+        return None
+
+
+class CursorPage:
+    """Страница без номера и без общего количества записей."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+
+    def __repr__(self):
+        return f'<CursorPage: {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self):
+        if not self.has_next_page:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1], NEXT)
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous_page:
+            return None
+        return self.paginator.cursor_for(self.object_list[0], PREVIOUS)
+
+
+class CursorPaginator:
+    """Пагинация по ключу (pub_date, id) вместо OFFSET и COUNT(*).
+
+    Страница читается одним запросом по индексу: WHERE по значениям
+    ключа последней показанной записи и LIMIT на одну запись больше
+    размера страницы, чтобы узнать, есть ли следующая.
+    """
+    cursor = True
+
+    def __init__(self, queryset, per_page, ordering=ORDERING):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = tuple(field.lstrip('-') for field in self.ordering)
+
+    def _output_field(self, name):
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return self.queryset.query.annotations[name].output_field
+
+    def _value(self, obj, name):
+        return reduce(getattr, name.split('__'), obj)
+
+    def cursor_for(self, obj, direction):
+        values = []
+        for name in self.fields:
+            value = self._value(obj, name)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            values.append(value)
+        return encode_cursor([direction, values])
+
+    def _parse(self, token):
+        data = decode_cursor(token)
+        try:
+            direction, raw_values = data
+            if direction not in (NEXT, PREVIOUS):
+                return None
+            if len(raw_values) != len(self.fields):
+                return None
+            values = [
+                self._to_python(name, value)
+                for name, value in zip(self.fields, raw_values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            return None
+        return direction, values
+
+    def _to_python(self, name, raw):
+        """Значение ключа из курсора; ValueError, если оно не может
+        быть значением поля в записи."""
+        field = self._output_field(name)
+        value = field.to_python(raw)
+        if value is None:
+            raise ValueError(f'{name}: пустое значение')
+        if isinstance(field, DateTimeField) and (
+                not isinstance(raw, str) or not isinstance(value, datetime)
+                or settings.USE_TZ and timezone.is_naive(value)):
+            raise ValueError(f'{name}: нужна дата со временем и зоной')
+        return value
+
+    def _after(self, values, reverse, ordering=None):
+        """Условие "строго после ключа" в порядке сортировки."""
+        ordering = ordering or self.ordering
+        fields = [field.lstrip('-') for field in ordering]
+        query = Q()
+        for index, field in enumerate(ordering):
+            descending = field.startswith('-') != reverse
+            suffix = 'lt' if descending else 'gt'
+            lookup = f'{fields[index]}__{suffix}'
+            equal = dict(zip(fields[:index], values))
+            query |= Q(**equal, **{lookup: values[index]})
+        return query
+
+    def _reversed(self, ordering):
+        return [
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in ordering
+        ]
+
+    def _rows(self, values, reverse, limit):
+        """Записи после ключа values: в прямом или обратном порядке."""
+        queryset = self.queryset
+        ordering = self.ordering
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse))
+        if reverse:
+            ordering = self._reversed(ordering)
+        return list(queryset.order_by(*ordering)[:limit])
+
+    def get_page(self, token=None):
+        parsed = self._parse(token)
+        limit = self.per_page + 1
+        if parsed is None:
+            rows = self._rows(None, False, limit)
+            return CursorPage(
+                rows[:self.per_page], self, len(rows) > self.per_page, False
+            )
+        direction, values = parsed
+        if direction == NEXT:
+            rows = self._rows(values, False, limit)
+            return CursorPage(
+                rows[:self.per_page], self, len(rows) > self.per_page, True
+            )
+        rows = self._rows(values, True, limit)
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(rows, self, True, has_previous)
+
+
+class CursorPaginationMixin:
+    """Курсорная пагинация для ListView.
+
+    Старая нумерованная пагинация остаётся доступной: если в запросе
+    передан параметр page, страница строится обычным Paginator.
+    """
+    cursor_ordering = ORDERING
+    cursor_kwarg = 'cursor'
+
+    def get_cursor_paginator(self, queryset, page_size):
+        return CursorPaginator(queryset, page_size, self.cursor_ordering)
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.page_kwarg in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = self.get_cursor_paginator(queryset, page_size)
+        page = paginator.get_page(self.request.GET.get(self.cursor_kwarg))
+        return (paginator, page, page.object_list, page.has_other_pages())
@@ -0,0 +1,172 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryCounter:
+    """Обёртка для connection.execute_wrapper: считает запросы и время."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                (sql, (time.perf_counter() - start) * 1000)
+            )
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def time_ms(self):
+        return sum(duration for _, duration in self.queries)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+
+def budget_for(view_name):
+    """Бюджет (запросов, миллисекунд) для имени маршрута или None."""
+    queries = settings.QUERY_BUDGETS.get(view_name)
+    if queries is None:
+        return None
+    return queries, settings.QUERY_BUDGET_TIME_MS
+
+
+def check(view_name, counter, raise_errors=None):
+    """Сверяет счётчик с бюджетом; возвращает текст нарушения или None."""
+    budget = budget_for(view_name)
+    if budget is None:
+        return None
+    queries, time_ms = budget
+    problems = []
+    if counter.count > queries:
+        problems.append(f'{counter.count} запросов при бюджете {queries}')
+    if time_ms is not None and counter.time_ms > time_ms:
+        problems.append(
+            f'{counter.time_ms:.1f} мс в БД при бюджете {time_ms} мс'
+        )
+    if not problems:
+        return None
+    message = f'{view_name}: ' + ', '.join(problems)
+    if raise_errors is None:
+        raise_errors = settings.QUERY_BUDGET_RAISE
+    if raise_errors:
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+    return message
+
+
+def iter_routes(resolver=None, namespace=None, prefix='', params=()):
+    """Все именованные маршруты: (имя, шаблон адреса, параметры)."""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        route = prefix + str(pattern.pattern)
+        route_params = set(params) | set(pattern.pattern.regex.groupindex)
+        if isinstance(pattern, URLResolver):
+            inner = namespace
+            if pattern.namespace:
+                inner = (
+                    f'{namespace}:{pattern.namespace}'
+                    if namespace else pattern.namespace
+                )
+            yield from iter_routes(pattern, inner, route, route_params)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            name = f'{namespace}:{pattern.name}' if namespace else pattern.name
+            yield name, route, route_params
+
+
+def budgeted_routes():
+    """Маршруты, для которых задан бюджет запросов."""
+    seen = set()
+    for name, route, params in iter_routes():
+        if name in settings.QUERY_BUDGETS and name not in seen:
+            seen.add(name)
+            yield name, route, params
+
+
+class QueryBudgetMiddleware:
+    """Считает SQL-запросы каждого GET-запроса и сверяет их с бюджетом
+    маршрута из settings.QUERY_BUDGETS."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        with QueryCounter() as counter:
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is not None:
+            request.query_count = counter.count
+            check(match.view_name, counter)
+        return response
+
+
+def route_addresses(values, overrides=None, data=None):
+    """Адреса маршрутов с бюджетом: (имя, адрес, GET-параметры).
+
+    values - значения параметров адреса по имени параметра
+    (slug, username, post_id...), overrides - параметры для отдельных
+    маршрутов, например {'posts-detail': {'pk': 1}}, data - GET-параметры
+    по имени маршрута. Маршруты, для которых не хватает параметров,
+    пропускаются.
+    """
+    overrides = overrides or {}
+    data = data or {}
+    for name, _, params in budgeted_routes():
+        kwargs = {
+            param: values[param] for param in params if param in values
+        }
+        kwargs.update(overrides.get(name, {}))
+        if not params <= set(kwargs):
+            continue
+        yield name, reverse(name, kwargs=kwargs), data.get(name)
+
+
+def clear_caches():
+    """Очищает все кэши из settings.CACHES."""
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+def check_routes(client, values, overrides=None, data=None):
+    """Обходит клиентом все маршруты с бюджетом.
+
+    Каждый маршрут запрашивается дважды: после очистки кэшей и сразу
+    ещё раз, с кэшами, заполненными первым запросом. Параметры - как у
+    route_addresses. Возвращает список нарушений бюджета.
+    """
+    problems = []
+    for name, address, params in route_addresses(values, overrides, data):
+        clear_caches()
+        for state in ('холодный кэш', 'тёплый кэш'):
+            with QueryCounter() as counter:
+                client.get(address, params)
+            message = check(name, counter, raise_errors=False)
+            if message:
+                problems.append(f'{message} ({state})')
+    return problems
@@ -0,0 +1,73 @@
+# Хранилище загруженных изображений по содержимому.
+# Файл называется по SHA-256 содержимого: blobs/ab/cd/<хэш>.<расширение>,
+# каталог upload_to поля и исходное имя не используются. Одинаковые
+# загрузки постов и профилей получают одно имя и один файл на диске, а
+# значит, и общие миниатюры sorl-thumbnail и копии core.derivatives,
+# которые называются по имени исходника. Сколько строк ссылается на
+# файл, считает core.blobs: файл удаляется, когда ссылок нет дольше
+# BLOB_SWEEP_DELAY.
+import hashlib
+import os
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+from .models import Blob
+
+BLOB_DIR = 'blobs'
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(digest, name):
+    extension = os.path.splitext(name)[1].lower()
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+class BlobExists(Exception):
+    pass
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, который называет файлы по содержимому и не
+    записывает файл, если такой уже есть."""
+
+    def save(self, name, content, max_length=None):
+        if getattr(content, 'truncated', False):
+            # core.ingest.LimitedUploadHandler сохранил не весь файл
+            raise SuspiciousFileOperation(
+                f'Файл {content.name} загружен не целиком'
+            )
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = blob_name(content_hash(content), name)
+        # Отметка раньше проверки файла: core.blobs.sweep не удалит его,
+        # а если уже удаляет, отметка ждёт конца удаления и файл
+        # записывается заново
+        Blob.objects.update_or_create(
+            name=name, defaults={'used_at': timezone.now()}
+        )
+        try:
+            return super().save(name, content, max_length)
+        except BlobExists:
+            return name
+
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое имя - одинаковое содержимое. Исключение прерывает и
+        # повторные попытки _save, если файл записал параллельный запрос
+        if self.exists(name):
+            raise BlobExists(name)
+        return name
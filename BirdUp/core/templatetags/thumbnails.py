@@ -0,0 +1,66 @@
+from django import template
+
+from core import conditional, derivatives, thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def ready_thumbnail(context, file_, geometry):
+    """Готовая миниатюра или None, если её ещё нет.
+
+    Отсутствующая миниатюра ставится в очередь, а шаблон показывает
+    вместо неё заглушку: страница не ждёт уменьшения изображения.
+    """
+    if not file_:
+        return None
+    thumbnail = thumbnails.cached(file_, geometry)
+    if thumbnail is None:
+        thumbnails.schedule(file_, [geometry])
+        conditional.mark_incomplete(context.get('request'))
+    return thumbnail
+
+
+@register.simple_tag
+def background_style(color='', lqip=''):
+    """Фон картинки, пока она загружается: основной цвет и размытое
+    превью LQIP из модели."""
+    layers = []
+    if lqip:
+        layers.append(f'url({lqip}) center / cover no-repeat')
+    if color:
+        layers.append(color)
+    return f'background: {" ".join(layers)};' if layers else ''
+
+
+@register.simple_tag
+def placeholder_style(geometry, width=None, height=None, color='',
+                      lqip=''):
+    """Заглушка размером с будущую миниатюру: вёрстка не сдвигается,
+    когда миниатюра появится. Без размеров изображения - по размеру
+    миниатюры."""
+    box_width, box_height = map(int, geometry.partition('x')[::2])
+    if width and height:
+        scale = min(box_width / width, box_height / height)
+        ratio, max_width = f'{width} / {height}', round(width * scale)
+    else:
+        ratio, max_width = f'{box_width} / {box_height}', box_width
+    return (
+        f'aspect-ratio: {ratio}; max-width: {max_width}px; '
+        + background_style(color, lqip)
+    )
+
+
+@register.filter
+def srcset(variants, extension):
+    return derivatives.srcset(variants, extension)
+
+
+@register.filter
+def fallback_url(variants):
+    return derivatives.fallback_url(variants)
+
+
+@register.filter
+def image_type(extension):
+    return derivatives.MIME_TYPES[extension]
@@ -6,3 +6,18 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.simple_tag(takes_context=True)
+def url_replace(context, **kwargs):
+    """GET-параметры текущего адреса с заменёнными значениями.
+
+    Параметр со значением None удаляется. Нужен ссылкам пагинации,
+    чтобы не терять остальные параметры, например поисковый запрос.
+    """
+    params = context['request'].GET.copy()
+    for key, value in kwargs.items():
+        params.pop(key, None)
+        if value is not None:
+            params[key] = value
+    return params.urlencode()
@@ -0,0 +1,40 @@
+# Запуск тестов с отдельными файлами кэшей.
+# Общие уровни кэшей - файлы в settings.CACHE_DIR, один каталог на всех
+# процессах машины. Тесты очищают кэши, поэтому на время прогона кэши
+# переносятся во временный каталог: кэш запущенного рядом сервера не
+# очищается, а состояние не переходит из прогона в прогон. Так же
+# работает замер benchmark_pages.
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def temporary_caches(directory):
+    """override_settings, переносящий кэши из CACHE_DIR в directory."""
+    caches = {}
+    for alias, config in settings.CACHES.items():
+        config = dict(config)
+        location = config.get('LOCATION', '')
+        if os.path.dirname(location) == settings.CACHE_DIR:
+            config['LOCATION'] = os.path.join(
+                directory, os.path.basename(location)
+            )
+        caches[alias] = config
+    return override_settings(CACHE_DIR=directory, CACHES=caches)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='birdup-test-cache-')
+        self.cache_settings = temporary_caches(self.cache_dir)
+        self.cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,704 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.exceptions import (SuspiciousFileOperation,
+                                    ValidationError)
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.http import Http404
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from posts.models import Comment, Group, Post, Follow
+from users.models import Profile
+from . import blobs, derivatives, identity, thumbnails
+from .cache import (LOCK_TIMEOUT, ComputeLock, TieredCache,
+                    get_or_compute)
+from .models import Blob
+from .benchmark import percentile
+from .query_budget import (QueryBudgetExceeded, check_routes,
+                           route_addresses)
+
+User = get_user_model()
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.profile = Profile.objects.create(user=cls.user)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+            creator=cls.user,
+        )
+        Follow.objects.create(user=cls.user, group=cls.group)
+        for i in range(15):
+            author = User.objects.create_user(username=f'author{i}')
+            Profile.objects.create(user=author)
+            Follow.objects.create(user=author, group=cls.group)
+            Follow.objects.create(user=cls.user, author=author)
+            post = Post.objects.create(
+                author=author, text=f'Тестовый пост {i}', group=cls.group
+            )
+            Post.objects.create(author=cls.user, text=f'Тестовый пост {i}')
+            Comment.objects.create(author=author, post=post, text='Коммент')
+        cls.post = post
+        for author in User.objects.filter(username__startswith='author'):
+            Comment.objects.create(author=author, post=post, text='Ещё')
+        cls.comment = Comment.objects.filter(post=post).first()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def route_values(self):
+        values = {
+            'slug': self.group.slug,
+            'username': self.user.username,
+            'post_id': self.post.id,
+        }
+        overrides = {
+            'posts:post_edit': {'post_id': Post.objects.filter(
+                author=self.user
+            ).first().id},
+            'posts-detail': {'pk': self.post.id},
+            'groups-detail': {'pk': self.group.id},
+            'comments-detail': {'pk': self.comment.id},
+        }
+        data = {
+            'posts:post_search': {'query': 'пост'},
+            'posts:user_search': {'query': 'author'},
+            'posts:group_search': {'query': 'группа'},
+            'users:autocomplete': {'query': 'auth'},
+            'search-posts': {'query': 'пост'},
+            'search-users': {'query': 'author'},
+            'search-groups': {'query': 'группа'},
+        }
+        return values, overrides, data
+
+    def test_every_budgeted_route_is_checked(self):
+        checked = {
+            name for name, _, _ in route_addresses(*self.route_values())
+        }
+        self.assertEqual(checked, set(settings.QUERY_BUDGETS))
+
+    def test_routes_within_budget(self):
+        for client in (Client(), self.authorized_client):
+            with self.subTest(authorized=client is self.authorized_client):
+                self.assertEqual(
+                    check_routes(client, *self.route_values()), []
+                )
+
+    @override_settings(QUERY_BUDGETS={'search-posts': 1})
+    def test_cold_cache_is_checked(self):
+        # С тёплым кэшем поиск - один запрос, с холодным - больше
+        self.assertEqual(
+            check_routes(Client(), *self.route_values()),
+            ['search-posts: 3 запросов при бюджете 1 (холодный кэш)'],
+        )
+
+    @override_settings(
+        QUERY_BUDGETS={'posts:index': 1}, QUERY_BUDGET_RAISE=True
+    )
+    def test_middleware_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.authorized_client.get('/')
+
+
+class BenchmarkTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        Profile.objects.create(user=cls.user)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            creator=cls.user,
+        )
+        Follow.objects.create(user=cls.user, group=cls.group)
+        post = Post.objects.create(
+            author=cls.user, text='Тестовый пост', group=cls.group
+        )
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+        Comment.objects.create(author=cls.user, post=post, text='Коммент')
+
+    def benchmark(self, *args):
+        out = StringIO()
+        call_command(
+            'benchmark_pages', '--existing', '--repeat', '2',
+            '--warmup', '0', *args, stdout=out, stderr=StringIO(),
+        )
+        return out.getvalue()
+
+    def test_percentile(self):
+        self.assertEqual(percentile([3, 1, 2], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2.5)
+        self.assertEqual(percentile([5], 99), 5)
+
+    def test_report(self):
+        report = json.loads(self.benchmark(
+            '--routes', 'posts:index', 'posts-list', 'search-posts',
+            '--warmup', '1',
+        ))
+        self.assertEqual(
+            set(report['routes']),
+            {'posts:index', 'posts-list', 'search-posts'},
+        )
+        results = report['routes']['posts:index']
+        self.assertEqual(
+            set(results), {'guest', 'user', 'guest_cold', 'user_cold'}
+        )
+        result = results['user']
+        self.assertEqual(result['status'], 200)
+        for key in ('p50_ms', 'p95_ms', 'queries', 'peak_memory_kb'):
+            self.assertIn(key, result)
+        # Найденные id берутся из кэша только в тёплом замере
+        search = report['routes']['search-posts']
+        self.assertGreater(
+            search['guest_cold']['queries'], search['guest']['queries']
+        )
+
+    def test_caches_are_isolated(self):
+        cache.set('marker', 1)
+        self.benchmark('--routes', 'posts:index')
+        self.assertEqual(cache.get('marker'), 1)
+
+    def test_compare_fails_on_regression(self):
+        baseline = json.loads(self.benchmark('--routes', 'posts:index'))
+        baseline['routes']['posts:index']['guest']['queries'] -= 1
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as file:
+            json.dump(baseline, file)
+            file.flush()
+            with self.assertRaises(CommandError):
+                self.benchmark(
+                    '--routes', 'posts:index', '--compare', file.name
+                )
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.profile = Profile.objects.create(user=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Хранилище ключей sorl-thumbnail кэширует записи, а файлы с
+        # одинаковым содержимым в разных тестах получают одно имя
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def upload(self, name):
+        return SimpleUploadedFile(name, SMALL_GIF, content_type='image/gif')
+
+    def test_page_does_not_wait_for_thumbnail(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=self.upload('cold.gif')
+        )
+        address = reverse('posts:post_detail', args=[post.id])
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.authorized_client.get(address)
+        self.assertContains(response, 'aspect-ratio: 2 / 1')
+        self.assertIsNone(thumbnails.cached(post.image, '1280x720'))
+        for callback in callbacks:
+            callback()
+        thumbnail = thumbnails.cached(post.image, '1280x720')
+        self.assertIsNotNone(thumbnail)
+        response = self.authorized_client.get(address)
+        self.assertContains(response, thumbnail.url)
+
+    def test_upload_generates_all_sizes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.authorized_client.post(reverse('posts:create'), {
+                'text': 'Пост с картинкой',
+                'image': self.upload('post.gif'),
+            })
+            self.profile.photo = self.upload('photo.gif')
+            self.profile.save()
+        post = Post.objects.get(text='Пост с картинкой')
+        for image, sizes in (
+            (post.image, thumbnails.POST_SIZES),
+            (self.profile.photo, thumbnails.PHOTO_SIZES),
+        ):
+            for geometry in sizes:
+                with self.subTest(image=image.name, geometry=geometry):
+                    self.assertIsNotNone(thumbnails.cached(image, geometry))
+        with patch('core.thumbnails.submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.profile.about = 'О себе'
+                self.profile.save()
+        submit.assert_not_called()
+
+    def test_generate_thumbnails_command(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=self.upload('old.gif')
+        )
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertIsNotNone(thumbnails.cached(post.image, '1280x720'))
+
+    def test_responsive_variants(self):
+        buffer = BytesIO()
+        Image.new('RGB', (700, 400), 'green').save(buffer, 'PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                author=self.user, text='Пост', image=SimpleUploadedFile(
+                    'wide.png', buffer.getvalue(), content_type='image/png'
+                )
+            )
+        post.refresh_from_db()
+        manifest = post.image_variants
+        self.assertEqual(manifest['w'], [320, 640])
+        self.assertEqual(manifest['f'], ['webp', 'jpg'])
+        for width in manifest['w']:
+            for extension in manifest['f']:
+                name = derivatives.variant_name(
+                    manifest['base'], width, extension
+                )
+                with default_storage.open(name) as file:
+                    self.assertEqual(Image.open(file).width, width)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, derivatives.srcset(manifest, 'webp'))
+        self.assertContains(response, derivatives.fallback_url(manifest))
+        with self.captureOnCommitCallbacks() as callbacks:
+            post.image = self.upload('new.gif')
+            post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, {})
+        for callback in callbacks:
+            callback()
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants['w'], [2])
+
+    def test_prefetch_page_thumbnails(self):
+        posts = []
+        for color in ('red', 'green', 'blue'):
+            buffer = BytesIO()
+            Image.new('RGB', (4, 3), color).save(buffer, 'PNG')
+            posts.append(Post.objects.create(
+                author=self.user, text='Пост', image=SimpleUploadedFile(
+                    f'{color}.png', buffer.getvalue(),
+                    content_type='image/png',
+                )
+            ))
+        for post in posts[:2]:
+            thumbnails.generate(post.image.name, '1280x720')
+        cache.clear()
+        images = [
+            Post.objects.get(pk=post.pk).image for post in posts
+        ]
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(images, '1280x720')
+        with self.assertNumQueries(0):
+            found = [
+                thumbnails.cached(image, '1280x720') for image in images
+            ]
+        self.assertIsNotNone(found[0])
+        self.assertIsNotNone(found[1])
+        self.assertIsNone(found[2])
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(images[2:], '1280x720')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, found[0].url)
+
+    def test_placeholder_fields(self):
+        buffer = BytesIO()
+        image = Image.new('RGBA', (300, 200), (0, 0, 0, 0))
+        image.paste((200, 30, 30, 255), (0, 0, 250, 200))
+        image.save(buffer, 'PNG')
+        with self.captureOnCommitCallbacks() as callbacks:
+            post = Post.objects.create(
+                author=self.user, text='Пост', image=SimpleUploadedFile(
+                    'red.png', buffer.getvalue(), content_type='image/png'
+                )
+            )
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (300, 200))
+        self.assertEqual(post.image_color, '#c81e1e')
+        self.assertTrue(post.image_lqip.startswith('data:image/jpeg;base64,'))
+        address = reverse('posts:post_detail', args=[post.id])
+        response = self.authorized_client.get(address)
+        self.assertContains(response, 'aspect-ratio: 300 / 200')
+        self.assertContains(response, post.image_lqip)
+        for callback in callbacks:
+            callback()
+        response = self.authorized_client.get(address)
+        self.assertContains(response, 'width="300" height="200"')
+        Post.objects.filter(pk=post.pk).update(image_width=None)
+        call_command('generate_thumbnails', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.image_width, 300)
+        post.image = None
+        post.save()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_lqip, '')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class IngestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        Profile.objects.create(user=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self, content, name='photo.jpg'):
+        return self.authorized_client.post(reverse('posts:create'), {
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, content),
+        })
+
+    def encode(self, image, image_format='JPEG', **options):
+        buffer = BytesIO()
+        image.save(buffer, image_format, **options)
+        return buffer.getvalue()
+
+    @override_settings(IMAGE_MAX_SIDE=100)
+    def test_original_is_rotated_downscaled_and_stripped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Camera'
+        self.create_post(self.encode(
+            Image.new('RGB', (400, 200), 'red'), exif=exif.tobytes()
+        ))
+        post = Post.objects.get(text='Пост с картинкой')
+        with default_storage.open(post.image.name) as file:
+            image = Image.open(file)
+            self.assertEqual(image.size, (50, 100))
+            self.assertEqual(dict(image.getexif()), {})
+
+    def test_admin_rejects_truncated_upload(self):
+        admin = User.objects.create_superuser('admin', 'admin@birdup.ru')
+        client = Client()
+        client.force_login(admin)
+        content = self.encode(Image.new('RGB', (40, 40), 'red'))
+        with override_settings(IMAGE_UPLOAD_MAX_SIZE=len(content) - 1):
+            response = client.post(reverse('admin:posts_post_add'), {
+                'text': 'Пост из админки',
+                'author': self.user.id,
+                'image': SimpleUploadedFile('photo.jpg', content),
+            })
+        self.assertContains(response, 'Файл больше')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=3)
+    def test_truncated_upload_is_refused(self):
+        upload = SimpleUploadedFile('photo.jpg', b'part')
+        upload.truncated = True
+        post = Post(author=self.user, text='Пост', image=upload)
+        with self.assertRaises(ValidationError):
+            post.full_clean()
+        storage = Post._meta.get_field('image').storage
+        with self.assertRaises(SuspiciousFileOperation):
+            storage.save('photo.jpg', upload)
+
+    def test_limits(self):
+        content = self.encode(Image.new('RGB', (40, 40), 'red'))
+        limits = {
+            'Файл больше': {'IMAGE_UPLOAD_MAX_SIZE': len(content) - 1},
+            'Слишком большое разрешение': {'IMAGE_MAX_PIXELS': 1000},
+        }
+        for message, limit in limits.items():
+            with self.subTest(message=message), override_settings(**limit):
+                response = self.create_post(content)
+                self.assertContains(response, message)
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class BlobTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.profile = Profile.objects.create(user=cls.user)
+        buffer = BytesIO()
+        Image.new('RGB', (400, 300), 'blue').save(buffer, 'PNG')
+        cls.content = buffer.getvalue()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def upload(self, name, content=None):
+        return SimpleUploadedFile(name, content or self.content)
+
+    def create_post(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(
+                author=self.user, text='Мем', image=self.upload(name)
+            )
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.create_post('meme.png')
+        with patch.object(derivatives, '_save') as save:
+            second = self.create_post('meme-copy.PNG')
+        save.assert_not_called()
+        self.profile.photo = self.upload('avatar.png')
+        self.profile.save()
+        name = first.image.name
+        self.assertEqual(second.image.name, name)
+        self.assertEqual(self.profile.photo.name, name)
+        self.assertEqual(
+            len(default_storage.listdir(os.path.dirname(name))[1]), 1
+        )
+        second.refresh_from_db()
+        self.assertEqual(second.image_variants['w'], [320])
+        self.assertEqual(Blob.objects.get(name=name).references, 3)
+
+        first.delete()
+        self.profile.photo = self.upload('other.gif', SMALL_GIF)
+        self.profile.save()
+        self.assertEqual(Blob.objects.get(name=name).references, 1)
+        self.assertTrue(default_storage.exists(name))
+        second.delete()
+        # Без ссылок файл живёт ещё BLOB_SWEEP_DELAY
+        call_command('sweep_blobs', stdout=StringIO())
+        self.assertTrue(default_storage.exists(name))
+        call_command('sweep_blobs', delay=0, stdout=StringIO())
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+        self.assertFalse(default_storage.exists(name))
+        variant = derivatives.variant_name(
+            second.image_variants['base'], 320, 'webp'
+        )
+        self.assertFalse(default_storage.exists(variant))
+
+    def test_upload_of_unused_file_keeps_it(self):
+        name = self.create_post('meme.png').image.name
+        Post.objects.all().delete()
+        # Загрузка того же содержимого отмечает файл до его ссылки
+        storage = Post._meta.get_field('image').storage
+        self.assertEqual(storage.save('again.png', self.upload('x.png')), name)
+        self.assertEqual(blobs.sweep(delay=60), 0)
+        self.assertTrue(default_storage.exists(name))
+        # Файл, удалённый до загрузки, записывается заново
+        blobs.sweep(delay=0)
+        self.assertEqual(storage.save('again.png', self.upload('x.png')), name)
+        self.assertTrue(default_storage.exists(name))
+
+
+class TieredCacheTest(TestCase):
+    """Два экземпляра с разной памятью и общим кэшем - как два воркера."""
+
+    def setUp(self):
+        self.first, self.second = (
+            TieredCache(location, {'OPTIONS': {
+                'SHARED': 'shared', 'MAX_ENTRIES': 2, 'SYNC_INTERVAL': 0,
+            }})
+            for location in ('test-first', 'test-second')
+        )
+        self.first.clear()
+        self.second.clear()
+
+    def test_changes_reach_other_process(self):
+        self.first.set('feed', [1, 2])
+        self.assertEqual(self.second.get('feed'), [1, 2])
+        self.first.set('feed', [3])
+        self.assertEqual(self.second.get('feed'), [3])
+        self.second.delete('feed')
+        self.assertIsNone(self.first.get('feed'))
+        self.first.set('count', 1)
+        self.assertEqual(self.second.get('count'), 1)
+        self.first.incr('count')
+        self.assertEqual(self.second.get('count'), 2)
+        self.first.clear()
+        self.assertIsNone(self.second.get('count'))
+
+    def test_local_lru_and_stats(self):
+        self.first.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.first.get_many(['a', 'b']), {'a': 1, 'b': 2})
+        self.first.set('c', 3)
+        self.assertEqual(self.first.get('a'), 1)
+        self.assertEqual(self.first.get('missing', 'default'), 'default')
+        self.assertEqual(self.first.stats.as_dict(), {
+            'local': {'hits': 2, 'misses': 2, 'hit_rate': 0.5},
+            'shared': {'hits': 1, 'misses': 1, 'hit_rate': 0.5},
+        })
+
+    def test_stats_view(self):
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        client = Client()
+        client.force_login(staff)
+        cache.get('key')
+        response = client.get(reverse('posts:cache_stats'))
+        self.assertEqual(
+            set(response.json()), {'default', 'search', 'pages'}
+        )
+
+
+class GetOrComputeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        time.sleep(0.2)
+        return self.calls
+
+    def test_one_caller_computes_missing_key(self):
+        for _ in range(3):
+            cache.clear()
+            self.calls = 0
+            results = []
+            barrier = threading.Barrier(8)
+
+            def read():
+                barrier.wait()
+                results.append(
+                    get_or_compute(cache, 'page', self.compute, 60)
+                )
+
+            threads = [threading.Thread(target=read) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(self.calls, 1)
+            self.assertEqual(results, [1] * 8)
+
+    def test_lock_of_other_process(self):
+        # Файл блокировки, как если бы пересчёт шёл в другом процессе
+        path = ComputeLock(cache, 'page')._lock_file()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as lock_file:
+            lock_file.write('other')
+        cache.set('page', ('old', time.time() - 1, 0.1), 60)
+        self.assertEqual(
+            get_or_compute(cache, 'page', self.compute, 60), 'old'
+        )
+        self.assertEqual(self.calls, 0)
+        # Блокировка упавшего процесса снимается по сроку
+        expired = time.time() - LOCK_TIMEOUT - 1
+        os.utime(path, (expired, expired))
+        self.assertEqual(get_or_compute(cache, 'page', self.compute, 60), 1)
+        self.assertFalse(os.path.exists(path))
+
+    def test_stale_value_while_refreshing(self):
+        cache.set('page', ('old', time.time() - 1, 0.1), 60)
+        lock = ComputeLock(cache, 'page')
+        self.assertTrue(lock.acquire())
+        self.assertEqual(
+            get_or_compute(cache, 'page', self.compute, 60), 'old'
+        )
+        lock.release()
+        self.assertEqual(get_or_compute(cache, 'page', self.compute, 60), 1)
+        self.assertEqual(get_or_compute(cache, 'page', self.compute, 60), 1)
+
+    def test_early_refresh(self):
+        cache.set('page', ('old', time.time() + 30, 10), 90)
+        with patch('core.cache.random.random', return_value=0.5):
+            self.assertEqual(
+                get_or_compute(cache, 'page', self.compute, 60), 'old'
+            )
+        with patch('core.cache.random.random', return_value=0.99):
+            self.assertEqual(
+                get_or_compute(cache, 'page', self.compute, 60), 1
+            )
+
+
+class IdentityMapTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        Profile.objects.create(user=cls.user)
+        cls.group = Group.objects.create(
+            title='Птицы', slug='birds', creator=cls.user
+        )
+        Follow.objects.create(user=cls.user, group=cls.group)
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def test_object_loaded_once_per_request(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with self.assertNumQueries(1):
+            group = identity.get_object(request, Group, slug='birds')
+            self.assertIs(
+                identity.get_object(request, Group, slug='birds'), group
+            )
+            self.assertIs(
+                identity.get_object(request, Group, id=group.id), group
+            )
+            self.assertIs(
+                identity.get_object(request, User, pk=self.user.pk),
+                self.user,
+            )
+        with self.assertRaises(Http404):
+            identity.get_object(request, Group, slug='missing')
+        other_request = RequestFactory().get('/')
+        with self.assertNumQueries(1):
+            identity.get_object(other_request, Group, slug='birds')
+
+    def lookups(self, condition, method, address, data=None):
+        """Сколько раз запрос к странице искал объект по условию."""
+        client = Client()
+        client.force_login(self.user)
+        with CaptureQueriesContext(connection) as context:
+            getattr(client, method)(address, data)
+        return sum(
+            query['sql'].startswith('SELECT') and condition in query['sql']
+            for query in context.captured_queries
+        )
+
+    def test_views(self):
+        edit = reverse('posts:post_edit', args=[self.post.id])
+        by_id = f'WHERE "posts_post"."id" = {self.post.id}'
+        self.assertEqual(self.lookups(by_id, 'get', edit), 1)
+        self.assertEqual(
+            self.lookups(by_id, 'post', edit, {'text': 'Новый'}), 1
+        )
+        group_post = reverse('posts:group_post', args=['birds'])
+        by_slug = 'WHERE "posts_group"."slug" = '
+        self.assertEqual(
+            self.lookups(by_slug, 'post', group_post, {'text': 'В'}), 1
+        )
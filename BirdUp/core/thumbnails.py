@@ -0,0 +1,139 @@
+# Миниатюры изображений без ожидания при показе страницы.
+# Шаблоны берут миниатюру тегом ready_thumbnail: он только читает
+# хранилище ключей sorl-thumbnail и, если миниатюры ещё нет, ставит её
+# в очередь и показывает заглушку. Создаёт миниатюры пул фоновых
+# потоков (core.background); после загрузки изображения все его размеры
+# (POST_SIZES, PHOTO_SIZES) ставятся в очередь сразу (сигналы posts и
+# users), поэтому к первому показу страницы они обычно уже готовы. Для
+# страницы постов prefetch() находит все миниатюры одним чтением кэша и
+# одним запросом к базе вместо запроса на каждый пост.
+from django.db import transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from . import background
+
+# Параметры всех миниатюр сайта
+OPTIONS = {'upscale': True}
+# Размеры, которые используют шаблоны
+POST_SIZES = ('1280x720',)
+PHOTO_SIZES = ('1280x720', '720x720', '27x27')
+
+QUEUE = background.Queue(
+    'thumbnails', 'THUMBNAIL_WORKERS', 'THUMBNAIL_ASYNC'
+)
+
+
+def _options(source, options):
+    """Параметры с умолчаниями так же, как в ThumbnailBackend."""
+    options = dict(options)
+    backend = default.backend
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return options
+
+
+def _thumbnail_file(file_, geometry):
+    """Миниатюра, под которой sorl-thumbnail хранит запись о ней."""
+    # Ключ sorl-thumbnail зависит от хранилища исходника: миниатюры
+    # всегда создаются по имени файла в хранилище по умолчанию
+    source = ImageFile(file_name(file_))
+    name = default.backend._get_thumbnail_filename(
+        source, geometry, _options(source, OPTIONS)
+    )
+    return ImageFile(name, default.storage)
+
+
+def cached(file_, geometry):
+    """Готовая миниатюра из хранилища ключей или None; изображение
+    при этом не читается и не уменьшается."""
+    prefetched = getattr(file_, 'prefetched_thumbnails', {})
+    if geometry in prefetched:
+        return prefetched[geometry]
+    return default.kvstore.get(_thumbnail_file(file_, geometry))
+
+
+def prefetch(files, geometry):
+    """Находит готовые миниатюры нескольких изображений разом.
+
+    Записи читаются из кэша хранилища ключей одним get_many, а
+    недостающие - одним запросом к базе. Результат запоминается в
+    файлах (FieldFile) и используется cached().
+    """
+    kvstore = default.kvstore
+    files = [file_ for file_ in files if file_]
+    if not files or not isinstance(kvstore, CachedDBStore):
+        return
+    keys = {}
+    for file_ in files:
+        key = add_prefix(_thumbnail_file(file_, geometry).key)
+        keys.setdefault(key, []).append(file_)
+    values = kvstore.cache.get_many(list(keys))
+    missing = [key for key in keys if key not in values]
+    if missing:
+        rows = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        found = {key: rows.get(key, EMPTY_VALUE) for key in missing}
+        # Как KVStore._get_raw: отсутствие записи тоже кэшируется
+        kvstore.cache.set_many(
+            found, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(found)
+    for key, same_files in keys.items():
+        value = values[key]
+        thumbnail = (
+            None if value == EMPTY_VALUE else deserialize_image_file(value)
+        )
+        for file_ in same_files:
+            if not hasattr(file_, 'prefetched_thumbnails'):
+                file_.prefetched_thumbnails = {}
+            file_.prefetched_thumbnails[geometry] = thumbnail
+
+
+def generate(name, geometry):
+    """Создаёт миниатюру, если её нет."""
+    get_thumbnail(name, geometry, **OPTIONS)
+
+
+def submit(key, function, *args):
+    """Ставит function(*args) в очередь миниатюр. При THUMBNAIL_ASYNC =
+    False задача выполняется сразу.
+    """
+    QUEUE.submit(key, function, *args)
+
+
+def enqueue(name, geometry):
+    """Ставит миниатюру в очередь."""
+    submit(('thumbnail', name, geometry), generate, name, geometry)
+
+
+def file_name(value):
+    """Имя файла из значения поля: FieldFile, строки или None."""
+    return getattr(value, 'name', value) or ''
+
+
+def schedule(image, sizes):
+    """Размеры изображения - в очередь после фиксации транзакции, когда
+    файл и запись о нём уже видны фоновому потоку."""
+    name = file_name(image)
+    if not name:
+        return
+
+    def enqueue_all():
+        for geometry in sizes:
+            enqueue(name, geometry)
+
+    transaction.on_commit(enqueue_all)
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.db import models
+from core.ingest import IngestImageField
 from .models import Post, Group
 
 
@@ -14,6 +16,9 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    formfield_overrides = {
+        models.ImageField: {'form_class': IngestImageField},
+    }
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -0,0 +1,184 @@
+# Анализ текста для полнотекстового поиска.
+# Текст проходит цепочку шагов из settings.SEARCH_ANALYZER: каждый шаг -
+# функция, которая получает список слов и возвращает новый. Первый шаг
+# получает исходный текст. Одна и та же цепочка обрабатывает и
+# индексируемые тексты, и поисковые запросы, поэтому после её смены
+# индекс нужно перестроить командой rebuild_search_index.
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile(r'^[а-я]+$')
+
+STOPWORDS = frozenset((
+    'а', 'без', 'более', 'больше', 'будет', 'будто', 'бы', 'был', 'была',
+    'были', 'было', 'быть', 'в', 'вам', 'вас', 'ведь', 'весь', 'во',
+    'вот', 'впрочем', 'все', 'всегда', 'всего', 'всех', 'всю', 'вы',
+    'где', 'да', 'даже', 'для', 'до', 'другой', 'его', 'ее', 'ей', 'ему',
+    'если', 'есть', 'еще', 'ж', 'же', 'за', 'зачем', 'здесь', 'и', 'из',
+    'или', 'им', 'иногда', 'их', 'к', 'как', 'какая', 'какой', 'когда',
+    'конечно', 'кто', 'куда', 'ли', 'лучше', 'между', 'меня', 'мне',
+    'много', 'может', 'можно', 'мой', 'моя', 'мы', 'на', 'над', 'надо',
+    'наконец', 'нас', 'не', 'него', 'нее', 'ней', 'нельзя', 'нет', 'ни',
+    'нибудь', 'никогда', 'ним', 'них', 'ничего', 'но', 'ну', 'о', 'об',
+    'один', 'он', 'она', 'они', 'опять', 'от', 'перед', 'по', 'под',
+    'после', 'потом', 'потому', 'почти', 'при', 'про', 'раз', 'разве',
+    'с', 'сам', 'свою', 'себе', 'себя', 'сейчас', 'со', 'совсем', 'так',
+    'такой', 'там', 'тебя', 'тем', 'теперь', 'то', 'тогда', 'того',
+    'тоже', 'только', 'том', 'тот', 'три', 'тут', 'ты', 'у', 'уж', 'уже',
+    'хоть', 'чего', 'чем', 'через', 'что', 'чтоб', 'чтобы', 'чуть',
+    'эти', 'этого', 'этой', 'этом', 'этот', 'эту', 'я',
+))
+
+
+def tokenize(text):
+    return WORD.findall(text or '')
+
+
+def lowercase(words):
+    return [word.casefold() for word in words]
+
+
+def fold_yo(words):
+    return [word.replace('ё', 'е') for word in words]
+
+
+def remove_stopwords(words):
+    return [word for word in words if word not in STOPWORDS]
+
+
+def stem(words):
+    return [stem_word(word) for word in words]
+
+
+@lru_cache(maxsize=None)
+def _pipeline(paths):
+    return [import_string(path) for path in paths]
+
+
+def analyze(text):
+    """Слова текста после всех шагов анализа."""
+    steps = _pipeline(tuple(settings.SEARCH_ANALYZER))
+    words = steps[0](text)
+    for step in steps[1:]:
+        words = step(words)
+    return words
+
+
+def analyze_text(text):
+    """Результат анализа одной строкой: её индексирует FTS5."""
+    return ' '.join(analyze(text))
+
+
+# Стеммер Snowball для русского языка
+# (https://snowballstem.org/algorithms/russian/stemmer.html).
+# Окончания каждой группы перечислены от длинных к коротким.
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = (
+    ('вшись', 'вши', 'в'),
+    ('ившись', 'ывшись', 'ивши', 'ывши', 'ив', 'ыв'),
+)
+ADJECTIVE = (
+    'ими', 'ыми', 'его', 'ого', 'ему', 'ому', 'ее', 'ие', 'ые', 'ое',
+    'ей', 'ий', 'ый', 'ой', 'ем', 'им', 'ым', 'ом', 'их', 'ых', 'ую',
+    'юю', 'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ('ся', 'сь')
+VERB = (
+    ('ете', 'йте', 'ешь', 'нно', 'ла', 'на', 'ли', 'ем', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'й', 'л', 'н'),
+    ('ейте', 'уйте', 'ила', 'ыла', 'ена', 'ите', 'или', 'ыли', 'ило',
+     'ыло', 'ено', 'ует', 'уют', 'ены', 'ить', 'ыть', 'ишь', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ят', 'ит', 'ыт', 'ую', 'ю'),
+)
+NOUN = (
+    'иями', 'ями', 'ами', 'ией', 'иям', 'ием', 'иях', 'ев', 'ов', 'ие',
+    'ье', 'еи', 'ии', 'ей', 'ой', 'ий', 'ям', 'ем', 'ам', 'ом', 'ах',
+    'ях', 'ию', 'ью', 'ия', 'ья', 'а', 'е', 'и', 'й', 'о', 'у', 'ы',
+    'ь', 'ю', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+
+def _regions(word):
+    """Начала областей RV и R2."""
+    rv = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word)
+    )
+
+    def after_consonant(start):
+        for i in range(start + 1, len(word)):
+            if word[i] not in VOWELS and word[i - 1] in VOWELS:
+                return i + 1
+        return len(word)
+
+    return rv, after_consonant(after_consonant(0))
+
+
+def _remove(word, start, endings):
+    """Убирает самое длинное окончание, целиком лежащее после start."""
+    for ending in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= start:
+            return word[:-len(ending)], True
+    return word, False
+
+
+def _remove_grouped(word, start, groups):
+    """Окончания первой группы убираются только после а или я."""
+    first, second = groups
+    matches = []
+    for ending in first:
+        cut = len(word) - len(ending)
+        if (word.endswith(ending) and cut - 1 >= start
+                and word[cut - 1] in 'ая'):
+            matches.append(ending)
+    for ending in second:
+        if word.endswith(ending) and len(word) - len(ending) >= start:
+            matches.append(ending)
+    if not matches:
+        return word, False
+    return word[:-len(max(matches, key=len))], True
+
+
+def _remove_adjectival(word, start):
+    word, found = _remove(word, start, ADJECTIVE)
+    if found:
+        word, _ = _remove_grouped(word, start, PARTICIPLE)
+    return word, found
+
+
+@lru_cache(maxsize=100000)
+def stem_word(word):
+    """Основа русского слова; слова не на кириллице не меняются."""
+    if not CYRILLIC.match(word):
+        return word
+    rv, r2 = _regions(word)
+    word, found = _remove_grouped(word, rv, PERFECTIVE_GERUND)
+    if not found:
+        word, _ = _remove(word, rv, REFLEXIVE)
+        for step in (
+            _remove_adjectival,
+            lambda word, start: _remove_grouped(word, start, VERB),
+            lambda word, start: _remove(word, start, NOUN),
+        ):
+            word, found = step(word, rv)
+            if found:
+                break
+    word, _ = _remove(word, rv, ('и',))
+    word, _ = _remove(word, r2, DERIVATIONAL)
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        return word[:-1]
+    word, found = _remove(word, rv, SUPERLATIVE)
+    if found and word.endswith('нн'):
+        return word[:-1]
+    if not found:
+        word, _ = _remove(word, rv, ('ь',))
+    return word
@@ -1,5 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from . import signals
+        post_migrate.connect(signals.install_search, sender=self)
+        post_migrate.connect(signals.invalidate_all_pages, sender=self)
@@ -0,0 +1,154 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Follow, Group, Post, UserCounter
+
+User = get_user_model()
+
+# Сколько строк repair() читает и записывает за раз
+BATCH_SIZE = 1000
+
+
+def _changes(deltas):
+    return {
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items() if delta
+    }
+
+
+def _bump_group(group_id, **deltas):
+    Group.objects.filter(id=group_id).update(**_changes(deltas))
+
+
+def _bump_user(user_id, **deltas):
+    changes = _changes(deltas)
+    if not changes or UserCounter.objects.filter(
+        user_id=user_id
+    ).update(**changes):
+        return
+    if any(delta < 0 for delta in deltas.values()):
+        # Счётчика нет, уменьшать нечего: его соберёт repair()
+        return
+    counter, created = UserCounter.objects.get_or_create(
+        user_id=user_id, defaults=deltas
+    )
+    if not created:
+        UserCounter.objects.filter(user_id=user_id).update(**changes)
+
+
+def for_user(user):
+    """Счётчики пользователя; нули, если записи ещё нет."""
+    try:
+        return user.counters
+    except UserCounter.DoesNotExist:
+        return UserCounter(user=user)
+
+
+def post_added(post, sign=1):
+    _bump_user(
+        post.author_id,
+        post_count=sign,
+        profile_post_count=sign if post.group_id is None else 0,
+    )
+    if post.group_id:
+        _bump_group(post.group_id, post_count=sign)
+
+
+def post_removed(post):
+    post_added(post, sign=-1)
+
+
+def post_moved(post, old_group_id):
+    """Пост перенесён из группы old_group_id в post.group_id."""
+    profile_delta = 0
+    if old_group_id:
+        _bump_group(old_group_id, post_count=-1)
+    else:
+        profile_delta -= 1
+    if post.group_id:
+        _bump_group(post.group_id, post_count=1)
+    else:
+        profile_delta += 1
+    _bump_user(post.author_id, profile_post_count=profile_delta)
+
+
+def group_removed(group):
+    """Посты удаляемой группы остаются у авторов без группы."""
+    authors = group.group_posts.values('author_id').annotate(
+        posts=Count('id')
+    )
+    for row in authors:
+        _bump_user(row['author_id'], profile_post_count=row['posts'])
+
+
+def follow_added(follow, sign=1):
+    if follow.author_id:
+        _bump_user(follow.author_id, follower_count=sign)
+    if follow.group_id:
+        _bump_group(follow.group_id, follower_count=sign)
+
+
+def follow_removed(follow):
+    follow_added(follow, sign=-1)
+
+
+def _count_by(queryset, field):
+    """Число строк queryset по значениям field одним GROUP BY."""
+    # order_by() без полей: сортировка модели попала бы в GROUP BY
+    rows = queryset.filter(**{f'{field}__isnull': False}).order_by()
+    return dict(rows.values(field).annotate(
+        count=Count('id')
+    ).values_list(field, 'count'))
+
+
+def _batches(queryset):
+    ids = list(queryset.values_list('pk', flat=True))
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def repair():
+    """Пересчитывает все счётчики по исходным данным.
+
+    Каждое число считается отдельным GROUP BY: в одном запросе
+    соединения постов и подписчиков дали бы их произведение строк.
+    """
+    fields = ('post_count', 'follower_count')
+    counts = dict(zip(fields, (
+        _count_by(Post.objects, 'group_id'),
+        _count_by(Follow.objects, 'group_id'),
+    )))
+    for ids in _batches(Group.objects):
+        changed = []
+        for group in Group.objects.filter(id__in=ids).only('id', *fields):
+            values = {
+                field: counts[field].get(group.id, 0) for field in fields
+            }
+            if values != {field: getattr(group, field) for field in fields}:
+                changed.append(Group(id=group.id, **values))
+        Group.objects.bulk_update(changed, fields)
+
+    fields = ('post_count', 'profile_post_count', 'follower_count')
+    counts = dict(zip(fields, (
+        _count_by(Post.objects, 'author_id'),
+        _count_by(Post.objects.filter(group__isnull=True), 'author_id'),
+        _count_by(Follow.objects, 'author_id'),
+    )))
+    for ids in _batches(User.objects):
+        existing = UserCounter.objects.in_bulk(ids)
+        changed, created = [], []
+        for user_id in ids:
+            counter = UserCounter(user_id=user_id, **{
+                field: counts[field].get(user_id, 0) for field in fields
+            })
+            old = existing.get(user_id)
+            if old is None:
+                created.append(counter)
+            elif any(
+                getattr(old, field) != getattr(counter, field)
+                for field in fields
+            ):
+                changed.append(counter)
+        UserCounter.objects.bulk_create(created)
+        UserCounter.objects.bulk_update(changed, fields)
@@ -0,0 +1,250 @@
+# Лента подписок: гибридная раздача постов.
+# Посты авторов и небольших групп раскладываются по лентам подписчиков
+# при публикации (push). Посты групп, у которых подписчиков больше
+# settings.FEED_FANOUT_THRESHOLD, в ленты не пишутся, а подмешиваются
+# при чтении ленты (pull): иначе одна запись превращалась бы в десятки
+# тысяч вставок.
+# Режим хранится в Group.feed_pulled. Обратно в push-режим группа
+# переходит, только когда подписчиков станет не больше
+# settings.FEED_PUSH_THRESHOLD: подписка и отписка на границе не
+# переключают режим туда и обратно. Раздача уже опубликованных постов
+# при этом идёт в фоне (push_group) или командой backfill_timeline.
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from core import background
+from core.pagination import CursorPaginator
+from .models import Follow, Group, Post, PostQuerySet, Timeline
+
+# Размер пачки при массовой записи в ленту
+BATCH_SIZE = 1000
+# Раздача постов группы при возврате в push-режим
+QUEUE = background.Queue('feed', 'FEED_WORKERS', 'FEED_ASYNC')
+
+
+def _entries(user_id, posts):
+    return (
+        Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.values_list('id', 'pub_date')
+    )
+
+
+def _group_state(group_id):
+    """Число подписчиков группы и её режим."""
+    return Group.objects.filter(id=group_id).values_list(
+        'follower_count', 'feed_pulled'
+    ).first() or (0, False)
+
+
+def is_large_group(group_id):
+    return large_groups().filter(id=group_id).exists()
+
+
+def large_groups():
+    return Group.objects.filter(feed_pulled=True)
+
+
+def mark_large_groups():
+    """Переводит в pull-режим группы больше порога: после подписок,
+    записанных в обход сигналов."""
+    return Group.objects.filter(
+        feed_pulled=False,
+        follower_count__gt=settings.FEED_FANOUT_THRESHOLD,
+    ).update(feed_pulled=True)
+
+
+def pulled_groups(user):
+    """Большие группы из подписок пользователя."""
+    return large_groups().filter(
+        id__in=Follow.objects.filter(user=user).values('group_id')
+    ).values_list('id', flat=True)
+
+
+def audience(post):
+    """Пользователи, в чью ленту пост записывается при публикации."""
+    query = Q(author_id=post.author_id)
+    if post.group_id and not is_large_group(post.group_id):
+        query |= Q(group_id=post.group_id)
+    return Follow.objects.filter(query).values_list(
+        'user_id', flat=True
+    ).distinct()
+
+
+def push_post(post):
+    """Раскладывает пост по лентам подписчиков автора и группы."""
+    Timeline.objects.bulk_create(
+        (
+            Timeline(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in audience(post)
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def resync_post(post):
+    """Пересчитывает ленты для отредактированного поста."""
+    Timeline.objects.filter(post=post).exclude(
+        user_id__in=audience(post)
+    ).delete()
+    push_post(post)
+
+
+def add_follow(follow):
+    """Добавляет в ленту подписчика уже опубликованные посты."""
+    if follow.author_id:
+        posts = Post.objects.filter(author_id=follow.author_id)
+    else:
+        count, pulled = _group_state(follow.group_id)
+        if not pulled and count > settings.FEED_FANOUT_THRESHOLD:
+            # Группа стала большой: новые посты больше не раздаются
+            Group.objects.filter(id=follow.group_id).update(
+                feed_pulled=True
+            )
+            pulled = True
+        if pulled:
+            return
+        posts = Post.objects.filter(group_id=follow.group_id)
+    Timeline.objects.bulk_create(
+        _entries(follow.user_id, posts),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_follow(follow):
+    """Убирает из ленты посты, которые больше не покрыты подписками."""
+    entries = Timeline.objects.filter(user_id=follow.user_id)
+    if follow.author_id:
+        entries = entries.filter(post__author_id=follow.author_id).exclude(
+            post__group__group_following__user_id=follow.user_id
+        )
+    else:
+        entries = entries.filter(post__group_id=follow.group_id).exclude(
+            post__author__following__user_id=follow.user_id
+        )
+    entries.delete()
+    if follow.group_id:
+        count, pulled = _group_state(follow.group_id)
+        if pulled and count <= settings.FEED_PUSH_THRESHOLD:
+            schedule_push(follow.group_id)
+
+
+def schedule_push(group_id):
+    """Возврат группы в push-режим - в фоновую очередь после фиксации
+    транзакции."""
+    transaction.on_commit(
+        lambda: QUEUE.submit(group_id, push_group, group_id)
+    )
+
+
+def push_group(group_id):
+    """Раскладывает посты группы по лентам подписчиков и переводит её в
+    push-режим. Возвращает, переведена ли группа.
+
+    Режим переключается условным UPDATE в начале транзакции: из
+    одновременных вызовов группу получает только один, остальные
+    обновят ноль строк. До фиксации строка группы остаётся
+    заблокированной (в SQLite - вся база на запись), поэтому новые
+    посты и подписки группы, которые меняют её счётчики, ждут и
+    раздаются уже в push-режиме.
+    """
+    with transaction.atomic():
+        claimed = Group.objects.filter(
+            id=group_id,
+            feed_pulled=True,
+            follower_count__lte=settings.FEED_PUSH_THRESHOLD,
+        ).update(feed_pulled=False)
+        if not claimed:
+            return False
+        posts = list(Post.objects.filter(group_id=group_id).values_list(
+            'id', 'pub_date'
+        ))
+        followers = Follow.objects.filter(group_id=group_id).values_list(
+            'user_id', flat=True
+        )
+        for user_id in followers.iterator():
+            Timeline.objects.bulk_create(
+                (
+                    Timeline(
+                        user_id=user_id, post_id=post_id, pub_date=pub_date
+                    )
+                    for post_id, pub_date in posts
+                ),
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+    return True
+
+
+def push_pending_groups():
+    """Переводит в push-режим все группы, которые уже стали небольшими;
+    возвращает их число."""
+    pending = large_groups().filter(
+        follower_count__lte=settings.FEED_PUSH_THRESHOLD
+    ).values_list('id', flat=True)
+    return sum(push_group(group_id) for group_id in list(pending))
+
+
+def backfill(users):
+    """Заново собирает ленты пользователей по их подпискам."""
+    for user in users:
+        Timeline.objects.filter(user=user).delete()
+        for follow in Follow.objects.filter(user=user):
+            add_follow(follow)
+
+
+def feed_for(user):
+    """Посты ленты пользователя одним запросом, от новых к старым."""
+    return Post.objects.for_listing().filter(
+        Q(id__in=Timeline.objects.filter(user=user).values('post_id'))
+        | Q(group_id__in=pulled_groups(user))
+    ).order_by('-pub_date', '-id')
+
+
+class FeedPaginator(CursorPaginator):
+    """Курсорная пагинация ленты со слиянием push- и pull-частей.
+
+    Записанная часть читается из Timeline по индексу (user, pub_date),
+    посты больших групп - по индексу (group, pub_date). Из каждой части
+    берётся не больше страницы, результат сливается по ключу.
+    """
+
+    def __init__(self, user, per_page):
+        super().__init__(feed_for(user), per_page)
+        self.user = user
+        self.pulled = list(pulled_groups(user))
+
+    def _rows(self, values, reverse, limit):
+        ordering = self.ordering
+        timeline_ordering = ('-pub_date', '-post_id')
+        if reverse:
+            ordering = self._reversed(ordering)
+            timeline_ordering = self._reversed(timeline_ordering)
+        entries = Timeline.objects.filter(user=self.user)
+        if values is not None:
+            entries = entries.filter(
+                self._after(values, reverse, ('-pub_date', '-post_id'))
+            )
+        related = [
+            f'post__{name}' for name in PostQuerySet.LISTING_RELATED
+        ]
+        rows = {
+            entry.post_id: entry.post
+            for entry in entries.select_related('post', *related)
+            .order_by(*timeline_ordering)[:limit]
+        }
+        for group_id in self.pulled:
+            pulled = Post.objects.for_listing().filter(group_id=group_id)
+            if values is not None:
+                pulled = pulled.filter(self._after(values, reverse))
+            rows.update(
+                (post.id, post)
+                for post in pulled.order_by(*ordering)[:limit]
+            )
+        return sorted(
+            rows.values(),
+            key=lambda post: (post.pub_date, post.id),
+            reverse=not reverse,
+        )[:limit]
@@ -1,4 +1,5 @@
 from .models import Post, Comment, Group
+from core.ingest import IngestImageField
 from django import forms
 from django.forms import ModelForm
 
@@ -8,6 +9,7 @@ class PostForm(ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
+        field_classes = {'image': IngestImageField}
 
 
 class CommentForm(ModelForm):
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts import feed
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Заполняет ленты подписок для уже существующих пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Имена пользователей (по умолчанию - все с подписками)',
+        )
+
+    def handle(self, *args, **options):
+        # Группы, которые снова стали небольшими, но ещё не разданы
+        groups = feed.push_pending_groups()
+        users = User.objects.filter(follower__isnull=False).distinct()
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        count = 0
+        for user in users.iterator():
+            feed.backfill([user])
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны: {count}, групп снова в раздаче: {groups}'
+        ))
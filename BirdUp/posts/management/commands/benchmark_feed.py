@@ -0,0 +1,133 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from posts.feed import FeedPaginator
+from posts.models import Follow, Group, Post, Timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоимость записи и чтения ленты для push- и '
+        'pull-раздачи. Данные создаются во временной транзакции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--followers', type=int, default=20000,
+            help='Подписчиков у большой группы',
+        )
+        parser.add_argument(
+            '--posts', type=int, default=200,
+            help='Постов в каждой группе до замера',
+        )
+        parser.add_argument(
+            '--per-page', type=int, default=10,
+            help='Размер страницы ленты',
+        )
+
+    def measure(self, label, func):
+        rows_before = Timeline.objects.count()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            func()
+            elapsed = (time.perf_counter() - start) * 1000
+        rows = Timeline.objects.count() - rows_before
+        self.stdout.write(
+            f'{label:<40} {elapsed:>10.1f} мс {len(queries):>6} запр. '
+            f'{rows:>8} строк ленты'
+        )
+
+    def seed(self, followers, posts):
+        author = User.objects.create_user(username='bench-author')
+        User.objects.bulk_create(
+            User(username=f'bench-follower-{i}') for i in range(followers)
+        )
+        users = list(User.objects.filter(username__startswith='bench-f'))
+        small = Group.objects.create(
+            title='Небольшая группа', slug='bench-small', creator=author,
+        )
+        large = Group.objects.create(
+            title='Большая группа', slug='bench-large', creator=author,
+        )
+        small_size = min(settings.FEED_FANOUT_THRESHOLD - 1, len(users))
+        Follow.objects.bulk_create(
+            Follow(user=user, group=large) for user in users
+        )
+        Follow.objects.bulk_create(
+            Follow(user=user, group=small) for user in users[:small_size]
+        )
+        # bulk_create обходит сигналы: счётчики выставляем сами
+        Group.objects.filter(id=small.id).update(follower_count=small_size)
+        Group.objects.filter(id=large.id).update(
+            follower_count=len(users), feed_pulled=True
+        )
+        for group in (small, large):
+            Post.objects.bulk_create(
+                Post(author=author, group=group, text=f'Пост {i}')
+                for i in range(posts)
+            )
+        Timeline.objects.bulk_create(
+            Timeline(user=user, post=post, pub_date=post.pub_date)
+            for post in Post.objects.filter(group=small)
+            for user in users[:small_size]
+        )
+        small_reader = User.objects.create_user(username='bench-reader')
+        Follow.objects.create(user=small_reader, group=small)
+        return author, small_reader, users[0], small, large
+
+    def handle(self, *args, **options):
+        per_page = options['per_page']
+        with transaction.atomic():
+            author, small_reader, reader, small, large = self.seed(
+                options['followers'], options['posts']
+            )
+            self.stdout.write(
+                f'Порог раздачи: {settings.FEED_FANOUT_THRESHOLD}, '
+                f'подписчиков большой группы: {options["followers"]}'
+            )
+            self.stdout.write('Запись поста:')
+            self.measure(
+                'небольшая группа (push)',
+                lambda: Post.objects.create(
+                    author=author, group=small, text='push'
+                )
+            )
+            self.measure(
+                'большая группа (pull)',
+                lambda: Post.objects.create(
+                    author=author, group=large, text='pull'
+                )
+            )
+            Group.objects.filter(id=large.id).update(feed_pulled=False)
+            self.measure(
+                'большая группа, если раздавать (push)',
+                lambda: Post.objects.create(
+                    author=author, group=large, text='push all'
+                )
+            )
+            Group.objects.filter(id=large.id).update(feed_pulled=True)
+            Timeline.objects.filter(post__text='push all').delete()
+            self.stdout.write('Чтение страницы ленты:')
+            self.measure(
+                'только push-часть',
+                lambda: FeedPaginator(small_reader, per_page).get_page()
+            )
+            self.measure(
+                'push + pull, первая страница',
+                lambda: FeedPaginator(reader, per_page).get_page()
+            )
+            page = FeedPaginator(reader, per_page).get_page()
+            self.measure(
+                'push + pull, следующая страница',
+                lambda: FeedPaginator(reader, per_page).get_page(
+                    page.next_cursor
+                )
+            )
+            transaction.set_rollback(True)
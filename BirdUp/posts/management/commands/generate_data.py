@@ -0,0 +1,308 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from core import conditional
+from posts import counters, feed, search, search_cache
+from posts.models import Comment, Follow, Group, Post, Timeline
+from users import search as user_search
+from users.models import Profile
+
+User = get_user_model()
+
+# Доля подписок на группы, остальные - на авторов
+GROUP_FOLLOW_SHARE = 0.2
+# Доля постов, опубликованных в группах
+GROUP_POST_SHARE = 0.5
+
+
+@contextmanager
+def explicit_pub_date(*models):
+    """Разрешает задавать pub_date вручную вместо auto_now_add."""
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class PowerLaw:
+    """Выбор объектов с вероятностью, убывающей как 1 / rank ** alpha.
+
+    Ранги раздаются в случайном порядке, чтобы популярными оказывались
+    не первые созданные объекты.
+    """
+
+    def __init__(self, rng, items, alpha):
+        self.rng = rng
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(
+            1 / rank ** alpha for rank in range(1, len(self.items) + 1)
+        ))
+
+    def __len__(self):
+        return len(self.items)
+
+    def choice(self):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетические данные для нагрузочного тестирования: '
+        'пользователей, профили, группы, посты, комментарии и подписки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=int, default=20000,
+            help='Примерное число подписок',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Зерно генератора для воспроизводимых данных',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.0,
+            help='Показатель степенного распределения популярности',
+        )
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить посты')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--prefix', default='gen',
+            help='Префикс имён пользователей и адресов групп',
+        )
+        parser.add_argument(
+            '--password', default='password',
+            help='Пароль всех созданных пользователей',
+        )
+        parser.add_argument(
+            '--no-timeline', action='store_true',
+            help='Не собирать ленты подписок',
+        )
+
+    def handle(self, *args, **options):
+        self.prefix = options['prefix']
+        if User.objects.filter(
+                username__startswith=f'{self.prefix}-').exists():
+            raise CommandError(
+                f'Пользователи с префиксом "{self.prefix}" уже есть, '
+                f'укажите другой --prefix'
+            )
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь')
+        self.batch_size = options['batch_size']
+        self.alpha = options['alpha']
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.now = timezone.now()
+        self.period = timedelta(days=options['days']).total_seconds()
+
+        user_ids = self.create_users(options['users'], options['password'])
+        group_ids = self.create_groups(options['groups'], user_ids)
+        posts = self.create_posts(options['posts'], user_ids, group_ids)
+        self.create_comments(options['comments'], posts, user_ids)
+        self.create_follows(options['follows'], user_ids, group_ids)
+
+        self.stdout.write('Пересчёт счётчиков...')
+        counters.repair()
+        feed.mark_large_groups()
+        self.stdout.write('Индексация для поиска...')
+        search.flush()
+        # Строки созданы в обход сигналов: страницы и результаты поиска
+        # в кэше устарели
+        conditional.invalidate_all()
+        for kind in search_cache.KINDS:
+            search_cache.bump(kind)
+        if not options['no_timeline']:
+            self.stdout.write('Сборка лент подписок...')
+            self.build_timelines(user_ids)
+        self.stdout.write(self.style.SUCCESS('Данные созданы'))
+
+    def build_timelines(self, user_ids):
+        """Собирает ленты новых пользователей двумя INSERT ... SELECT.
+
+        Правила те же, что в feed.add_follow: посты авторов и небольших
+        групп записываются, посты больших групп подмешиваются при чтении.
+        Поштучная раздача через feed.backfill на миллионах строк идёт
+        часами.
+        """
+        tables = {
+            name: connection.ops.quote_name(model._meta.db_table)
+            for name, model in (
+                ('timeline', Timeline), ('follow', Follow),
+                ('post', Post), ('group', Group),
+            )
+        }
+        first, last = min(user_ids), max(user_ids)
+        sql = (
+            'INSERT INTO {timeline} (user_id, post_id, pub_date) '
+            'SELECT f.user_id, p.id, p.pub_date FROM {follow} f '
+            'JOIN {post} p ON p.author_id = f.author_id '
+            'WHERE f.user_id BETWEEN %s AND %s '
+            'UNION '
+            'SELECT f.user_id, p.id, p.pub_date FROM {follow} f '
+            'JOIN {group} g ON g.id = f.group_id '
+            'JOIN {post} p ON p.group_id = g.id '
+            'WHERE f.user_id BETWEEN %s AND %s AND NOT g.feed_pulled'
+        ).format(**tables)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [first, last, first, last])
+
+    def bulk_create(self, model, objects, total):
+        """Сохраняет объекты пачками, возвращает id созданных строк."""
+        last_id = model.objects.aggregate(last=Max('id'))['last'] or 0
+        objects = iter(objects)
+        created = 0
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            created += len(batch)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {created}/{total}',
+                ending='\r',
+            )
+        self.stdout.write('')
+        # SQLite не возвращает id из bulk_create
+        return list(model.objects.filter(id__gt=last_id).order_by(
+            'id'
+        ).values_list('id', flat=True))
+
+    def random_date(self, after=None):
+        start = after or self.now - timedelta(seconds=self.period)
+        span = (self.now - start).total_seconds()
+        return start + timedelta(seconds=self.rng.random() * span)
+
+    def create_users(self, count, password):
+        password = make_password(password)
+        user_ids = self.bulk_create(User, (
+            User(
+                username=f'{self.prefix}-{i}-{self.fake.user_name()}'[:150],
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                email=self.fake.email(),
+                password=password,
+            )
+            for i in range(count)
+        ), count)
+        user_search.index_users(
+            User.objects.filter(id__gte=user_ids[0]).only(
+                'username', 'first_name', 'last_name'
+            ).iterator(),
+            self.batch_size,
+        )
+        self.bulk_create(Profile, (
+            Profile(user_id=user_id, about=self.fake.sentence())
+            for user_id in user_ids
+        ), count)
+        return user_ids
+
+    def create_groups(self, count, user_ids):
+        return self.bulk_create(Group, (
+            Group(
+                title=self.fake.sentence(nb_words=3).rstrip('.')[:200],
+                slug=f'{self.prefix}-{i}',
+                description=self.fake.paragraph(),
+                creator_id=self.rng.choice(user_ids),
+            )
+            for i in range(count)
+        ), count)
+
+    def create_posts(self, count, user_ids, group_ids):
+        authors = PowerLaw(self.rng, user_ids, self.alpha)
+        groups = PowerLaw(self.rng, group_ids, self.alpha)
+
+        def posts():
+            for _ in range(count):
+                group_id = None
+                if groups and self.rng.random() < GROUP_POST_SHARE:
+                    group_id = groups.choice()
+                yield Post(
+                    author_id=authors.choice(),
+                    group_id=group_id,
+                    text=self.fake.paragraph(),
+                    pub_date=self.random_date(),
+                )
+
+        with explicit_pub_date(Post):
+            post_ids = self.bulk_create(Post, posts(), count)
+        if not post_ids:
+            return []
+        # Новые строки идут после прежних: диапазон вместо id__in
+        return list(Post.objects.filter(id__gte=post_ids[0]).values_list(
+            'id', 'pub_date'
+        ))
+
+    def create_comments(self, count, posts, user_ids):
+        if not posts:
+            return
+        popular = PowerLaw(self.rng, posts, self.alpha)
+
+        def comments():
+            for _ in range(count):
+                post_id, post_date = popular.choice()
+                yield Comment(
+                    post_id=post_id,
+                    author_id=self.rng.choice(user_ids),
+                    text=self.fake.sentence(),
+                    pub_date=self.random_date(after=post_date),
+                )
+
+        with explicit_pub_date(Comment):
+            self.bulk_create(Comment, comments(), count)
+
+    def create_follows(self, count, user_ids, group_ids):
+        """Подписки: число на пользователя распределено экспоненциально,
+        популярность авторов и групп - по степенному закону."""
+        authors = PowerLaw(self.rng, user_ids, self.alpha)
+        groups = PowerLaw(self.rng, group_ids, self.alpha)
+        average = count / len(user_ids)
+
+        def follows():
+            for user_id in user_ids:
+                wanted = min(
+                    round(self.rng.expovariate(1 / average)) if average
+                    else 0,
+                    len(authors) - 1 + len(groups),
+                )
+                targets = set()
+                for _ in range(wanted * 3):
+                    if len(targets) == wanted:
+                        break
+                    if groups and self.rng.random() < GROUP_FOLLOW_SHARE:
+                        target = ('group', groups.choice())
+                    else:
+                        target = ('author', authors.choice())
+                    if target != ('author', user_id):
+                        targets.add(target)
+                for kind, target_id in sorted(targets):
+                    yield Follow(
+                        user_id=user_id,
+                        pub_date=self.random_date(),
+                        **{f'{kind}_id': target_id},
+                    )
+
+        with explicit_pub_date(Follow):
+            self.bulk_create(Follow, follows(), count)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс постов'
+
+    def handle(self, *args, **options):
+        if not search.install():
+            raise CommandError(
+                'Полнотекстовый индекс доступен только в SQLite с FTS5'
+            )
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Индекс поиска перестроен'))
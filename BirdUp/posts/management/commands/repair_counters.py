@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов и подписчиков по исходным данным'
+
+    def handle(self, *args, **options):
+        counters.repair()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
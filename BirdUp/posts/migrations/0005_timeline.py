@@ -0,0 +1,38 @@
+# Generated by Django 3.2.20 on 2026-10-18 08:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0004_auto_20221211_1949'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Timeline',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+                'ordering': ['-pub_date', '-post'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timeline',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_pub_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='timeline',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.20 on 2026-10-18 08:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_timeline'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_pub_date'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 3.2.20 on 2026-10-18 08:34
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def count_by(queryset, field):
+    # Отдельный GROUP BY на каждое число: соединения постов и подписок
+    # в одном запросе дали бы их произведение строк
+    # order_by() без полей: сортировка модели попала бы в GROUP BY
+    rows = queryset.filter(**{f'{field}__isnull': False}).order_by()
+    return dict(rows.values(field).annotate(
+        count=Count('id')
+    ).values_list(field, 'count'))
+
+
+def fill_counters(apps, schema_editor):
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounter = apps.get_model('posts', 'UserCounter')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    posts = count_by(Post.objects, 'group_id')
+    followers = count_by(Follow.objects, 'group_id')
+    Group.objects.bulk_update(
+        [
+            Group(
+                id=group_id,
+                post_count=posts.get(group_id, 0),
+                follower_count=followers.get(group_id, 0),
+            )
+            for group_id in Group.objects.values_list('id', flat=True)
+        ],
+        ['post_count', 'follower_count'],
+        batch_size=BATCH_SIZE,
+    )
+    posts = count_by(Post.objects, 'author_id')
+    profile_posts = count_by(
+        Post.objects.filter(group__isnull=True), 'author_id'
+    )
+    followers = count_by(Follow.objects, 'author_id')
+    UserCounter.objects.bulk_create(
+        (
+            UserCounter(
+                user_id=user_id,
+                post_count=posts.get(user_id, 0),
+                profile_post_count=profile_posts.get(user_id, 0),
+                follower_count=followers.get(user_id, 0),
+            )
+            for user_id in User.objects.values_list('id', flat=True)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0006_post_group_pub_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounter',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('profile_post_count', models.PositiveIntegerField(default=0, verbose_name='Постов в профиле')),
+                ('follower_count', models.PositiveIntegerField(default=0, verbose_name='Подписчиков')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Постов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
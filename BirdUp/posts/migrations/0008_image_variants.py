@@ -0,0 +1,18 @@
+# Generated by Django 3.2.20 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Копии картинки'),
+        ),
+    ]
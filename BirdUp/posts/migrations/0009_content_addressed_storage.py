@@ -0,0 +1,19 @@
+# Generated by Django 3.2.20 on 2026-10-18 09:26
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.20 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Основной цвет картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_lqip',
+            field=models.TextField(blank=True, editable=False, verbose_name='Превью картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина картинки'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.20 on 2026-10-18 11:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_large_groups(apps, schema_editor):
+    # До этой миграции режим группы определялся порогом при каждом
+    # чтении: посты групп больше порога в ленты не записаны
+    Group = apps.get_model('posts', 'Group')
+    Group.objects.filter(
+        follower_count__gt=settings.FEED_FANOUT_THRESHOLD
+    ).update(feed_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_image_placeholders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='feed_pulled',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Посты подмешиваются в ленту'),
+        ),
+        migrations.RunPython(mark_large_groups, migrations.RunPython.noop),
+    ]
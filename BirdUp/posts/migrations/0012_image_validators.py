@@ -0,0 +1,20 @@
+# Generated by Django 3.2.20 on 2026-10-18 11:20
+
+import core.ingest
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_group_feed_pulled'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', validators=[core.ingest.validate_upload], verbose_name='Картинка'),
+        ),
+    ]
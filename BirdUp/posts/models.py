@@ -1,6 +1,8 @@
 from django.db import models
 from django.urls import reverse
 from core.models import CreatedModel
+from core.ingest import validate_upload
+from core.storage import ContentAddressedStorage
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -19,6 +21,23 @@ class Group(models.Model):
         related_name='creator',
         verbose_name='Создатель'
     )
+    post_count = models.PositiveIntegerField(
+        verbose_name='Постов',
+        default=0,
+        editable=False,
+    )
+    follower_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False,
+    )
+    # Посты группы не раздаются по лентам, а подмешиваются при чтении
+    # (posts.feed)
+    feed_pulled = models.BooleanField(
+        verbose_name='Посты подмешиваются в ленту',
+        default=False,
+        editable=False,
+    )
 
     def get_absolute_url(self):
         return reverse('posts:group_list', kwargs={'slug': self.slug})
@@ -31,6 +50,17 @@ class Group(models.Model):
         verbose_name_plural = 'Группы'
 
 
+class PostQuerySet(models.QuerySet):
+    # Связи, которые читает карточка поста в списках
+    LISTING_RELATED = (
+        'author', 'author__profile', 'group', 'group__creator'
+    )
+
+    def for_listing(self):
+        """Посты вместе с автором, профилем, группой и её создателем."""
+        return self.select_related(*self.LISTING_RELATED)
+
+
 class Post(CreatedModel):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -51,11 +81,48 @@ class Post(CreatedModel):
         verbose_name='Группа',
         help_text='Группа, к которой будет относиться пост'
     )
+    # Файл называется по содержимому (core.storage), upload_to
+    # не используется
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
+        validators=[validate_upload],
         blank=True
     )
+    # Уменьшенные копии картинки (core.derivatives)
+    image_variants = models.JSONField(
+        verbose_name='Копии картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    # Размер, цвет и превью для вёрстки без чтения файла (core.ingest)
+    image_width = models.PositiveIntegerField(
+        verbose_name='Ширина картинки',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    image_height = models.PositiveIntegerField(
+        verbose_name='Высота картинки',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    image_color = models.CharField(
+        verbose_name='Основной цвет картинки',
+        max_length=7,
+        blank=True,
+        editable=False,
+    )
+    image_lqip = models.TextField(
+        verbose_name='Превью картинки',
+        blank=True,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def get_absolute_url(self):
         return reverse('posts:post_detail', kwargs={'post_id': self.id})
@@ -67,6 +134,12 @@ class Post(CreatedModel):
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date',
+            ),
+        ]
 
 
 class Comment(CreatedModel):
@@ -124,3 +197,72 @@ class Follow(CreatedModel):
         verbose_name='Группа',
         help_text='Группа, на которую вы подписаны'
     )
+
+
+class Timeline(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    # Копия Post.pub_date, чтобы страница ленты читалась по одному индексу
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    def __str__(self):
+        return f'{self.user} - {self.post}'
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date',
+            ),
+        ]
+
+
+class UserCounter(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    post_count = models.PositiveIntegerField(
+        verbose_name='Постов',
+        default=0,
+    )
+    # Посты вне групп - их показывает страница профиля
+    profile_post_count = models.PositiveIntegerField(
+        verbose_name='Постов в профиле',
+        default=0,
+    )
+    follower_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+    )
+
+    def __str__(self):
+        return str(self.user)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
@@ -0,0 +1,284 @@
+# Полнотекстовый поиск по постам и группам.
+# В SQLite тексты индексируются виртуальными таблицами FTS5. В индекс
+# попадает не исходный текст, а результат analysis.analyze_text: слова
+# без стоп-слов, приведённые к основе, так что «птицы» находит «птица».
+# Триггеры на исходных таблицах - обычный SQL: удалённая строка сразу
+# удаляется из индекса, а id добавленной или изменённой строки
+# записывается в очередь. Очередь индекса разбирает flush(): после
+# сохранения модели (сигналы posts), перед поиском по этому индексу и в
+# rebuild_search_index. Так в базу можно писать и без приложения
+# (sqlite3, dbshell, скрипты), а bulk_create и update() попадают в
+# индекс к следующему поиску.
+# Поиск читает из индекса id совпавших строк и ранжирует их по BM25,
+# поэтому время запроса зависит от числа совпадений, а не от размера
+# таблицы. Без FTS5 (другая СУБД или SQLite, собранный без модуля)
+# поиск работает через icontains.
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.models import Q
+
+from . import analysis
+from .models import Group, Post
+
+# Индекс первой версии: исходный текст постов без анализа
+LEGACY_TABLES = ('posts_post_fts',)
+# Сколько строк анализируется за раз
+BATCH_SIZE = 500
+TRIGGERS = ('insert', 'delete', 'update')
+
+
+class FullTextIndex:
+    """Таблица FTS5 для полей модели; weights - веса полей в BM25."""
+
+    def __init__(self, model, table, fields, weights):
+        self.model = model
+        self.table = table
+        self.fields = fields
+        self.weights = weights
+
+    @property
+    def queue(self):
+        return f'{self.table}_queue'
+
+    def statements(self):
+        source = self.model._meta.db_table
+        columns = ', '.join(self.fields)
+        enqueue = f'INSERT INTO {self.queue}(row_id) VALUES (new.id);'
+        delete = f'DELETE FROM {self.table} WHERE rowid = old.id;'
+        # Триггеры пересоздаются: прежние версии вызывали функцию,
+        # которой нет вне приложения
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+            f"{columns}, tokenize='unicode61 remove_diacritics 2')",
+            f'CREATE TABLE IF NOT EXISTS {self.queue} '
+            f'(id INTEGER PRIMARY KEY, row_id INTEGER NOT NULL)',
+            *(
+                f'DROP TRIGGER IF EXISTS {self.table}_{action}'
+                for action in TRIGGERS
+            ),
+            f'CREATE TRIGGER {self.table}_insert '
+            f'AFTER INSERT ON {source} BEGIN {enqueue} END',
+            f'CREATE TRIGGER {self.table}_delete '
+            f'AFTER DELETE ON {source} BEGIN {delete} END',
+            f'CREATE TRIGGER {self.table}_update '
+            f'AFTER UPDATE OF {columns} ON {source} BEGIN {enqueue} END',
+        ]
+
+    def _index(self, cursor, rows):
+        """Записывает в индекс строки (id, поля...) после анализа."""
+        columns = ', '.join(self.fields)
+        placeholders = ', '.join(['%s'] * (len(self.fields) + 1))
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {self.table}(rowid, {columns}) '
+            f'VALUES ({placeholders})',
+            [
+                (row[0], *(analysis.analyze_text(value) for value in row[1:]))
+                for row in rows
+            ],
+        )
+
+    def flush(self, cursor):
+        """Индексирует строки из очереди; возвращает их число.
+
+        Из очереди удаляются только прочитанные записи: строка,
+        изменённая во время разбора, останется в очереди до следующего.
+        """
+        source = self.model._meta.db_table
+        columns = ', '.join(self.fields)
+        count = 0
+        while True:
+            cursor.execute(
+                f'SELECT id, row_id FROM {self.queue} '
+                f'ORDER BY id LIMIT {BATCH_SIZE}'
+            )
+            queued = cursor.fetchall()
+            if not queued:
+                return count
+            ids = list({row_id for _, row_id in queued})
+            marks = ', '.join(['%s'] * len(ids))
+            # Удалённых строк уже нет ни в таблице, ни в индексе
+            cursor.execute(
+                f'SELECT id, {columns} FROM {source} WHERE id IN ({marks})',
+                ids,
+            )
+            self._index(cursor, cursor.fetchall())
+            cursor.execute(
+                f'DELETE FROM {self.queue} WHERE id <= %s', [queued[-1][0]]
+            )
+            count += len(ids)
+
+    def rebuild(self, cursor):
+        source = self.model._meta.db_table
+        columns = ', '.join(self.fields)
+        cursor.execute(f'DELETE FROM {self.table}')
+        cursor.execute(f'DELETE FROM {self.queue}')
+        last_id = 0
+        while True:
+            cursor.execute(
+                f'SELECT id, {columns} FROM {source} WHERE id > %s '
+                f'ORDER BY id LIMIT {BATCH_SIZE}',
+                [last_id],
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            self._index(cursor, rows)
+            last_id = rows[-1][0]
+        cursor.execute(
+            f"INSERT INTO {self.table}({self.table}) VALUES ('optimize')"
+        )
+
+    def search(self, queryset, query, limit=None):
+        """Строки queryset, подходящие под запрос, по убыванию BM25.
+
+        С limit ранжируются только limit самых новых совпадений: их
+        граница находится по индексу без обхода остальных, и стоимость
+        запроса не растёт с числом совпадений.
+        """
+        expression = match_expression(query)
+        if not expression:
+            return queryset.none()
+        source = self.model._meta.db_table
+        where = [
+            f'{self.table}.rowid = {source}.id',
+            f'{self.table} MATCH %s',
+        ]
+        params = [expression]
+        if limit:
+            where.append(
+                f'{self.table}.rowid >= (SELECT min(rowid) FROM ('
+                f'SELECT rowid FROM {self.table} '
+                f'WHERE {self.table} MATCH %s '
+                f'ORDER BY rowid DESC LIMIT %s))'
+            )
+            params += [expression, limit]
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return queryset.extra(
+            select={'rank': f'bm25({self.table}, {weights})'},
+            tables=[self.table],
+            where=where,
+            params=params,
+        ).order_by('rank', '-id')
+
+
+POSTS = FullTextIndex(Post, 'posts_post_search', ['text'], [1.0])
+# Совпадение в названии группы важнее, чем в описании
+GROUPS = FullTextIndex(
+    Group, 'posts_group_search', ['title', 'description'], [10.0, 1.0]
+)
+INDEXES = (POSTS, GROUPS)
+
+# Результат проверки FTS5 для каждой базы: имя базы -> bool
+_available = {}
+
+
+def _key(connection):
+    return connection.alias, connection.settings_dict['NAME']
+
+
+def _tables(cursor):
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    return {name for name, in cursor.fetchall()}
+
+
+def fts_available(using=DEFAULT_DB_ALIAS):
+    """Есть ли в базе индексы FTS5."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    key = _key(connection)
+    if key not in _available:
+        with connection.cursor() as cursor:
+            tables = _tables(cursor)
+        _available[key] = all(index.table in tables for index in INDEXES)
+    return _available[key]
+
+
+def install(using=DEFAULT_DB_ALIAS):
+    """Создаёт индексы и триггеры, если их нет.
+
+    Пересоздание исходных таблиц в миграциях SQLite удаляет их
+    триггеры, поэтому установка повторяется после каждой миграции.
+    Только что созданные индексы заполняются существующими строками.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    key = _key(connection)
+    _available.pop(key, None)
+    try:
+        with connection.cursor() as cursor:
+            for table in LEGACY_TABLES:
+                for action in TRIGGERS:
+                    cursor.execute(
+                        f'DROP TRIGGER IF EXISTS {table}_{action}'
+                    )
+                cursor.execute(f'DROP TABLE IF EXISTS {table}')
+            existing = _tables(cursor)
+            for index in INDEXES:
+                for statement in index.statements():
+                    cursor.execute(statement)
+                if index.table not in existing:
+                    index.rebuild(cursor)
+    except OperationalError:
+        # SQLite собран без FTS5: остаётся поиск через icontains
+        _available[key] = False
+        return False
+    _available[key] = True
+    return True
+
+
+def rebuild(using=DEFAULT_DB_ALIAS):
+    """Заново строит индексы по исходным таблицам."""
+    with connections[using].cursor() as cursor:
+        for index in INDEXES:
+            index.rebuild(cursor)
+
+
+def flush(using=DEFAULT_DB_ALIAS, indexes=INDEXES):
+    """Индексирует строки, добавленные или изменённые после прошлого
+    разбора очереди; пустая очередь - один запрос на индекс."""
+    if not fts_available(using):
+        return 0
+    with connections[using].cursor() as cursor:
+        return sum(index.flush(cursor) for index in indexes)
+
+
+def indexes_for(model):
+    """Индексы по таблице модели."""
+    return [index for index in INDEXES if index.model is model]
+
+
+def match_expression(query):
+    """Запрос FTS5: основы всех слов запроса как префиксы, через AND."""
+    return ' '.join(f'"{term}"*' for term in analysis.analyze(query))
+
+
+def normalize_query(query, using=DEFAULT_DB_ALIAS):
+    """Запрос в том виде, в каком его ищет индекс: одинаковые после
+    анализа запросы дают одинаковые результаты."""
+    if fts_available(using):
+        return ' '.join(analysis.analyze(query))
+    return ' '.join(query.casefold().split())
+
+
+def search_posts(query, queryset=None, limit=None):
+    """Посты, подходящие под запрос, от самых релевантных."""
+    if queryset is None:
+        queryset = Post.objects.for_listing()
+    if not fts_available(queryset.db):
+        # Просмотр по первичному ключу останавливается после limit строк
+        return queryset.filter(text__icontains=query).order_by('-id')
+    flush(queryset.db, [POSTS])
+    return POSTS.search(queryset, query, limit)
+
+
+def search_groups(query, queryset=None, limit=None):
+    """Группы, подходящие под запрос, от самых релевантных."""
+    if queryset is None:
+        queryset = Group.objects.all()
+    if not fts_available(queryset.db):
+        return queryset.filter(
+            Q(title__icontains=query) | Q(description__icontains=query)
+        ).order_by('slug')
+    flush(queryset.db, [GROUPS])
+    return GROUPS.search(queryset, query, limit)
@@ -0,0 +1,131 @@
+# Кэш результатов поиска.
+# По ключу из вида поиска, поколения и нормализованного запроса
+# хранится только список id найденных строк (не больше
+# SEARCH_MAX_RESULTS), страницы нарезаются из него, а строки страницы
+# читаются по первичному ключу. Поколение - счётчик в кэше для каждого
+# вида поиска: запись поста, группы или пользователя увеличивает его,
+# ключи прежнего поколения больше не читаются и вытесняются как давно
+# не использованные (MAX_ENTRIES кэша 'search' в settings.CACHES).
+import hashlib
+import threading
+import time
+
+from django.core.cache import caches
+
+from core import cache as core_cache
+
+CACHE_ALIAS = 'search'
+KINDS = ('posts', 'groups', 'users')
+
+
+class Stats:
+    """Попадания и промахи кэша в текущем процессе."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.hits = dict.fromkeys(KINDS, 0)
+        self.misses = dict.fromkeys(KINDS, 0)
+
+    def record(self, kind, hit):
+        with self.lock:
+            counter = self.hits if hit else self.misses
+            counter[kind] += 1
+
+    def as_dict(self):
+        result = {}
+        for kind in KINDS:
+            hits, misses = self.hits[kind], self.misses[kind]
+            total = hits + misses
+            result[kind] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / total, 3) if total else None,
+                'generation': generation(kind),
+            }
+        return result
+
+
+stats = Stats()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _generation_key(kind):
+    return f'search:generation:{kind}'
+
+
+def _initial_generation():
+    # Если счётчик вытеснен, новое поколение не совпадёт со старыми
+    return time.time_ns() // 1000
+
+
+def generation(kind):
+    cache = _cache()
+    key = _generation_key(kind)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _initial_generation(), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def bump(kind):
+    """Делает недействительными все закэшированные результаты вида."""
+    cache = _cache()
+    key = _generation_key(kind)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_generation(), timeout=None)
+
+
+def clear():
+    _cache().clear()
+    stats.reset()
+
+
+def get_ids(kind, normalized_query, search):
+    """Id результатов поиска из кэша или из search() при промахе."""
+    cache = _cache()
+    digest = hashlib.sha1(normalized_query.encode()).hexdigest()
+    key = f'search:{kind}:{generation(kind)}:{digest}'
+    computed = False
+
+    def search_ids():
+        nonlocal computed
+        computed = True
+        return list(search())
+
+    # После смены поколения одинаковый запрос ищет один вызов
+    ids = core_cache.get_or_compute(
+        cache, key, search_ids, cache.default_timeout
+    )
+    stats.record(kind, hit=not computed)
+    return ids
+
+
+class CachedResults:
+    """Результаты поиска по списку id для Paginator.
+
+    Строки читаются из queryset только для запрошенного среза, в
+    порядке списка; удалённые после кэширования строки пропускаются.
+    """
+
+    def __init__(self, ids, queryset):
+        self.ids = ids
+        self.queryset = queryset
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        ids = self.ids[index]
+        objects = self.queryset.in_bulk(ids)
+        return [objects[id] for id in ids if id in objects]
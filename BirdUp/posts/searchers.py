@@ -0,0 +1,61 @@
+# Виды поиска, общие для страниц сайта и API.
+# Searcher связывает поиск с кэшем: id результатов (не больше
+# settings.SEARCH_MAX_RESULTS) берутся из search_cache, строки
+# страницы - из queryset по первичному ключу.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from users import search as user_search
+from . import search, search_cache
+from .models import Group, Post
+
+User = get_user_model()
+
+
+class Searcher:
+    """kind - вид в кэше, normalize - ключ запроса в кэше, find -
+    найденные строки по релевантности, queryset - чтение строк."""
+
+    def __init__(self, kind, normalize, find, queryset):
+        self.kind = kind
+        self.normalize = normalize
+        self.find = find
+        self.queryset = queryset
+
+    def ids(self, query):
+        return search_cache.get_ids(
+            self.kind,
+            self.normalize(query),
+            lambda: self.find(query)[
+                :settings.SEARCH_MAX_RESULTS
+            ].values_list('id', flat=True),
+        )
+
+    def results(self, query):
+        return search_cache.CachedResults(self.ids(query), self.queryset())
+
+
+POSTS = Searcher(
+    'posts',
+    search.normalize_query,
+    lambda query: search.search_posts(
+        query, Post.objects.all(), limit=settings.SEARCH_MAX_RESULTS
+    ),
+    Post.objects.for_listing,
+)
+# Ключи поиска находятся по индексу, порядок - по уникальному индексу
+# логинов
+USERS = Searcher(
+    'users',
+    user_search.normalize,
+    lambda query: user_search.search_users(query).order_by('username'),
+    lambda: User.objects.select_related('profile'),
+)
+GROUPS = Searcher(
+    'groups',
+    search.normalize_query,
+    lambda query: search.search_groups(
+        query, limit=settings.SEARCH_MAX_RESULTS
+    ),
+    Group.objects.all,
+)
@@ -0,0 +1,181 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from core import blobs, conditional, derivatives, ingest, thumbnails
+from users.models import Profile
+from . import counters, feed, search, search_cache
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# group_id не загружен (.only()/.defer()): перенос поста не отслеживаем
+UNKNOWN = object()
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    instance._saved_group_id = instance.__dict__.get('group_id', UNKNOWN)
+    instance._saved_image = thumbnails.file_name(
+        instance.__dict__.get('image')
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    image = instance.__dict__.get('image')
+    if not raw and ingest.is_new(image, instance._saved_image):
+        ingest.fill_placeholder(instance, 'image')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_group_id = instance._saved_group_id
+    with transaction.atomic():
+        if created:
+            counters.post_added(instance)
+            feed.push_post(instance)
+        elif old_group_id is not UNKNOWN and old_group_id != instance.group_id:
+            counters.post_moved(instance, old_group_id)
+            feed.resync_post(instance)
+            touch_pages(f'group:{old_group_id}')
+    instance._saved_group_id = instance.group_id
+    # Новое изображение: миниатюры создаются заранее, до первого показа
+    image = thumbnails.file_name(instance.__dict__.get('image'))
+    if image != instance._saved_image:
+        blobs.replace(instance._saved_image, image)
+        thumbnails.schedule(image, thumbnails.POST_SIZES)
+        derivatives.schedule(instance, 'image', 'image_variants')
+        instance._saved_image = image
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.post_removed(instance)
+    blobs.release(instance._saved_image)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    counters.group_removed(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        with transaction.atomic():
+            counters.follow_added(instance)
+            feed.add_follow(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    with transaction.atomic():
+        counters.follow_removed(instance)
+        feed.remove_follow(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Group)
+def index_search(sender, using, **kwargs):
+    """Сохранённая строка попадает в индекс поиска сразу."""
+    search.flush(using, search.indexes_for(sender))
+
+
+# Модели, запись которых меняет результаты поиска, и поля, по которым
+# они ищутся (None - любые)
+SEARCH_KINDS = {
+    Post: ('posts', None),
+    Group: ('groups', None),
+    User: ('users', {'username', 'first_name', 'last_name'}),
+}
+
+
+def invalidate_search(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    """Новое поколение кэша поиска: сразу и после фиксации транзакции,
+    чтобы результат, найденный до фиксации, не остался в кэше."""
+    kind, fields = SEARCH_KINDS[sender]
+    if raw or (fields and update_fields and not fields & set(update_fields)):
+        return
+    search_cache.bump(kind)
+    transaction.on_commit(lambda: search_cache.bump(kind))
+
+
+for model in SEARCH_KINDS:
+    post_save.connect(invalidate_search, sender=model)
+    post_delete.connect(invalidate_search, sender=model)
+
+
+def install_search(sender, using, **kwargs):
+    """Индекс поиска и его триггеры после каждой миграции."""
+    search.install(using)
+
+
+def touch_pages(*scopes):
+    """Изменение областей страниц (core.conditional): сразу и после
+    фиксации транзакции, чтобы страница, собранная до фиксации, не
+    получила ETag новых данных."""
+    conditional.touch(*scopes)
+    transaction.on_commit(lambda: conditional.touch(*scopes))
+
+
+def _post_scopes(post):
+    scopes = ['posts', f'post:{post.pk}', f'user:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group:{post.group_id}')
+    return scopes
+
+
+def _follow_scopes(follow):
+    scopes = [f'user:{follow.user_id}']
+    if follow.author_id:
+        scopes.append(f'user:{follow.author_id}')
+    if follow.group_id:
+        scopes.append(f'group:{follow.group_id}')
+    return scopes
+
+
+# Области страниц, которые меняет запись модели
+PAGE_SCOPES = {
+    Post: _post_scopes,
+    Comment: lambda comment: [f'post:{comment.post_id}'],
+    Follow: _follow_scopes,
+    Group: lambda group: ['posts', 'groups', f'group:{group.pk}'],
+    # Имена авторов и комментаторов - на всех страницах с постами
+    User: lambda user: ['users', f'user:{user.pk}'],
+    Profile: lambda profile: [f'user:{profile.user_id}'],
+}
+
+
+def invalidate_pages(sender, instance, raw=False, update_fields=None,
+                     **kwargs):
+    # Вход обновляет только last_login, страницы его не показывают
+    if raw or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    touch_pages(*PAGE_SCOPES[sender](instance))
+
+
+for model in PAGE_SCOPES:
+    post_save.connect(invalidate_pages, sender=model)
+    post_delete.connect(invalidate_pages, sender=model)
+
+
+@receiver(derivatives.variants_built, sender=Post)
+@receiver(derivatives.variants_built, sender=Profile)
+def variants_built(sender, field, name, **kwargs):
+    """Готовые копии изображения меняют srcset на страницах."""
+    scopes = set()
+    for instance in sender.objects.filter(**{field: name}):
+        scopes.update(PAGE_SCOPES[sender](instance))
+    if scopes:
+        touch_pages(*scopes)
+
+
+def invalidate_all_pages(sender, **kwargs):
+    """Миграция могла изменить данные в обход сигналов моделей."""
+    conditional.invalidate_all()
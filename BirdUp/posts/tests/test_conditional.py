@@ -0,0 +1,199 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ..models import Comment, Group, Post
+from users.models import Profile
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='HasNoName')
+        Profile.objects.create(user=cls.author)
+        cls.reader = User.objects.create_user(username='reader')
+        Profile.objects.create(user=cls.reader)
+        cls.group = Group.objects.create(
+            title='Птицы', slug='birds', creator=cls.author
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def revalidate(self, client, address):
+        """Статус повторного запроса страницы с её ETag."""
+        etag = client.get(address)['ETag']
+        return client.get(address, HTTP_IF_NONE_MATCH=etag).status_code
+
+    def test_unchanged_pages_are_not_rendered(self):
+        # Сессия, пользователь и объект из адреса страницы
+        for address, queries in (
+            (reverse('posts:index'), 2),
+            (reverse('posts:group_list', args=['birds']), 3),
+            (reverse('posts:profile', args=['HasNoName']), 3),
+            (reverse('posts:post_detail', args=[self.post.id]), 3),
+        ):
+            with self.subTest(address=address):
+                etag = self.authorized_client.get(address)['ETag']
+                with self.assertNumQueries(queries):
+                    response = self.authorized_client.get(
+                        address, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_pages(self):
+        index = reverse('posts:index')
+        etag = self.guest_client.get(index)['ETag']
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.guest_client.get(index, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        detail = reverse('posts:post_detail', args=[self.post.id])
+        etag = self.guest_client.get(detail)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        response = self.guest_client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_renamed_user_invalidates_pages(self):
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=['birds']),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts-detail', args=[self.post.id]),
+        )
+        for user in (self.author, self.reader):
+            etags = {
+                address: self.guest_client.get(address)['ETag']
+                for address in addresses
+            }
+            user.first_name = 'Новое имя'
+            user.save()
+            for address, etag in etags.items():
+                with self.subTest(user=user.username, address=address):
+                    response = self.guest_client.get(
+                        address, HTTP_IF_NONE_MATCH=etag
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_follow_state_is_part_of_validator(self):
+        profile = reverse('posts:profile', args=['HasNoName'])
+        etag = self.authorized_client.get(profile)['ETag']
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=['HasNoName'])
+        )
+        response = self.authorized_client.get(
+            profile, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        # ETag зависит от пользователя
+        response = self.guest_client.get(
+            profile, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_page_with_placeholder_has_no_etag(self):
+        Post.objects.create(
+            author=self.author, text='С картинкой', image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            )
+        )
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_api(self):
+        client = APIClient()
+        detail = reverse('posts-detail', args=[self.post.id])
+        self.assertEqual(self.revalidate(client, detail), 304)
+        self.assertEqual(
+            self.revalidate(client, reverse('posts-list')), 304
+        )
+        etag = client.get(detail)['ETag']
+        self.post.text = 'Изменённый пост'
+        self.post.save()
+        response = client.get(detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['text'], 'Изменённый пост')
+        # JSON и страница браузера API - разные представления
+        self.assertIn('Accept', response['Vary'])
+        response = client.get(
+            detail, HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_ACCEPT='text/html',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/html', response['Content-Type'])
+        response = client.get(
+            detail, HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_ACCEPT='text/html',
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept', response['Vary'])
+
+    def test_anonymous_page_cache(self):
+        other = User.objects.create_user(username='other')
+        Profile.objects.create(user=other)
+        index = reverse('posts:index')
+        group = reverse('posts:group_list', args=['birds'])
+        profile = reverse('posts:profile', args=['other'])
+        groups = reverse('posts:group_index')
+        detail = reverse('posts:post_detail', args=[self.post.id])
+        addresses = (index, group, profile, groups, detail)
+        for address in addresses:
+            self.assertIsNotNone(self.guest_client.get(address).context)
+        # Пост нужен для областей страницы, остальное - из кэша
+        for address, queries in ((index, 0), (detail, 1)):
+            with self.subTest(address=address):
+                with self.assertNumQueries(queries):
+                    response = self.guest_client.get(address)
+                self.assertIsNone(response.context)
+                self.assertContains(response, 'Пост')
+        Post.objects.create(
+            author=self.author, text='Новый пост', group=self.group
+        )
+        rendered = {
+            address: self.guest_client.get(address).context is not None
+            for address in addresses
+        }
+        self.assertEqual(rendered, {
+            index: True, group: True, profile: False, groups: False,
+            detail: True,
+        })
+        # С сессией страница собирается заново
+        response = self.authorized_client.get(groups)
+        self.assertIsNotNone(response.context)
@@ -0,0 +1,113 @@
+from io import StringIO
+
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from ..models import Group, Post, Follow, UserCounter
+from users.models import Profile
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.profile = Profile.objects.create(user=cls.user)
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+            creator=cls.user,
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            creator=cls.user,
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def assertCounters(self, post_count, profile_post_count, follower_count):
+        counter = UserCounter.objects.get(user=self.user)
+        self.assertEqual(
+            (counter.post_count, counter.profile_post_count,
+             counter.follower_count),
+            (post_count, profile_post_count, follower_count),
+        )
+
+    def test_post_counters(self):
+        group = Group.objects.create(
+            title='Группа на удаление',
+            slug='deleted-slug',
+            creator=self.user,
+        )
+        post = Post.objects.create(author=self.user, text='Пост')
+        Post.objects.create(author=self.user, text='Пост', group=group)
+        group.refresh_from_db()
+        self.assertEqual(group.post_count, 1)
+        self.assertCounters(2, 1, 0)
+        post.group = self.other_group
+        post.save()
+        self.assertCounters(2, 0, 0)
+        post = Post.objects.get(id=post.id)
+        post.group = None
+        post.save()
+        self.assertCounters(2, 1, 0)
+        post.delete()
+        self.assertCounters(1, 0, 0)
+        group.delete()
+        self.assertCounters(1, 1, 0)
+
+    def test_follower_counters(self):
+        Post.objects.create(author=self.user, text='Пост')
+        Follow.objects.create(user=self.reader, author=self.user)
+        Follow.objects.create(user=self.reader, group=self.group)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.follower_count, 1)
+        self.assertCounters(1, 1, 1)
+        Follow.objects.filter(user=self.reader).delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.follower_count, 0)
+        self.assertCounters(1, 1, 0)
+
+    def test_repair_command(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Пост', group=self.group)
+            for _ in range(3)
+        )
+        Post.objects.bulk_create([Post(author=self.user, text='Пост')])
+        Follow.objects.bulk_create([
+            Follow(user=self.reader, group=self.group),
+            Follow(user=self.reader, author=self.user),
+        ])
+        call_command('repair_counters', stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.post_count, 3)
+        self.assertEqual(self.group.follower_count, 1)
+        self.assertCounters(4, 1, 1)
+
+    def test_detail_pages_do_not_count(self):
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+        Post.objects.create(author=self.user, text='Пост в профиле')
+        addresses = {
+            reverse('posts:post_detail', kwargs={'post_id': post.id}): 2,
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}): 1,
+            reverse('posts:profile', kwargs={'username': 'HasNoName'}): 1,
+        }
+        for address, count in addresses.items():
+            with self.subTest(address=address):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.guest_client.get(address)
+                self.assertFalse(
+                    any('COUNT(' in query['sql'] for query in queries)
+                )
+                self.assertEqual(response.context['count'], count)
@@ -0,0 +1,156 @@
+from io import StringIO
+
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from ..models import Group, Post, Follow, Timeline
+from .. import feed
+from users.models import Profile
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Profile.objects.create(user=cls.reader)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+            creator=cls.author,
+        )
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def feed_texts(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_follow_adds_existing_posts(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.feed_texts(), ['Пост до подписки'])
+
+    def test_new_post_is_pushed(self):
+        Follow.objects.create(user=self.reader, group=self.group)
+        Post.objects.create(
+            author=self.author, text='Пост в группе', group=self.group
+        )
+        self.assertEqual(self.feed_texts(), ['Пост в группе'])
+
+    def test_unfollow_keeps_posts_covered_by_other_follow(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, group=self.group)
+        Post.objects.create(
+            author=self.author, text='Пост в группе', group=self.group
+        )
+        Follow.objects.filter(user=self.reader, author=self.author).delete()
+        self.assertEqual(self.feed_texts(), ['Пост в группе'])
+        Follow.objects.filter(user=self.reader, group=self.group).delete()
+        self.assertEqual(self.feed_texts(), [])
+
+    def test_backfill_command(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        Timeline.objects.all().delete()
+        call_command('backfill_timeline', stdout=StringIO())
+        self.assertEqual(self.feed_texts(), ['Пост до подписки'])
+
+
+@override_settings(
+    FEED_FANOUT_THRESHOLD=1, FEED_PUSH_THRESHOLD=1, FEED_ASYNC=False
+)
+class HybridFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.another_reader = User.objects.create_user(username='another')
+        Profile.objects.create(user=cls.reader)
+        cls.group = Group.objects.create(
+            title='Большая группа',
+            slug='large',
+            creator=cls.author,
+        )
+        Follow.objects.create(user=cls.reader, group=cls.group)
+        Follow.objects.create(user=cls.another_reader, group=cls.group)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_large_group_posts_are_pulled(self):
+        Post.objects.create(author=self.author, text='Пост автора')
+        Post.objects.create(
+            author=self.another_reader, text='Пост в группе', group=self.group
+        )
+        self.assertFalse(
+            Timeline.objects.filter(post__text='Пост в группе').exists()
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            ['Пост в группе', 'Пост автора'],
+        )
+
+    def test_pages_merge_without_duplicates(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}', group=self.group)
+            for i in range(15)
+        )
+        feed.backfill([self.reader])
+        address = reverse('posts:follow_index')
+        response = self.authorized_client.get(address)
+        first = list(response.context['page_obj'])
+        cursor = response.context['page_obj'].next_cursor
+        response = self.authorized_client.get(f'{address}?cursor={cursor}')
+        second = list(response.context['page_obj'])
+        self.assertEqual(len(first), 10)
+        self.assertEqual(len(second), 5)
+        self.assertEqual(len({post.id for post in first + second}), 15)
+
+    def test_group_becomes_small_again(self):
+        Post.objects.create(
+            author=self.another_reader, text='Пост в группе', group=self.group
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(user=self.another_reader).delete()
+        self.assertTrue(Timeline.objects.filter(
+            user=self.reader, post__text='Пост в группе'
+        ).exists())
+        self.group.refresh_from_db()
+        self.assertFalse(self.group.feed_pulled)
+        # Группу переводит только один вызов
+        self.assertFalse(feed.push_group(self.group.id))
+
+    @override_settings(FEED_PUSH_THRESHOLD=0)
+    def test_mode_does_not_flip_at_threshold(self):
+        Post.objects.create(
+            author=self.another_reader, text='Пост в группе', group=self.group
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(user=self.another_reader).delete()
+        Follow.objects.create(user=self.another_reader, group=self.group)
+        self.assertFalse(
+            Timeline.objects.filter(post__text='Пост в группе').exists()
+        )
+        self.group.refresh_from_db()
+        self.assertTrue(self.group.feed_pulled)
+        # Отписка ниже нижнего порога раздаёт посты командой
+        Follow.objects.filter(user=self.another_reader).delete()
+        with override_settings(FEED_PUSH_THRESHOLD=1):
+            call_command('backfill_timeline', stdout=StringIO())
+        self.assertTrue(Timeline.objects.filter(
+            user=self.reader, post__text='Пост в группе'
+        ).exists())
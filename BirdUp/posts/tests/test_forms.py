@@ -71,10 +71,11 @@ class PostFormTests(TestCase):
             response, reverse('posts:profile',
                               kwargs={'username': f'{self.user.username}'}))
         self.assertEqual(Post.objects.count(), post_count + 1)
-        self.assertTrue(Post.objects.filter(
-            text='Тестовый текст',
-            image='posts/small.gif',
-        ).exists())
+        # Файл называется по SHA-256 содержимого
+        self.assertRegex(
+            Post.objects.get(text='Тестовый текст').image.name,
+            r'^blobs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.gif$',
+        )
         form_data = {
             'text': 'Тестовый текст 2',
             'group': self.group.id,
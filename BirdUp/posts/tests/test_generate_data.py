@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from .. import feed, search_cache
+from ..models import Comment, Group, Post, Follow, Timeline, UserCounter
+from users.models import Profile
+
+User = get_user_model()
+
+
+class GenerateDataTest(TestCase):
+    def generate(self, **options):
+        options = {
+            'users': 30, 'groups': 3, 'posts': 60, 'comments': 40,
+            'follows': 90, 'seed': 42, 'batch_size': 7, **options,
+        }
+        call_command('generate_data', stdout=StringIO(), **options)
+
+    def snapshot(self):
+        return (
+            list(User.objects.order_by('id').values_list('username')),
+            list(Post.objects.order_by('id').values_list(
+                'author__username', 'group__slug', 'text'
+            )),
+            list(Follow.objects.order_by('id').values_list(
+                'user__username', 'author__username', 'group__slug'
+            )),
+        )
+
+    def test_creates_requested_rows(self):
+        self.generate()
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Profile.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(Timeline.objects.exists())
+        self.assertEqual(
+            sum(UserCounter.objects.values_list('post_count', flat=True)),
+            60,
+        )
+        self.assertGreater(
+            Post.objects.dates('pub_date', 'day').count(), 1
+        )
+
+    def test_search_cache_is_invalidated(self):
+        generations = {
+            kind: search_cache.generation(kind) for kind in search_cache.KINDS
+        }
+        self.generate()
+        for kind, before in generations.items():
+            with self.subTest(kind=kind):
+                self.assertNotEqual(search_cache.generation(kind), before)
+
+    def test_seed_is_deterministic(self):
+        self.generate()
+        first = self.snapshot()
+        User.objects.all().delete()
+        self.generate()
+        self.assertEqual(self.snapshot(), first)
+
+    @override_settings(FEED_FANOUT_THRESHOLD=5)
+    def test_timelines_match_backfill(self):
+        self.generate()
+        timeline = set(Timeline.objects.values_list('user_id', 'post_id'))
+        feed.backfill(User.objects.all())
+        self.assertEqual(
+            set(Timeline.objects.values_list('user_id', 'post_id')),
+            timeline,
+        )
+
+    def test_prefix_must_be_free(self):
+        self.generate(posts=0, comments=0, follows=0)
+        with self.assertRaises(CommandError):
+            self.generate()
@@ -0,0 +1,68 @@
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from ..models import Group, Post, Follow
+from users.models import Profile
+
+User = get_user_model()
+
+
+class ListingQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.profile = Profile.objects.create(user=cls.user)
+        cls.reader = User.objects.create_user(username='reader')
+        Profile.objects.create(user=cls.reader)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+            creator=cls.user,
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def create_posts(self, count):
+        for _ in range(count):
+            author = User.objects.create_user(
+                username=f'author{User.objects.count()}'
+            )
+            Profile.objects.create(user=author)
+            Post.objects.create(
+                author=author, text='В группе', group=self.group
+            )
+            Post.objects.create(author=self.user, text='Пост', group=None)
+
+    def count_queries(self, address):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(address)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_page_size(self):
+        addresses = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'HasNoName'}),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:follow_index'),
+            reverse('posts:post_search') + '?query=Пост',
+            '/api/v1/posts/',
+            '/api/v1/posts/?limit=10',
+        )
+        self.create_posts(1)
+        small_page = {
+            address: self.count_queries(address) for address in addresses
+        }
+        self.create_posts(9)
+        for address in addresses:
+            with self.subTest(address=address):
+                self.assertEqual(
+                    self.count_queries(address), small_page[address]
+                )
@@ -0,0 +1,116 @@
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core.pagination import NEXT, encode_cursor
+from ..models import Group, Post, Follow
+from users.models import Profile
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.profile = Profile.objects.create(user=cls.user)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+            creator=cls.user,
+        )
+        Post.objects.bulk_create(
+            Post(
+                text=f'Тестовый пост {i}',
+                author=cls.user,
+                group=cls.group,
+            )
+            for i in range(23)
+        )
+        # Одинаковая дата у всех постов: порядок держится на id
+        Post.objects.update(pub_date=timezone.now())
+        for i in range(13):
+            follower = User.objects.create_user(username=f'follower{i}')
+            Profile.objects.create(user=follower)
+            Follow.objects.create(user=follower, group=cls.group)
+
+    def setUp(self):
+        # Страницы для гостей иначе берутся из кэша, без контекста
+        caches['pages'].clear()
+        self.guest_client = Client()
+
+    def walk(self, address):
+        pages = []
+        response = self.guest_client.get(address)
+        pages.append(list(response.context['page_obj']))
+        while response.context['page_obj'].has_next():
+            cursor = response.context['page_obj'].next_cursor
+            response = self.guest_client.get(f'{address}?cursor={cursor}')
+            pages.append(list(response.context['page_obj']))
+        return pages, response
+
+    def test_pages_cover_all_posts_once(self):
+        pages, _ = self.walk(reverse('posts:index'))
+        self.assertEqual([len(page) for page in pages], [10, 10, 3])
+        ids = [post.id for page in pages for post in page]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(set(ids)), 23)
+
+    def test_previous_cursor(self):
+        address = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        pages, response = self.walk(address)
+        cursor = response.context['page_obj'].previous_cursor
+        response = self.guest_client.get(f'{address}?cursor={cursor}')
+        self.assertEqual(list(response.context['page_obj']), pages[1])
+        self.assertTrue(response.context['page_obj'].has_previous())
+
+    def test_no_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertFalse(
+            any('COUNT(' in query['sql'] for query in queries)
+        )
+        self.assertNotContains(response, '?page=')
+
+    def test_bad_cursor_returns_first_page(self):
+        response = self.guest_client.get(
+            reverse('posts:index') + '?cursor=not-a-cursor'
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_cursor_with_invalid_values_returns_first_page(self):
+        for address, values in (
+            (reverse('posts:index'), [None, 1]),
+            (reverse('posts:index'), ['2024-01-01T00:00:00+00:00', None]),
+            (reverse('posts:index'), ['2024-01-01T00:00:00', 1]),
+            (reverse('posts:index'), ['2024-01-01', 1]),
+            (reverse('posts:profile', args=['HasNoName']), [None, None]),
+            (reverse('posts:group_followers', args=['test-slug']),
+             [None, 1]),
+        ):
+            with self.subTest(address=address, values=values):
+                cursor = encode_cursor([NEXT, values])
+                response = self.guest_client.get(f'{address}?cursor={cursor}')
+                self.assertEqual(response.status_code, 200)
+                self.assertFalse(
+                    response.context['page_obj'].has_previous()
+                )
+
+    def test_numbered_pagination_is_opt_in(self):
+        response = self.guest_client.get(reverse('posts:index') + '?page=3')
+        self.assertEqual(len(response.context['page_obj']), 3)
+        self.assertEqual(response.context['page_obj'].number, 3)
+
+    def test_group_followers(self):
+        address = reverse('posts:group_followers',
+                          kwargs={'slug': 'test-slug'})
+        pages, _ = self.walk(address)
+        self.assertEqual([len(page) for page in pages], [10, 3])
+        usernames = {user.username for page in pages for user in page}
+        self.assertEqual(len(usernames), 13)
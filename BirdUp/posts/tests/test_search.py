@@ -0,0 +1,253 @@
+from io import StringIO
+from urllib.parse import urlencode
+
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from .. import analysis, search, search_cache
+from ..models import Group, Post
+from users.models import Profile
+
+User = get_user_model()
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.profile = Profile.objects.create(user=cls.user)
+
+    def setUp(self):
+        search_cache.clear()
+        self.guest_client = Client()
+
+    def found(self, query):
+        return list(search.search_posts(query))
+
+    def test_index_follows_posts(self):
+        self.assertTrue(search.fts_available())
+        post = Post.objects.create(author=self.user, text='Летний закат')
+        Post.objects.bulk_create([Post(author=self.user, text='Зимний лес')])
+        self.assertEqual(self.found('закат'), [post])
+        self.assertEqual(len(self.found('ЗИМНИЙ')), 1)
+        post.text = 'Осенний дождь'
+        post.save()
+        self.assertEqual(self.found('закат'), [])
+        self.assertEqual(self.found('дождь'), [post])
+        Post.objects.filter(id=post.id).update(text='Весенний ручей')
+        self.assertEqual(self.found('ручей'), [post])
+        post.delete()
+        self.assertEqual(self.found('ручей'), [])
+
+    def test_writes_without_app(self):
+        # Триггеры - обычный SQL: запись в обход ORM не требует функций
+        # приложения и попадает в индекс при следующем поиске
+        post = Post.objects.create(author=self.user, text='Старый текст')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE posts_post SET text = %s WHERE id = %s',
+                ['Снежная буря', post.id],
+            )
+        self.assertEqual(self.found('буря'), [post])
+        self.assertEqual(search.flush(), 0)
+
+    def test_prefix_and_all_words(self):
+        post = Post.objects.create(author=self.user, text='Тестовые посты')
+        Post.objects.create(author=self.user, text='Тестовые заметки')
+        self.assertEqual(self.found('тест пост'), [post])
+        self.assertEqual(self.found('"*'), [])
+
+    def test_ranked_by_relevance(self):
+        rare = Post.objects.create(
+            author=self.user, text='Кот и много других слов про разное'
+        )
+        often = Post.objects.create(author=self.user, text='Кот кот кот')
+        self.assertEqual(self.found('кот'), [often, rare])
+
+    def test_rebuild_command(self):
+        post = Post.objects.create(author=self.user, text='Пропавший пост')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.POSTS.table}')
+        self.assertEqual(self.found('пропавший'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('пропавший'), [post])
+
+    def test_search_page(self):
+        post = Post.objects.create(author=self.user, text='Поиск работает')
+        response = self.guest_client.get(
+            reverse('posts:post_search'), {'query': 'работает'}
+        )
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_russian_word_forms(self):
+        post = Post.objects.create(
+            author=self.user, text='Над озером кружила птица, ещё одна'
+        )
+        for query in ('птицы', 'птицей', 'озёра', 'кружили', 'еще птиц'):
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query), [post])
+        self.assertEqual(self.found('над'), [])
+
+
+class AnalysisTest(TestCase):
+    def test_stemmer(self):
+        words = {
+            'птицы': 'птиц',
+            'красивейшая': 'красив',
+            'возможность': 'возможн',
+            'пробежавшись': 'пробежа',
+            'сделанные': 'сдела',
+            'длинный': 'длин',
+            'django': 'django',
+        }
+        for word, stem in words.items():
+            with self.subTest(word=word):
+                self.assertEqual(analysis.stem_word(word), stem)
+
+    def test_pipeline(self):
+        self.assertEqual(
+            analysis.analyze('Ёжики и ЕЛИ, а не сосны!'),
+            ['ежик', 'ел', 'сосн'],
+        )
+        with override_settings(SEARCH_ANALYZER=[
+            'posts.analysis.tokenize', 'posts.analysis.lowercase',
+        ]):
+            self.assertEqual(
+                analysis.analyze('Ёжики и ЕЛИ'), ['ёжики', 'и', 'ели']
+            )
+
+
+class GroupSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        Profile.objects.create(user=cls.user)
+
+    def test_title_outranks_description(self):
+        described = Group.objects.create(
+            title='Прогулки', slug='walks', creator=self.user,
+            description='Смотрим на птиц в парке',
+        )
+        titled = Group.objects.create(
+            title='Птицы города', slug='birds', creator=self.user,
+        )
+        Group.objects.create(title='Кошки', slug='cats', creator=self.user)
+        self.assertEqual(
+            list(search.search_groups('птица')), [titled, described]
+        )
+        titled.title = 'Собаки'
+        titled.save()
+        self.assertEqual(list(search.search_groups('птица')), [described])
+
+
+@override_settings(SEARCH_MAX_RESULTS=12)
+class SearchPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        Profile.objects.create(user=cls.user)
+        for i in range(15):
+            user = User.objects.create_user(username=f'reader{i:02}')
+            Profile.objects.create(user=user)
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i:02}', creator=cls.user
+            )
+            Post.objects.create(author=cls.user, text=f'Общий пост {i}')
+
+    def setUp(self):
+        search_cache.clear()
+        self.guest_client = Client()
+
+    def test_results_are_paginated_and_capped(self):
+        searches = {
+            'posts:post_search': 'общий',
+            'posts:user_search': 'reader',
+            'posts:group_search': 'Группа',
+        }
+        for name, query in searches.items():
+            with self.subTest(name=name):
+                address = reverse(name)
+                response = self.guest_client.get(address, {'query': query})
+                self.assertEqual(response.context['paginator'].count, 12)
+                self.assertEqual(len(response.context['page_obj']), 10)
+                self.assertContains(response, 'Показаны первые 12')
+                self.assertContains(response, urlencode(
+                    {'query': query, 'page': 2}
+                ).replace('&', '&amp;'))
+                response = self.guest_client.get(
+                    address, {'query': query, 'page': 2}
+                )
+                self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_post_search_keeps_newest_matches(self):
+        response = self.guest_client.get(
+            reverse('posts:post_search'), {'query': 'общий', 'page': 2}
+        )
+        found = set(response.context['paginator'].object_list)
+        newest = set(Post.objects.order_by('-id')[:12])
+        self.assertEqual(found, newest)
+
+    def test_empty_query(self):
+        response = self.guest_client.get(
+            reverse('posts:user_search'), {'query': ''}
+        )
+        self.assertRedirects(response, reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:group_search'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+
+class SearchCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        Profile.objects.create(user=cls.user)
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Profile.objects.create(user=cls.staff)
+        cls.post = Post.objects.create(author=cls.user, text='Птицы в парке')
+
+    def setUp(self):
+        search_cache.clear()
+        self.guest_client = Client()
+
+    def search(self, query):
+        response = self.guest_client.get(
+            reverse('posts:post_search'), {'query': query}
+        )
+        return list(response.context['page_obj'])
+
+    def test_normalized_queries_share_entry(self):
+        self.assertEqual(self.search('Птицы'), [self.post])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.search('птица'), [self.post])
+        self.assertEqual(search_cache.stats.hits['posts'], 1)
+        self.assertEqual(search_cache.stats.misses['posts'], 1)
+
+    def test_writes_invalidate_results(self):
+        self.assertEqual(self.search('птица'), [self.post])
+        other = Post.objects.create(author=self.user, text='Птица на крыше')
+        self.assertEqual(set(self.search('птица')), {self.post, other})
+        other.text = 'Кошка на крыше'
+        other.save()
+        self.assertEqual(self.search('птица'), [self.post])
+        self.post.delete()
+        self.assertEqual(self.search('птица'), [])
+        self.assertEqual(search_cache.stats.hits['posts'], 0)
+
+    def test_stats_for_staff_only(self):
+        self.search('птица')
+        self.search('птица')
+        address = reverse('posts:search_stats')
+        self.assertEqual(self.guest_client.get(address).status_code, 302)
+        self.guest_client.force_login(self.user)
+        self.assertEqual(self.guest_client.get(address).status_code, 302)
+        self.guest_client.force_login(self.staff)
+        stats = self.guest_client.get(address).json()['posts']
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -34,6 +35,9 @@ class PostPagesTests(TestCase):
             content=small_gif,
             content_type='image/gif'
         )
+        # Файл называется по SHA-256 содержимого
+        digest = hashlib.sha256(small_gif).hexdigest()
+        cls.image_name = f'blobs/{digest[:2]}/{digest[2:4]}/{digest}.gif'
         cls.user = User.objects.create_user(username='HasNoName')
         cls.profile = Profile.objects.create(user=cls.user)
         cls.group = Group.objects.create(
@@ -98,7 +102,7 @@ class PostPagesTests(TestCase):
         post_image_0 = first_object.image
         self.assertEqual(post_text_0, 'Тестовый пост, '
                          'тестовый пост, тестовый пост')
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0.name, self.image_name)
 
     def test_group_posts_page_correct_context(self):
         response = self.authorized_client.get(
@@ -114,7 +118,7 @@ class PostPagesTests(TestCase):
         self.assertEqual(group_slug_0, 'test-slug')
         self.assertEqual(post_text_0, 'Тестовый пост, '
                          'тестовый пост, тестовый пост')
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0.name, self.image_name)
 
     # def test_profile_page_correct_context(self):
         # response = self.authorized_client.get(
@@ -141,7 +145,7 @@ class PostPagesTests(TestCase):
         post_image_0 = first_object.image
         self.assertEqual(post_text_0, 'Тестовый пост, '
                          'тестовый пост, тестовый пост')
-        self.assertEqual(post_image_0, 'posts/small.gif')
+        self.assertEqual(post_image_0.name, self.image_name)
 
     def test_post_create_page_correct_context(self):
         response = self.authorized_client.get(reverse('posts:create'))
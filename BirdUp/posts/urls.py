@@ -42,4 +42,8 @@ urlpatterns = [
          views.UserSearchView.as_view(), name='user_search'),
     path('group_search/',
          views.GroupSearchView.as_view(), name='group_search'),
+    path('search_stats/',
+         views.SearchCacheStats.as_view(), name='search_stats'),
+    path('cache_stats/',
+         views.CacheStats.as_view(), name='cache_stats'),
 ]
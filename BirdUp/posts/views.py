@@ -1,11 +1,20 @@
-from django.shortcuts import get_object_or_404, redirect, render
+from django.shortcuts import redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
 from .models import Post, Group, Follow
+from . import counters, feed, search_cache, searchers
 from posts.forms import PostForm, CommentForm, GroupForm, SearchForm
 from django.contrib.auth import get_user_model
 from django.views.generic import ListView, DetailView, CreateView, UpdateView
 from django.views.generic import View
+from django.conf import settings
+from django.db.models import F
 from django.urls import reverse
+from django.utils.decorators import method_decorator
+from core import cache, identity, thumbnails
+from core.conditional import ConditionalGetMixin
+from core.pagination import CursorPaginationMixin
 
 User = get_user_model()
 
@@ -13,12 +22,34 @@ User = get_user_model()
 POSTS_ON_PAGE = 10
 
 
+class PostThumbnailsMixin:
+    """Миниатюры картинок постов страницы одним запросом, а не
+    запросом на каждый пост."""
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Посты с готовыми копиями показывают srcset, не миниатюру
+        thumbnails.prefetch(
+            [post.image for post in context['page_obj']
+             if not post.image_variants],
+            thumbnails.POST_SIZES[0],
+        )
+        return context
+
+
 # Главная
-class Index(ListView):
+class Index(ConditionalGetMixin, PostThumbnailsMixin, CursorPaginationMixin,
+            ListView):
     template_name = 'posts/index.html'
     model = Post
     paginate_by = POSTS_ON_PAGE
 
+    cache_anonymous = True
+    scopes = ('posts', 'users')
+
+    def get_queryset(self):
+        return Post.objects.for_listing()
+
     def get_context_data(self, **kwargs):
         context = {
             'index': True,
@@ -27,24 +58,31 @@ class Index(ListView):
 
 
 # Профиль
-class Profile(ListView):
+class Profile(ConditionalGetMixin, PostThumbnailsMixin, CursorPaginationMixin,
+              ListView):
     template_name = 'posts/profile.html'
     slug_url_kwarg = 'username'
     paginate_by = POSTS_ON_PAGE
+    cache_anonymous = True
+
+    def get_scopes(self):
+        author = identity.get_object(
+            self.request, User, username=self.kwargs['username']
+        )
+        return [f'user:{author.pk}']
 
     def get_queryset(self):
-        return Post.objects.filter(
+        return Post.objects.for_listing().filter(
             author__username=self.kwargs['username']).filter(
                 group__isnull=True
         )
 
     def get_context_data(self, **kwargs):
         user = self.request.user
-        author = get_object_or_404(User, username=self.kwargs['username'])
-        no_group = Post.objects.filter(
-            author__username=self.kwargs['username']).filter(
-                group__isnull=True
+        author = identity.get_object(
+            self.request, User, username=self.kwargs['username']
         )
+        author_counters = counters.for_user(author)
         if self.request.user.is_authenticated:
             following = Follow.objects.filter(
                 user=user, author=author
@@ -60,23 +98,37 @@ class Profile(ListView):
             'following': following,
             'follow_button': follow_button,
             'profile': True,
-            'no_group': no_group,
+            'count': author_counters.profile_post_count,
+            'follower_count': author_counters.follower_count,
         }
         return super().get_context_data(**context)
 
 
 # Пост
-class PostDetail(DetailView):
+class PostDetail(ConditionalGetMixin, DetailView):
     template_name = 'posts/post_detail.html'
     model = Post
     pk_url_kwarg = 'post_id'
+    cache_anonymous = True
+
+    def get_scopes(self):
+        post = self.get_object()
+        # users - имена комментаторов
+        scopes = [f'post:{post.pk}', f'user:{post.author_id}', 'users']
+        if post.group_id:
+            scopes.append(f'group:{post.group_id}')
+        return scopes
+
+    def get_object(self, queryset=None):
+        return identity.get_object(
+            self.request, Post, id=self.kwargs['post_id']
+        )
 
     def get_context_data(self, **kwargs):
-        post = get_object_or_404(Post, id=self.kwargs['post_id'])
+        post = self.get_object()
         form = CommentForm()
-        author = post.author
-        count = author.posts.count()
-        comments = post.comments.all()
+        count = counters.for_user(post.author).post_count
+        comments = post.comments.select_related('author')
         context = {
             'post': post,
             'count': count,
@@ -87,19 +139,30 @@ class PostDetail(DetailView):
 
 
 # Группа
-class GroupPosts(ListView):
+class GroupPosts(ConditionalGetMixin, PostThumbnailsMixin,
+                 CursorPaginationMixin, ListView):
     template_name = 'posts/group_list.html'
     slug_url_kwarg = 'slug'
     paginate_by = POSTS_ON_PAGE
+    cache_anonymous = True
+
+    def get_scopes(self):
+        group = identity.get_object(
+            self.request, Group, slug=self.kwargs['slug']
+        )
+        return [f'group:{group.pk}', 'users']
 
     def get_queryset(self):
-        return Post.objects.filter(group__slug=self.kwargs['slug'])
+        return Post.objects.for_listing().filter(
+            group__slug=self.kwargs['slug']
+        )
 
     def get_context_data(self, **kwargs):
-        group = get_object_or_404(Group, slug=self.kwargs['slug'])
+        group = identity.get_object(
+            self.request, Group, slug=self.kwargs['slug']
+        )
         user = self.request.user
-        post_list = group.group_posts.all()
-        count = post_list.count()
+        count = group.post_count
         if group.creator == self.request.user:
             group_post = True
         elif self.request.user.is_authenticated:
@@ -141,7 +204,7 @@ class PostCreate(CreateView, LoginRequiredMixin):
         post = form.save(commit=False)
         post.author = self.request.user
         post.save()
-        if post.group in Group.objects.all():
+        if post.group_id:
             return redirect('posts:group_list', slug=post.group.slug)
         return super().form_valid(form)
 
@@ -165,7 +228,7 @@ class PostEdit(UpdateView, LoginRequiredMixin):
     pk_url_kwarg = 'post_id'
 
     def get_context_data(self, **kwargs):
-        post = get_object_or_404(Post, id=self.kwargs['post_id'])
+        post = self.get_object()
         form = PostForm(instance=post)
         context = {
             'form': form,
@@ -174,15 +237,21 @@ class PostEdit(UpdateView, LoginRequiredMixin):
         }
         return super().get_context_data(**context)
 
+    def get_object(self, queryset=None):
+        return identity.get_object(
+            self.request, Post, id=self.kwargs['post_id']
+        )
+
     def form_valid(self, form):
-        post_group = get_object_or_404(Post, id=self.kwargs['post_id'])
         post = form.save(commit=False)
-        post.group = post_group.group
+        # Группу поста при редактировании не меняем
+        post.group_id = self.group_id
         post.save()
         return super().form_valid(form)
 
     def dispatch(self, request, *args, **kwargs):
-        post = get_object_or_404(Post, id=self.kwargs['post_id'])
+        post = self.get_object()
+        self.group_id = post.group_id
         if not request.user.is_authenticated:
             return self.handle_no_permission()
         if post.author != request.user:
@@ -198,8 +267,10 @@ class AddComment(CreateView, LoginRequiredMixin):
     pk_url_kwarg = 'post_id'
 
     def form_valid(self, form):
-        post = get_object_or_404(Post, id=self.kwargs['post_id'])
-        user = get_object_or_404(User, id=self.request.user.id)
+        post = identity.get_object(
+            self.request, Post, id=self.kwargs['post_id']
+        )
+        user = self.request.user
         comment = form.save(commit=False)
         comment.author = user
         comment.post = post
@@ -213,18 +284,16 @@ class AddComment(CreateView, LoginRequiredMixin):
 
 
 # Cтраница ленты
-class FollowIndex(ListView, LoginRequiredMixin):
+class FollowIndex(PostThumbnailsMixin, CursorPaginationMixin, ListView,
+                  LoginRequiredMixin):
     template_name = 'posts/follow.html'
     paginate_by = POSTS_ON_PAGE
 
     def get_queryset(self):
-        author_following = Post.objects.filter(
-            author__following__user=self.request.user
-        )
-        group_following = Post.objects.filter(
-            group__group_following__user=self.request.user
-        )
-        return list(author_following | group_following)
+        return feed.feed_for(self.request.user)
+
+    def get_cursor_paginator(self, queryset, page_size):
+        return feed.FeedPaginator(self.request.user, page_size)
 
     def get_context_data(self, **kwargs):
         context = {
@@ -243,7 +312,7 @@ class ProfileFollow(View, LoginRequiredMixin):
 
     def get(self, request, username):
         user = request.user
-        author = get_object_or_404(User, username=username)
+        author = identity.get_object(request, User, username=username)
         follow = Follow.objects.filter(user=user, author=author)
         if user != author and not follow.exists():
             Follow.objects.create(user=user, author=author)
@@ -260,7 +329,7 @@ class ProfileUnfollow(View, LoginRequiredMixin):
 
     def get(self, request, username):
         user = request.user
-        author = get_object_or_404(User, username=username)
+        author = identity.get_object(request, User, username=username)
         follow = Follow.objects.filter(user=user, author=author)
         if follow.exists():
             follow.delete()
@@ -291,10 +360,12 @@ class GroupCreate(CreateView, LoginRequiredMixin):
 
 
 # Список групп
-class GroupIndex(ListView):
+class GroupIndex(ConditionalGetMixin, ListView):
     template_name = 'posts/groups.html'
     model = Group
     paginate_by = POSTS_ON_PAGE
+    cache_anonymous = True
+    scopes = ('groups',)
 
     def get_context_data(self, **kwargs):
         context = {
@@ -308,7 +379,7 @@ class GroupFollow(View, LoginRequiredMixin):
 
     def get(self, request, slug):
         user = request.user
-        group = get_object_or_404(Group, slug=slug)
+        group = identity.get_object(request, Group, slug=slug)
         follow = Follow.objects.filter(user=user, group=group)
         if not follow.exists():
             Follow.objects.create(user=user, group=group)
@@ -325,7 +396,7 @@ class GroupUnfollow(View, LoginRequiredMixin):
 
     def get(self, request, slug):
         user = request.user
-        group = get_object_or_404(Group, slug=slug)
+        group = identity.get_object(request, Group, slug=slug)
         follow = Follow.objects.filter(user=user, group=group)
         if follow.exists():
             follow.delete()
@@ -344,25 +415,31 @@ class GroupPostCreate(CreateView, LoginRequiredMixin):
     slug_url_kwarg = 'slug'
 
     def get_context_data(self, **kwargs):
-        group = get_object_or_404(Group, slug=self.kwargs['slug'])
+        group = identity.get_object(
+            self.request, Group, slug=self.kwargs['slug']
+        )
         context = {
             'group': group,
         }
         return super().get_context_data(**context)
 
     def form_valid(self, form):
-        group = get_object_or_404(Group, slug=self.kwargs['slug'])
+        group = identity.get_object(
+            self.request, Group, slug=self.kwargs['slug']
+        )
         post = form.save(commit=False)
         post.author = self.request.user
         post.group = group
         post.save()
-        if post.group in Group.objects.all():
+        if post.group_id:
             return redirect('posts:group_list', slug=post.group.slug)
         return super().form_valid(form)
 
     def dispatch(self, request, *args, **kwargs):
         user = request.user
-        group = get_object_or_404(Group, slug=self.kwargs['slug'])
+        group = identity.get_object(
+            self.request, Group, slug=self.kwargs['slug']
+        )
         if not request.user.is_authenticated:
             return self.handle_no_permission()
         follow = Follow.objects.filter(user=user, group=group)
@@ -372,89 +449,83 @@ class GroupPostCreate(CreateView, LoginRequiredMixin):
         return super().dispatch(request, *args, **kwargs)
 
 
-# Поиск по постам
-class PostSearchView(ListView):
-    model = Post
-    template_name = 'posts/post_search.html'
+class SearchMixin:
+    """Поиск с постраничным выводом.
+
+    Выдача ограничена settings.SEARCH_MAX_RESULTS: на широкий запрос
+    база останавливается на первых совпадениях и не читает все строки.
+    Найденные id кэшируются по нормализованному запросу (searchers),
+    страница читает из базы только свои строки.
+    """
     paginate_by = POSTS_ON_PAGE
 
     def get(self, request, *args, **kwargs):
-        query = self.request.GET.get('query')
-        form = SearchForm()
-        if query == '':
+        self.query = request.GET.get('query')
+        if self.query == '':
             return redirect('posts:index')
-        elif query:
-            self.object_list = self.get_queryset()
-        return render(
-            request,
-            self.template_name,
-            {'form': form, 'page_obj': self.object_list, 'query': query}
-        )
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        query = self.request.GET.get('query')
-        return Post.objects.filter(text__icontains=query)
+        if not self.query:
+            return self.model.objects.none().order_by('pk')
+        return self.searcher.results(self.query)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'form': SearchForm(),
+            'query': self.query,
+            'max_results': settings.SEARCH_MAX_RESULTS,
+        })
+        return context
+
+
+# Поиск по постам
+class PostSearchView(SearchMixin, ListView):
+    model = Post
+    template_name = 'posts/post_search.html'
+    searcher = searchers.POSTS
 
 
 # Поиск по пользователям
-class UserSearchView(ListView):
+class UserSearchView(SearchMixin, ListView):
     model = User
     template_name = 'posts/user_search.html'
-    paginate_by = POSTS_ON_PAGE
-
-    def get(self, request, *args, **kwargs):
-        query = self.request.GET.get('query')
-        form = SearchForm()
-        if query == '':
-            return redirect('posts:index')
-        elif query:
-            self.object_list = self.get_queryset()
-        return render(
-            request,
-            self.template_name,
-            {'form': form, 'page_obj': self.object_list, 'query': query}
-        )
-
-    def get_queryset(self):
-        query = self.request.GET.get('query')
-        first_name = User.objects.filter(first_name__icontains=query)
-        last_name = User.objects.filter(last_name__icontains=query)
-        username = User.objects.filter(username__icontains=query)
-        return list(first_name | last_name | username)
+    searcher = searchers.USERS
 
 
 # Поиск по группам
-class GroupSearchView(ListView):
+class GroupSearchView(SearchMixin, ListView):
     model = Group
     template_name = 'posts/group_search.html'
-    paginate_by = POSTS_ON_PAGE
+    searcher = searchers.GROUPS
+
 
+# Статистика кэша поиска
+@method_decorator(staff_member_required, name='dispatch')
+class SearchCacheStats(View):
     def get(self, request, *args, **kwargs):
-        query = self.request.GET.get('query')
-        form = SearchForm()
-        if query == '':
-            return redirect('posts:index')
-        elif query:
-            self.object_list = self.get_queryset()
-        return render(
-            request,
-            self.template_name,
-            {'form': form, 'page_obj': self.object_list, 'query': query}
-        )
+        return JsonResponse(search_cache.stats.as_dict())
 
-    def get_queryset(self):
-        query = self.request.GET.get('query')
-        title = Group.objects.filter(title__icontains=query)
-        description = Group.objects.filter(description__icontains=query)
-        return list(title | description)
+
+# Статистика уровней кэшей
+@method_decorator(staff_member_required, name='dispatch')
+class CacheStats(View):
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(cache.stats())
 
 
 # Подписчики группы
-class GroupFollowers(ListView):
+class GroupFollowers(CursorPaginationMixin, ListView):
     template_name = 'posts/group_followers.html'
     slug_url_kwarg = 'slug'
     paginate_by = POSTS_ON_PAGE
+    cursor_ordering = ('-followed_at', '-id')
 
     def get_queryset(self):
-        group = get_object_or_404(Group, slug=self.kwargs['slug'])
-        return User.objects.filter(follower__group=group)
+        group = identity.get_object(
+            self.request, Group, slug=self.kwargs['slug']
+        )
+        return User.objects.filter(follower__group=group).annotate(
+            followed_at=F('follower__pub_date')
+        ).select_related('profile')
@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.db import models
+from core.ingest import IngestImageField
 from .models import Profile
 
 
@@ -10,6 +12,9 @@ class ProfileAdmin(admin.ModelAdmin):
     search_fields = ('user',)
     list_filter = ('user',)
     empty_value_display = '-пусто-'
+    formfield_overrides = {
+        models.ImageField: {'form_class': IngestImageField},
+    }
 
 
 admin.site.register(Profile, ProfileAdmin)
@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
 from django.forms import ModelForm
+from core.ingest import IngestImageField
 from .models import Profile
 
 
@@ -23,3 +24,4 @@ class ProfileEditForm(ModelForm):
     class Meta:
         model = Profile
         fields = ('about', 'photo')
+        field_classes = {'photo': IngestImageField}
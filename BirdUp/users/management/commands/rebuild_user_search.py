@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users import search
+
+
+class Command(BaseCommand):
+    help = 'Заново строит ключи поиска пользователей'
+
+    def handle(self, *args, **options):
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Ключи поиска перестроены'))
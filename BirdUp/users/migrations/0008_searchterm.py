@@ -0,0 +1,102 @@
+# Generated by Django 3.2.20 on 2026-10-18 09:08
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Правила ключей поиска на момент миграции (users.search): их
+# дальнейшие изменения не должны менять то, что делает эта миграция
+SPACES = re.compile(r'[^\w]+')
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l',
+    'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's',
+    'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch',
+    'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e',
+    'ю': 'yu', 'я': 'ya',
+}
+LATIN_TO_CYRILLIC = [
+    ('shch', 'щ'), ('sch', 'щ'), ('zh', 'ж'), ('kh', 'х'), ('ts', 'ц'),
+    ('ch', 'ч'), ('sh', 'ш'), ('yu', 'ю'), ('ya', 'я'), ('yo', 'е'),
+    ('a', 'а'), ('b', 'б'), ('c', 'к'), ('d', 'д'), ('e', 'е'),
+    ('f', 'ф'), ('g', 'г'), ('h', 'х'), ('i', 'и'), ('j', 'дж'),
+    ('k', 'к'), ('l', 'л'), ('m', 'м'), ('n', 'н'), ('o', 'о'),
+    ('p', 'п'), ('q', 'к'), ('r', 'р'), ('s', 'с'), ('t', 'т'),
+    ('u', 'у'), ('v', 'в'), ('w', 'в'), ('x', 'кс'), ('y', 'й'),
+    ('z', 'з'),
+]
+LATIN = re.compile('|'.join(latin for latin, _ in LATIN_TO_CYRILLIC))
+LATIN_MAP = dict(LATIN_TO_CYRILLIC)
+
+
+def normalize(text):
+    text = (text or '').casefold().replace('ё', 'е')
+    return ' '.join(SPACES.sub(' ', text).split())
+
+
+def terms_for(username, first_name, last_name):
+    first_name, last_name = normalize(first_name), normalize(last_name)
+    names = {
+        normalize(username), first_name, last_name,
+        f'{first_name} {last_name}', f'{last_name} {first_name}',
+    }
+    terms = set()
+    for name in names:
+        name = name.strip()
+        if name:
+            terms.update((
+                name,
+                ''.join(CYRILLIC_TO_LATIN.get(char, char) for char in name),
+                LATIN.sub(lambda match: LATIN_MAP[match.group()], name),
+            ))
+    return terms
+
+
+def fill_search_terms(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    SearchTerm = apps.get_model('users', 'SearchTerm')
+    SearchTerm.objects.bulk_create(
+        (
+            SearchTerm(user_id=user.id, term=term[:300])
+            for user in User.objects.iterator()
+            for term in terms_for(
+                user.username, user.first_name, user.last_name
+            )
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('users', '0007_auto_20221205_0014'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=300, verbose_name='Ключ поиска')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Ключ поиска',
+                'verbose_name_plural': 'Ключи поиска',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'user'], name='user_search_term'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('user', 'term'), name='unique_user_search_term'),
+        ),
+        migrations.RunPython(fill_search_terms, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.20 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_searchterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='photo_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Копии фото'),
+        ),
+    ]
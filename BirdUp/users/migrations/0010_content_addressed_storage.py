@@ -0,0 +1,19 @@
+# Generated by Django 3.2.20 on 2026-10-18 09:26
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='users/', verbose_name='Фото'),
+        ),
+    ]
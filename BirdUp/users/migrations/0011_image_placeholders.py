@@ -0,0 +1,33 @@
+# Generated by Django 3.2.20 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_content_addressed_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='photo_color',
+            field=models.CharField(blank=True, editable=False, max_length=7, verbose_name='Основной цвет фото'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='photo_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Высота фото'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='photo_lqip',
+            field=models.TextField(blank=True, editable=False, verbose_name='Превью фото'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='photo_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина фото'),
+        ),
+    ]
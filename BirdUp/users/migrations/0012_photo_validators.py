@@ -0,0 +1,20 @@
+# Generated by Django 3.2.20 on 2026-10-18 11:20
+
+import core.ingest
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_image_placeholders'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='photo',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='users/', validators=[core.ingest.validate_upload], verbose_name='Фото'),
+        ),
+    ]
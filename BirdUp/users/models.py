@@ -1,6 +1,8 @@
 from django.urls import reverse
 from django.db import models
 from django.conf import settings
+from core.ingest import validate_upload
+from core.storage import ContentAddressedStorage
 
 
 class Profile(models.Model):
@@ -13,12 +15,47 @@ class Profile(models.Model):
         blank=True,
         null=True,
         verbose_name='О себе')
+    # Файл называется по содержимому (core.storage), upload_to
+    # не используется
     photo = models.ImageField(
         verbose_name='Фото',
         upload_to='users/',
+        storage=ContentAddressedStorage(),
+        validators=[validate_upload],
         blank=True,
         null=True,
     )
+    # Уменьшенные копии фото (core.derivatives)
+    photo_variants = models.JSONField(
+        verbose_name='Копии фото',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    # Размер, цвет и превью для вёрстки без чтения файла (core.ingest)
+    photo_width = models.PositiveIntegerField(
+        verbose_name='Ширина фото',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    photo_height = models.PositiveIntegerField(
+        verbose_name='Высота фото',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    photo_color = models.CharField(
+        verbose_name='Основной цвет фото',
+        max_length=7,
+        blank=True,
+        editable=False,
+    )
+    photo_lqip = models.TextField(
+        verbose_name='Превью фото',
+        blank=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Профиль'
@@ -29,3 +66,36 @@ class Profile(models.Model):
             'posts:profile',
             kwargs={'username': self.user.username}
         )
+
+
+class SearchTerm(models.Model):
+    """Нормализованный ключ поиска пользователя: имя, фамилия или логин
+    в нижнем регистре, на кириллице и латинице."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+    )
+    term = models.CharField(
+        max_length=300,
+        verbose_name='Ключ поиска',
+    )
+
+    def __str__(self):
+        return self.term
+
+    class Meta:
+        verbose_name = 'Ключ поиска'
+        verbose_name_plural = 'Ключи поиска'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'term'],
+                name='unique_user_search_term',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['term', 'user'],
+                name='user_search_term',
+            ),
+        ]
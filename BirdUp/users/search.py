@@ -0,0 +1,136 @@
+# Поиск пользователей по префиксу.
+# Для каждого пользователя хранятся ключи SearchTerm: логин, имя,
+# фамилия и полное имя в обоих порядках, приведённые к нижнему регистру,
+# с заменой ё на е, в исходном написании и в транслитерации. Запрос
+# нормализуется так же и ищется диапазоном term >= запрос AND
+# term < запрос + '\uffff' по индексу (term, user): LIKE 'запрос%' в
+# SQLite индекс без учёта регистра не использует.
+import re
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+
+from .models import SearchTerm
+
+User = get_user_model()
+
+# Верхняя граница диапазона префикса
+PREFIX_END = '\uffff'
+SPACES = re.compile(r'[^\w]+')
+
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l',
+    'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's',
+    'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts', 'ч': 'ch',
+    'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e',
+    'ю': 'yu', 'я': 'ya',
+}
+# Сначала длинные сочетания: shch раньше sh, sh раньше s
+LATIN_TO_CYRILLIC = [
+    ('shch', 'щ'), ('sch', 'щ'), ('zh', 'ж'), ('kh', 'х'), ('ts', 'ц'),
+    ('ch', 'ч'), ('sh', 'ш'), ('yu', 'ю'), ('ya', 'я'), ('yo', 'е'),
+    ('a', 'а'), ('b', 'б'), ('c', 'к'), ('d', 'д'), ('e', 'е'),
+    ('f', 'ф'), ('g', 'г'), ('h', 'х'), ('i', 'и'), ('j', 'дж'),
+    ('k', 'к'), ('l', 'л'), ('m', 'м'), ('n', 'н'), ('o', 'о'),
+    ('p', 'п'), ('q', 'к'), ('r', 'р'), ('s', 'с'), ('t', 'т'),
+    ('u', 'у'), ('v', 'в'), ('w', 'в'), ('x', 'кс'), ('y', 'й'),
+    ('z', 'з'),
+]
+LATIN = re.compile('|'.join(latin for latin, _ in LATIN_TO_CYRILLIC))
+LATIN_MAP = dict(LATIN_TO_CYRILLIC)
+
+
+def normalize(text):
+    """Нижний регистр, ё -> е, пробелы вместо знаков препинания."""
+    text = (text or '').casefold().replace('ё', 'е')
+    return ' '.join(SPACES.sub(' ', text).split())
+
+
+def to_latin(text):
+    return ''.join(CYRILLIC_TO_LATIN.get(char, char) for char in text)
+
+
+def to_cyrillic(text):
+    return LATIN.sub(lambda match: LATIN_MAP[match.group()], text)
+
+
+def terms_for(username, first_name, last_name):
+    """Ключи поиска по логину, имени и фамилии."""
+    first_name, last_name = normalize(first_name), normalize(last_name)
+    names = {
+        normalize(username), first_name, last_name,
+        f'{first_name} {last_name}', f'{last_name} {first_name}',
+    }
+    terms = set()
+    for name in names:
+        name = name.strip()
+        if name:
+            terms.update((name, to_latin(name), to_cyrillic(name)))
+    return terms
+
+
+def _entries(users):
+    return [
+        SearchTerm(user_id=user.id, term=term[:300])
+        for user in users
+        for term in terms_for(user.username, user.first_name, user.last_name)
+    ]
+
+
+def index_user(user):
+    """Пересобирает ключи поиска пользователя."""
+    SearchTerm.objects.filter(user_id=user.id).delete()
+    SearchTerm.objects.bulk_create(_entries([user]), ignore_conflicts=True)
+
+
+def index_users(users, batch_size=1000):
+    """Добавляет ключи поиска для пользователей без ключей."""
+    users = iter(users)
+    while True:
+        batch = list(islice(users, batch_size))
+        if not batch:
+            break
+        SearchTerm.objects.bulk_create(
+            _entries(batch), batch_size=batch_size, ignore_conflicts=True
+        )
+
+
+def rebuild(batch_size=1000):
+    """Заново строит ключи поиска для всех пользователей."""
+    SearchTerm.objects.all().delete()
+    index_users(
+        User.objects.only('username', 'first_name', 'last_name').iterator(),
+        batch_size,
+    )
+
+
+def matching_terms(query):
+    """Ключи, начинающиеся с нормализованного запроса."""
+    prefix = normalize(query)
+    if not prefix:
+        return SearchTerm.objects.none()
+    return SearchTerm.objects.filter(
+        term__gte=prefix, term__lt=prefix + PREFIX_END
+    )
+
+
+def search_users(query):
+    """Пользователи, у которых логин, имя или фамилия начинаются
+    с запроса."""
+    return User.objects.filter(
+        id__in=matching_terms(query).values('user_id')
+    )
+
+
+def autocomplete(query, limit):
+    """До limit пользователей для подсказки, в порядке ключей."""
+    user_ids = []
+    for user_id in matching_terms(query).order_by('term').values_list(
+            'user_id', flat=True).iterator():
+        if user_id not in user_ids:
+            user_ids.append(user_id)
+            if len(user_ids) == limit:
+                break
+    users = User.objects.in_bulk(user_ids)
+    return [users[user_id] for user_id in user_ids if user_id in users]
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core import blobs, derivatives, ingest, thumbnails
+from . import search
+from .models import Profile
+
+User = get_user_model()
+
+# Поля, из которых строятся ключи поиска
+SEARCH_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Вход обновляет только last_login: ключи пересобирать не нужно
+    if raw or (update_fields and not SEARCH_FIELDS & set(update_fields)):
+        return
+    search.index_user(instance)
+
+
+@receiver(post_init, sender=Profile)
+def profile_loaded(sender, instance, **kwargs):
+    instance._saved_photo = thumbnails.file_name(
+        instance.__dict__.get('photo')
+    )
+
+
+@receiver(pre_save, sender=Profile)
+def profile_saving(sender, instance, raw=False, **kwargs):
+    photo = instance.__dict__.get('photo')
+    if not raw and ingest.is_new(photo, instance._saved_photo):
+        ingest.fill_placeholder(instance, 'photo')
+
+
+@receiver(post_save, sender=Profile)
+def profile_saved(sender, instance, raw=False, **kwargs):
+    # Новое фото: миниатюры создаются заранее, до первого показа
+    photo = thumbnails.file_name(instance.__dict__.get('photo'))
+    if not raw and photo != instance._saved_photo:
+        blobs.replace(instance._saved_photo, photo)
+        thumbnails.schedule(photo, thumbnails.PHOTO_SIZES)
+        derivatives.schedule(instance, 'photo', 'photo_variants')
+        instance._saved_photo = photo
+
+
+@receiver(post_delete, sender=Profile)
+def profile_deleted(sender, instance, **kwargs):
+    blobs.release(instance._saved_photo)
@@ -0,0 +1,109 @@
+from io import StringIO
+
+from django.test import TestCase, Client
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import search_cache
+from . import search
+from .models import Profile, SearchTerm
+
+User = get_user_model()
+
+
+class UserSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='HasNoName', first_name='Пётр', last_name='Иванов'
+        )
+        cls.profile = Profile.objects.create(user=cls.user)
+        cls.other = User.objects.create_user(
+            username='john', first_name='John', last_name='Smith'
+        )
+        Profile.objects.create(user=cls.other)
+
+    def setUp(self):
+        search_cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def found(self, query):
+        return set(search.search_users(query))
+
+    def test_normalized_prefixes(self):
+        queries = {
+            'hasno': {self.user},
+            'ПЕТР': {self.user},
+            'petr': {self.user},
+            'иванов п': {self.user},
+            'ivanov': {self.user},
+            'дж': {self.other},
+            'smi': {self.other},
+            'смит': {self.other},
+            'ванов': set(),
+            '  ': set(),
+        }
+        for query, users in queries.items():
+            with self.subTest(query=query):
+                self.assertEqual(self.found(query), users)
+
+    def test_terms_follow_profile_edit(self):
+        response = self.authorized_client.post(
+            reverse('users:edit', kwargs={'profile_id': self.profile.id}),
+            {
+                'username': 'HasNoName',
+                'first_name': 'Павел',
+                'last_name': 'Сидоров',
+                'email': 'test@example.com',
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.found('сидоров'), {self.user})
+        self.assertEqual(self.found('иванов'), set())
+
+    def test_signup_and_login(self):
+        self.guest_client.post(reverse('users:signup'), {
+            'first_name': 'Анна',
+            'last_name': 'Петрова',
+            'username': 'anna',
+            'email': 'anna@example.com',
+            'password1': 'Pa55-word-long',
+            'password2': 'Pa55-word-long',
+        })
+        anna = User.objects.get(username='anna')
+        self.assertEqual(self.found('петрова'), {anna})
+        terms = SearchTerm.objects.filter(user=anna).count()
+        self.guest_client.login(username='anna', password='Pa55-word-long')
+        self.assertEqual(SearchTerm.objects.filter(user=anna).count(), terms)
+
+    def test_rebuild_command(self):
+        User.objects.bulk_create([User(username='bulk', first_name='Олег')])
+        self.assertEqual(self.found('олег'), set())
+        call_command('rebuild_user_search', stdout=StringIO())
+        self.assertEqual(
+            self.found('oleg'), {User.objects.get(username='bulk')}
+        )
+
+    def test_autocomplete(self):
+        address = reverse('users:autocomplete')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(address, {'query': 'Пет'})
+        self.assertLessEqual(len(queries), 2)
+        self.assertEqual(response.json(), {'results': [{
+            'username': 'HasNoName',
+            'full_name': 'Пётр Иванов',
+            'url': reverse('posts:profile', args=['HasNoName']),
+        }]})
+        response = self.guest_client.get(address)
+        self.assertEqual(response.json(), {'results': []})
+
+    def test_user_search_page(self):
+        response = self.guest_client.get(
+            reverse('posts:user_search'), {'query': 'Smith'}
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.other])
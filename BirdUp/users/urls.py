@@ -35,4 +35,6 @@ urlpatterns = [
          name='password_reset_complete'),
     path('profile_edit/<int:profile_id>', views.ProfileEdit.
          as_view(), name='edit'),
+    path('autocomplete/', views.Autocomplete.as_view(),
+         name='autocomplete'),
 ]
@@ -1,8 +1,13 @@
-from django.views.generic import CreateView, UpdateView
+from django.http import JsonResponse
+from django.views.generic import CreateView, UpdateView, View
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from .forms import CreationForm, UserEditForm, ProfileEditForm
 from users.models import Profile
+from . import search
+
+# Подсказок в автодополнении
+AUTOCOMPLETE_LIMIT = 10
 
 
 class SignUp(CreateView):
@@ -49,3 +54,20 @@ class ProfileEdit(UpdateView, LoginRequiredMixin):
         if not request.user.is_authenticated:
             return self.handle_no_permission()
         return super().dispatch(request, *args, **kwargs)
+
+
+class Autocomplete(View):
+    """Подсказки для поиска пользователей: логин, имя, адрес профиля."""
+
+    def get(self, request, *args, **kwargs):
+        users = search.autocomplete(
+            request.GET.get('query', ''), AUTOCOMPLETE_LIMIT
+        )
+        return JsonResponse({'results': [
+            {
+                'username': user.username,
+                'full_name': user.get_full_name(),
+                'url': reverse('posts:profile', args=[user.username]),
+            }
+            for user in users
+        ]})
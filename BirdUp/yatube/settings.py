@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 from datetime import timedelta
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -56,6 +57,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -154,14 +156,137 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/Media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'Media')
 
+# Приём изображений (core.ingest): загрузки пишутся на диск, файлы
+# больше IMAGE_UPLOAD_MAX_SIZE и с разрешением больше IMAGE_MAX_PIXELS
+# отклоняются, сохраняемый исходник не больше IMAGE_MAX_SIDE по
+# длинной стороне
+FILE_UPLOAD_HANDLERS = ['core.ingest.LimitedUploadHandler']
+IMAGE_UPLOAD_MAX_SIZE = 10 * 2 ** 20
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_SIDE = 2560
+# Файлы изображений без ссылок удаляются не раньше чем через столько
+# секунд: python manage.py sweep_blobs по расписанию
+BLOB_SWEEP_DELAY = 10 * 60
+
+# Миниатюры создаются фоновыми потоками (core.thumbnails); при
+# THUMBNAIL_ASYNC = False - сразу, в потоке запроса
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+# Ширины и форматы копий изображений для srcset (core.derivatives);
+# последний формат - запасной для браузеров без поддержки остальных
+IMAGE_WIDTHS = (320, 640, 960, 1280)
+IMAGE_FORMATS = ('webp', 'jpg')
+
+# Кэши двухуровневые (core.cache): небольшой LRU в памяти процесса
+# перед общим для всех воркеров кэшем в файлах CACHE_DIR
+CACHE_DIR = os.environ.get(
+    'CACHE_DIR', os.path.join(tempfile.gettempdir(), 'birdup-cache')
+)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'default',
+        'OPTIONS': {'SHARED': 'shared', 'MAX_ENTRIES': 1000},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'default'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    # id результатов поиска; лишние записи вытесняются
+    'search': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'search',
+        'TIMEOUT': 600,
+        'OPTIONS': {'SHARED': 'search_shared', 'MAX_ENTRIES': 1000},
+    },
+    'search_shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'search'),
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Страницы для гостей (core.conditional); ключи устаревших страниц
+    # больше не читаются и вытесняются по сроку
+    'pages': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'pages',
+        'TIMEOUT': 600,
+        'OPTIONS': {'SHARED': 'pages_shared', 'MAX_ENTRIES': 200},
+    },
+    'pages_shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'pages'),
+        'TIMEOUT': 600,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
 }
 
+# Тесты работают с кэшами во временном каталоге вместо CACHE_DIR
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Страницы для гостей без сессии отдаются из кэша 'pages'
+ANONYMOUS_PAGE_CACHE = True
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Группы с большим числом подписчиков не раздаются по лентам при
+# публикации, их посты подмешиваются в ленту при чтении
+FEED_FANOUT_THRESHOLD = 1000
+# Обратно в раздачу группа возвращается, когда подписчиков станет не
+# больше этого числа: отписка на пороге не переключает режим
+FEED_PUSH_THRESHOLD = 900
+# Раздача постов такой группы идёт в своём пуле фоновых потоков
+# (posts.feed); при FEED_ASYNC = False - сразу, после фиксации
+FEED_ASYNC = True
+FEED_WORKERS = 1
+
+# Сколько результатов поиска можно пролистать: на широкий запрос база
+# не читает больше этого числа совпадений
+SEARCH_MAX_RESULTS = 200
+
+# Шаги анализа текста для поиска по постам и группам. После изменения
+# нужно перестроить индекс: python manage.py rebuild_search_index
+SEARCH_ANALYZER = [
+    'posts.analysis.tokenize',
+    'posts.analysis.lowercase',
+    'posts.analysis.fold_yo',
+    'posts.analysis.remove_stopwords',
+    'posts.analysis.stem',
+]
+
+# Бюджет SQL-запросов на один GET-запрос к странице (по имени маршрута).
+# При превышении QueryBudgetMiddleware пишет предупреждение в лог,
+# а при QUERY_BUDGET_RAISE - падает с QueryBudgetExceeded.
+QUERY_BUDGETS = {
+    'posts:index': 6,
+    'posts:group_list': 9,
+    'posts:profile': 10,
+    'posts:post_detail': 12,
+    'posts:create': 6,
+    'posts:post_edit': 9,
+    'posts:follow_index': 7,
+    'posts:group_create': 5,
+    'posts:group_index': 7,
+    'posts:group_post': 8,
+    'posts:group_followers': 7,
+    'posts:post_search': 6,
+    'posts:user_search': 6,
+    'posts:group_search': 6,
+    'users:autocomplete': 3,
+    'posts-list': 3,
+    'posts-detail': 3,
+    'groups-list': 3,
+    'groups-detail': 3,
+    'comments-list': 4,
+    'comments-detail': 4,
+    'search-posts': 3,
+    'search-users': 3,
+    'search-groups': 3,
+}
+QUERY_BUDGET_TIME_MS = 500
+QUERY_BUDGET_RAISE = False
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -0,0 +1,51 @@
+import pytest
+from core.query_budget import check_routes
+from posts.models import Comment, Follow, Group, Post
+from users.models import Profile
+
+
+@pytest.fixture
+def budget_data(mixer, user):
+    """Group, posts, comments and follows for every budgeted route."""
+    Profile.objects.get_or_create(user=user)
+    group = Group.objects.create(
+        title='Группа бюджета', slug='budget', creator=user
+    )
+    Follow.objects.create(user=user, group=group)
+    for i in range(15):
+        author = mixer.blend('auth.User', username=f'budget{i}')
+        Profile.objects.create(user=author)
+        Follow.objects.create(user=author, group=group)
+        Follow.objects.create(user=user, author=author)
+        post = Post.objects.create(author=author, text='Пост', group=group)
+        Post.objects.create(author=user, text='Пост')
+        Comment.objects.create(author=author, post=post, text='Коммент')
+    own_post = Post.objects.filter(author=user).first()
+    values = {'slug': group.slug, 'username': user.username, 'post_id': post.id}
+    overrides = {
+        'posts:post_edit': {'post_id': own_post.id},
+        'posts-detail': {'pk': post.id},
+        'groups-detail': {'pk': group.id},
+        'comments-detail': {'pk': post.comments.first().id},
+    }
+    data = {
+        'posts:post_search': {'query': 'пост'},
+        'posts:user_search': {'query': 'budget'},
+        'posts:group_search': {'query': 'группа'},
+        'users:autocomplete': {'query': 'budget'},
+        'search-posts': {'query': 'пост'},
+        'search-users': {'query': 'budget'},
+        'search-groups': {'query': 'группа'},
+    }
+    return values, overrides, data
+
+
+@pytest.fixture
+def query_budget(budget_data):
+    """Check every route from settings.QUERY_BUDGETS with the given client.
+
+    Returns the list of budget violations, empty when all routes fit.
+    """
+    def check(client):
+        return check_routes(client, *budget_data)
+    return check
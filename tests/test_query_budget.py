@@ -0,0 +1,15 @@
+import pytest
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_routes_within_budget_for_guest(client, query_budget):
+    assert query_budget(client) == [], (
+        'Страницы превышают бюджет SQL-запросов из `QUERY_BUDGETS`'
+    )
+
+
+def test_routes_within_budget_for_user(user_client, query_budget):
+    assert query_budget(user_client) == [], (
+        'Страницы превышают бюджет SQL-запросов из `QUERY_BUDGETS`'
+    )